@@ -0,0 +1,19 @@
+"""Static bundles built by ``manage.py build_assets``.
+
+Every page loads one stylesheet and one script bundle; base.html uses the
+``site`` pair and pages with their own code override the ``styles`` and
+``scripts`` blocks. Sources are paths under STATICFILES_DIRS, concatenated
+in order.
+"""
+
+BUNDLES = {
+    'site.css': ['css/main.css', 'css/responsive.css'],
+    'thread.css': ['css/main.css', 'css/chat.css', 'css/responsive.css'],
+    'dashboard.css': ['css/main.css', 'css/dashboard.css', 'css/responsive.css'],
+
+    'site.js': ['js/main.js'],
+    'thread.js': ['js/main.js', 'js/thread.js'],
+    'dashboard.js': ['js/main.js', 'js/dashboard.js'],
+    'upload.js': ['js/main.js', 'js/upload.js'],
+    'delete_collection.js': ['js/main.js', 'js/delete_collection.js'],
+}
@@ -0,0 +1,138 @@
+"""Build and look up fingerprinted asset bundles.
+
+``build()`` concatenates and minifies each bundle in bundles.BUNDLES, names
+the result after its content hash (``thread.3f2a1b9c0d12.js``) and writes it
+to ASSETS_ROOT with ``.gz`` and, when the brotli module is installed, ``.br``
+variants next to it, plus ``manifest.json``. Since a file's name changes
+whenever its content does, it can be cached forever (see views.serve_asset);
+a front-end server can serve ASSETS_ROOT directly with gzip_static or
+brotli_static instead.
+
+Until the first build the ``{% asset %}`` tag links the source files under
+STATICFILES_DIRS one by one, as they were before.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+from .bundles import BUNDLES
+from .minify import minify_css, minify_js
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+_manifest = None
+_manifest_mtime = None
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _write(path, data):
+    partial = f"{path}.partial"
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def manifest_path():
+    return os.path.join(settings.ASSETS_ROOT, MANIFEST_NAME)
+
+
+def load_manifest():
+    """The current manifest, re-read when a build replaces it; None before
+    the first build."""
+    global _manifest, _manifest_mtime
+    try:
+        mtime = os.stat(manifest_path()).st_mtime
+    except FileNotFoundError:
+        _manifest = _manifest_mtime = None
+        return None
+    if mtime != _manifest_mtime:
+        with open(manifest_path(), encoding='utf-8') as f:
+            _manifest = json.load(f)
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def bundle_source(name, minify=True):
+    """The concatenated (and minified) text of bundle ``name`` and the size
+    of its unprocessed sources."""
+    is_css = name.endswith('.css')
+    texts, source_bytes = [], []
+    for source in BUNDLES[name]:
+        path = finders.find(source)
+        if path is None:
+            raise FileNotFoundError(f"{name}: static file {source} not found")
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        source_bytes.append(len(text.encode('utf-8')))
+        if minify:
+            text = minify_css(text) if is_css else minify_js(text)
+        if text.strip():
+            texts.append(text)
+    # ";" keeps one script's last statement from running into the next.
+    return ('\n' if is_css else ';\n').join(texts), source_bytes
+
+
+def build(minify=True, brotli_quality=11):
+    os.makedirs(settings.ASSETS_ROOT, exist_ok=True)
+    brotli = _brotli()
+    previous = load_manifest() or {}
+    bundles = {}
+    for name in BUNDLES:
+        text, source_bytes = bundle_source(name, minify)
+        data = text.encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+        path = os.path.join(settings.ASSETS_ROOT, filename)
+        _write(path, data)
+        gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+        _write(path + '.gz', gzipped)
+        entry = {
+            'file': filename,
+            'sources': BUNDLES[name],
+            'source_bytes': sum(source_bytes),
+            'source_requests': len(source_bytes),
+            'bytes': len(data),
+            'gzip_bytes': len(gzipped),
+        }
+        # Sizes of the unprocessed sources compressed the same way, for
+        # before/after reports that compare like with like.
+        raw = bundle_source(name, minify=False)[0].encode('utf-8')
+        entry['source_gzip_bytes'] = len(gzip.compress(raw, compresslevel=9, mtime=0))
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=brotli_quality)
+            _write(path + '.br', compressed)
+            entry['br_bytes'] = len(compressed)
+            entry['source_br_bytes'] = len(brotli.compress(raw, quality=brotli_quality))
+        bundles[name] = entry
+
+    current = sorted(entry['file'] for entry in bundles.values())
+    # Pages rendered just before a deploy still point at the previous build,
+    # so its files stay servable until the next one.
+    files = sorted(set(current) | set(previous.get('current', [])))
+    manifest = {'bundles': bundles, 'current': current, 'files': files}
+    _write(manifest_path(), json.dumps(manifest, indent=2).encode('utf-8'))
+    removed = _prune(files)
+    return manifest, removed
+
+
+def _prune(keep):
+    keep = set(keep) | {MANIFEST_NAME}
+    removed = 0
+    for filename in os.listdir(settings.ASSETS_ROOT):
+        base = filename[:-3] if filename.endswith(('.gz', '.br')) else filename
+        if base not in keep:
+            os.remove(os.path.join(settings.ASSETS_ROOT, filename))
+            removed += 1
+    return removed
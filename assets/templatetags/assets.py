@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from ..bundles import BUNDLES
+from ..pipeline import load_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def asset(name):
+    """<link>/<script> tags for bundle ``name``: the built file when there is
+    a manifest, otherwise every source file."""
+    manifest = load_manifest()
+    entry = manifest['bundles'].get(name) if manifest else None
+    if entry is not None:
+        urls = [settings.ASSETS_URL + entry['file']]
+    else:
+        urls = [static(source) for source in BUNDLES[name]]
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in urls))
@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from .bundles import BUNDLES
+from .minify import minify_css, minify_js
+
+NODE = shutil.which('node')
+
+# Regexes, template literals, comment-like strings and statements split by
+# automatic semicolon insertion.
+TRICKY_JS = r'''// leading comment
+const half = 10 / 2 / 5; /* block */ const slashes = /[/]\/\*x/g;
+let text = "// not a comment" + '/* nor this */' + `sum ${ {a: 1}.a + 1 } // kept`;
+const pick = value => value ? /b+/.test(value) : null
+const call = fn => fn()
+let a = 1
+let b = call
+(function () { return a + 1 })
+function early() {
+    return
+    42
+}
+const parts = ['x', "y"].map(function (item) { return item + '}' })
+console.log(JSON.stringify([half, 'a//b/*c*/'.replace(slashes, '-'), text, pick('abb'), pick(''), b, early(), parts]))
+'''
+
+
+class MinifyCSSTests(SimpleTestCase):
+    def test_comments_and_whitespace_go(self):
+        css = "/* header */\n.a , .b > p {\n    margin : 0 ;\n    padding: 1px 2px;\n}\n"
+        self.assertEqual(minify_css(css), ".a,.b>p{margin :0;padding:1px 2px}\n")
+
+    def test_strings_are_kept(self):
+        css = '.icon::before { content: "  /* not a comment */ ; } "; }'
+        self.assertEqual(minify_css(css), '.icon::before{content:"  /* not a comment */ ; } "}\n')
+
+    def test_descendant_pseudo_class_keeps_its_space(self):
+        self.assertEqual(minify_css('.menu :hover { color: red }'), '.menu :hover{color:red}\n')
+
+
+class MinifyJSTests(SimpleTestCase):
+    def test_comments_and_indentation_go(self):
+        js = "// comment\nfunction f(a, b) {\n    /* sum */\n    return a + b;\n}\n"
+        self.assertEqual(minify_js(js), "function f(a,b){return a + b;}\n")
+
+    def test_literals_are_copied_untouched(self):
+        minified = minify_js(TRICKY_JS)
+        for literal in (
+            '"// not a comment"', "'/* nor this */'", '`sum ${ {a: 1}.a + 1 } // kept`',
+            r'/[/]\/\*x/g', '/b+/', "'}'",
+        ):
+            self.assertIn(literal, minified)
+        self.assertIn('10 / 2 / 5', minified)
+
+    def test_line_breaks_that_end_statements_are_kept(self):
+        minified = minify_js(TRICKY_JS)
+        self.assertIn('return\n42', minified)
+        self.assertIn('let b=call\n(function', minified)
+        self.assertIn('let a=1\nlet b', minified)
+
+    @skipUnless(NODE, 'node is not installed')
+    def test_minified_code_behaves_the_same(self):
+        def run(source):
+            return subprocess.run([NODE, '-e', source], capture_output=True, text=True, check=True).stdout
+
+        self.assertEqual(run(minify_js(TRICKY_JS)), run(TRICKY_JS))
+
+    @skipUnless(NODE, 'node is not installed')
+    def test_every_script_still_parses(self):
+        for name, sources in BUNDLES.items():
+            if not name.endswith('.js'):
+                continue
+            for source in sources:
+                with open(finders.find(source), encoding='utf-8') as f:
+                    minified = minify_js(f.read())
+                with tempfile.NamedTemporaryFile('w', suffix='.js', delete=False) as f:
+                    f.write(minified)
+                self.addCleanup(os.remove, f.name)
+                result = subprocess.run([NODE, '--check', f.name], capture_output=True, text=True)
+                self.assertEqual(result.returncode, 0, f"{source}: {result.stderr}")
+
+
+class BuildAssetsTests(SimpleTestCase):
+    def test_report_compares_like_with_like(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        out = StringIO()
+        with override_settings(ASSETS_ROOT=root):
+            call_command('build_assets', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+
+        bundles = report['bundles']
+        for name, entry in bundles.items():
+            self.assertTrue(os.path.exists(os.path.join(root, entry['file'] + '.gz')))
+            self.assertLess(entry['bytes'], entry['source_bytes'], name)
+            self.assertLessEqual(entry['gzip_bytes'], entry['source_gzip_bytes'], name)
+
+        codec = 'br' if all('br_bytes' in entry for entry in bundles.values()) else 'gzip'
+        page = report['pages'][os.path.join('chat', 'thread.html')]
+        entries = [bundles[name] for name in page['bundles']]
+        self.assertEqual(page['bundles'], ['thread.css', 'thread.js'])
+        self.assertEqual(page['inline_bytes_before'], sum(entry['source_bytes'] for entry in entries))
+        self.assertEqual(page['bytes_after'], sum(entry['bytes'] for entry in entries))
+        self.assertEqual(page[f'inline_{codec}_bytes_before'], sum(entry[f'source_{codec}_bytes'] for entry in entries))
+        self.assertEqual(page[f'{codec}_bytes_after'], sum(entry[f'{codec}_bytes'] for entry in entries))
+        self.assertEqual(page['requests_after'], 2)
@@ -0,0 +1,46 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+
+from .pipeline import load_manifest
+
+CACHE_FOREVER = 'public, max-age=31536000, immutable'
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve_asset(request, name):
+    """A built bundle, precompressed when the client allows. File names are
+    content hashes, so responses are cacheable forever."""
+    manifest = load_manifest()
+    if manifest is None or name not in manifest['files']:
+        raise Http404("Unknown asset")
+    path = os.path.join(settings.ASSETS_ROOT, name)
+    content_type, _ = mimetypes.guess_type(name)
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if candidate in accepted and os.path.exists(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+    try:
+        response = FileResponse(open(path, 'rb'), content_type=f"{content_type or 'application/octet-stream'}; charset=utf-8")
+    except FileNotFoundError:
+        raise Http404("Unknown asset")
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = CACHE_FOREVER
+    return response
@@ -0,0 +1,107 @@
+"""Measure how much context compression shrinks RAG prompts.
+
+    python benchmarks/compression.py [files ...] [--queries 200] [--budget 400]
+                                     [--strategy characters] [--overlap 16]
+
+The corpus (the given files, or the synthetic pages of benchmarks/chunking.py)
+is chunked, and for each query a run of neighbouring chunks stands in for
+the retrieved hits, overlaps included, as Chroma returns them. The report
+compares the prompt built from the top three whole chunks with the
+compressed one (whose budget is capped at what those chunks cost): prompt tokens, how many query terms survive, and the time
+compression takes. The hits carry their chunk embeddings as retrieval
+returns them (the chunks are embedded once up front), so compression itself
+never runs the model and its timing is the same with or without it. Without
+the embedding model sentences are scored by term overlap alone.
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techChat.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from chunking import WORDS, load_pages, synthetic_pages  # noqa: E402
+from rag_system.chunking import ChunkingEngine, model_tokenizer  # noqa: E402
+from rag_system.compression import compress_context, count_prompt_tokens  # noqa: E402
+from rag_system.services import (  # noqa: E402
+    RAG_COMPRESSION_CANDIDATES, RAG_CONTEXT_CHUNKS, build_prompt, get_embedding_model,
+)
+
+_WORD = re.compile(r'\w+')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--pages', type=int, default=200, help='Synthetic pages when no files are given.')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--budget', type=int, default=400, help='Context token budget.')
+    parser.add_argument('--strategy', default='characters', choices=['characters', 'tokens', 'structure'])
+    parser.add_argument('--overlap', type=int, default=16, help='Token overlap for the token strategies.')
+    args = parser.parse_args()
+
+    model = get_embedding_model()
+    tokenizer, window = model_tokenizer(model)
+    engine = ChunkingEngine(tokenizer, window, args.overlap, args.strategy)
+    documents = [load_pages(path) for path in args.files] if args.files else [synthetic_pages(args.pages)]
+    chunked = [engine.split_pages(pages) for pages in documents]
+    chunked = [chunks for chunks in chunked if len(chunks) >= RAG_COMPRESSION_CANDIDATES]
+    if not chunked:
+        sys.exit("corpus too small")
+    if model is None:
+        print("embedding model unavailable: sentences are scored by query term overlap\n")
+        embedded = [[None] * len(chunks) for chunks in chunked]
+    else:
+        embedded = [list(model.encode([chunk.text for chunk in chunks])) for chunks in chunked]
+
+    rng = random.Random(3)
+    vocabulary = sorted({word for chunks in chunked for chunk in chunks for word in _WORD.findall(chunk.text.lower())}) or WORDS
+    before, after, kept_before, kept_after, timings = [], [], [], [], []
+    for _ in range(args.queries):
+        document = rng.randrange(len(chunked))
+        chunks = chunked[document]
+        start = rng.randrange(len(chunks) - RAG_COMPRESSION_CANDIDATES + 1)
+        hits = [
+            {
+                'text': chunk.text,
+                'metadata': {'document_id': str(document), 'chunk_index': start + i},
+                'embedding': embedded[document][start + i],
+            }
+            for i, chunk in enumerate(chunks[start:start + RAG_COMPRESSION_CANDIDATES])
+        ]
+        rng.shuffle(hits)
+        query = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 6)))
+        query_embedding = model.encode([query])[0].tolist() if model is not None else None
+
+        uncompressed = "\n\n".join(hit['text'] for hit in hits[:RAG_CONTEXT_CHUNKS])
+        started = time.perf_counter()
+        budget = min(args.budget, count_prompt_tokens(uncompressed))
+        compressed = compress_context(query, hits, budget, query_embedding)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        before.append(count_prompt_tokens(build_prompt(query, uncompressed)))
+        after.append(count_prompt_tokens(build_prompt(query, compressed.text)))
+        terms = set(_WORD.findall(query.lower()))
+        kept_before.append(len(terms & set(_WORD.findall(uncompressed.lower()))) / len(terms))
+        kept_after.append(len(terms & set(_WORD.findall(compressed.text.lower()))) / len(terms))
+
+    print(f"{args.queries} queries, {args.strategy} chunks, {RAG_COMPRESSION_CANDIDATES} candidates, budget {args.budget} tokens\n")
+    print(f"{'':<14} {'p50':>6} {'mean':>7} {'max':>6} {'query terms in context':>24}")
+    for label, tokens, kept in (('uncompressed', before, kept_before), ('compressed', after, kept_after)):
+        print(f"{label:<14} {statistics.median(tokens):>6.0f} {statistics.mean(tokens):>7.1f} {max(tokens):>6} {statistics.mean(kept):>23.0%}")
+    print(f"\nprompt tokens saved: {1 - sum(after) / sum(before):.0%}; "
+          f"compression p50 {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
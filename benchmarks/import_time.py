@@ -0,0 +1,90 @@
+"""Measure how long it takes to import the project (what every worker boot,
+manage.py command and test run pays) and check that the heavy RAG
+dependencies are not pulled in at import time.
+
+    python benchmarks/import_time.py [--runs 5] [--max-seconds 2.0]
+
+Exits non-zero when the median exceeds --max-seconds or a heavy module is
+imported eagerly, so it can run in CI to catch regressions.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['torch', 'sentence_transformers', 'chromadb', 'openai', 'langchain_community']
+
+PROBE = """
+import os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techChat.settings')
+import django
+django.setup()
+import techChat.urls
+for name in ('chat.views', 'rag_system.views', 'chat.services', 'rag_system.services'):
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(elapsed)
+print(','.join(m for m in %r if m in sys.modules))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe(importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', PROBE]
+    result = subprocess.run(command, cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    elapsed, loaded = result.stdout.splitlines()[-2:]
+    return float(elapsed), [m for m in loaded.split(',') if m], result.stderr
+
+
+def slowest_imports(importtime_output, limit):
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        # Top-level packages only; nested imports are counted in their parent.
+        name = name[1:]
+        if not name.startswith(' '):
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list.')
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args()
+
+    timings = []
+    loaded = []
+    for _ in range(args.runs):
+        elapsed, loaded, _ = run_probe()
+        timings.append(elapsed)
+
+    _, _, importtime_output = run_probe(importtime=True)
+
+    median = statistics.median(timings)
+    print(f"project import: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    print("\nslowest top-level imports (cumulative):")
+    for cumulative_us, name in slowest_imports(importtime_output, args.top):
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"\nFAIL: heavy modules imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"\nFAIL: median import time {median:.3f}s exceeds {args.max_seconds:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
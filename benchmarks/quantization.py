@@ -0,0 +1,160 @@
+"""Recall, memory and latency of quantized vector storage.
+
+    python benchmarks/quantization.py [--vectors 50000] [--queries 200] [--k 5]
+                                      [--rerank 1 4 10 40] [--collection ID] [--chroma]
+
+The corpus is a synthetic set of clustered, unit-length 384-dimensional
+vectors that share a common direction, as sentence embeddings do; with
+``--collection`` the vectors of a stored collection are used instead and
+``--queries`` of them are held out as queries. For every mode and rerank
+factor the report gives recall@k against exact float32 search, the bytes
+per vector kept in memory (codes and ids; the floats stay on disk) and the
+query latency. ``--chroma`` adds Chroma's HNSW index as a baseline (its
+memory is the index, estimated as float32 vectors plus graph links).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techChat.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rag_system.quantization import MIN_CANDIDATES, MODES, QuantizedStore  # noqa: E402
+from rag_system.sharding import directory_size  # noqa: E402
+
+HNSW_LINKS = 16
+
+
+def synthetic_corpus(count, queries, dim, clusters=200, seed=11):
+    rng = np.random.default_rng(seed)
+    shared = rng.normal(size=dim)
+    shared *= 0.6 / np.linalg.norm(shared)
+    centers = rng.normal(size=(clusters, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    def sample(n):
+        vectors = shared + centers[rng.integers(clusters, size=n)] + rng.normal(scale=0.05, size=(n, dim))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+    return sample(count), sample(queries)
+
+
+def collection_corpus(collection_id, queries, seed=11):
+    from rag_system.models import DocumentCollection
+    from rag_system.services import vector_collection
+
+    collection = DocumentCollection.objects.get(id=collection_id)
+    store = vector_collection(collection, create=False)
+    vectors, offset = [], 0
+    while True:
+        page = store.get(limit=5000, offset=offset, include=['embeddings'])
+        if not len(page['ids']):
+            break
+        vectors.extend(page['embeddings'])
+        offset += len(page['ids'])
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) <= queries:
+        sys.exit(f"collection {collection_id} has only {len(vectors)} vectors")
+    held_out = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[held_out[queries:]], vectors[held_out[:queries]]
+
+
+def exact_neighbours(corpus, queries, k):
+    distances = (corpus ** 2).sum(axis=1)[None, :] - 2 * queries @ corpus.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def recall(found, truth):
+    return statistics.mean(len(set(row) & set(expected)) / len(expected) for row, expected in zip(found, truth))
+
+
+def timed(search, queries):
+    found, timings = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(search(query))
+        timings.append((time.perf_counter() - started) * 1000)
+    return found, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vectors', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--rerank', type=int, nargs='+', default=[1, 4, 10, 40],
+                        help='Candidates re-scored per result.')
+    parser.add_argument('--collection', type=int, help='Use the vectors of this collection.')
+    parser.add_argument('--chroma', action='store_true', help='Include a Chroma HNSW baseline.')
+    args = parser.parse_args()
+
+    if args.collection:
+        corpus, queries = collection_corpus(args.collection, args.queries)
+    else:
+        corpus, queries = synthetic_corpus(args.vectors, args.queries, args.dim)
+    count, dim = corpus.shape
+    truth = exact_neighbours(corpus, queries, args.k)
+    ids = [str(i) for i in range(count)]
+    print(f"{count} vectors x {dim} dims, {len(queries)} queries, recall@{args.k} "
+          f"(at least {MIN_CANDIDATES} candidates are re-scored)\n")
+    print(f"{'storage':<22} {'recall':>7} {'bytes/vec':>10} {'memory MB':>10} {'disk MB':>8} {'p50 ms':>7} {'p99 ms':>7}")
+
+    def row(label, found, memory, disk, timings):
+        timings = sorted(timings)
+        print(f"{label:<22} {recall(found, truth):>7.3f} {memory / count:>10.1f} {memory / 1e6:>10.1f} "
+              f"{disk / 1e6:>8.1f} {statistics.median(timings):>7.2f} {timings[int(len(timings) * 0.99)]:>7.2f}")
+
+    norms = (corpus ** 2).sum(axis=1)
+
+    def exact(query):
+        distances = norms - 2 * corpus @ query
+        nearest = np.argpartition(distances, args.k)[:args.k]
+        return nearest[np.argsort(distances[nearest])]
+
+    found, timings = timed(exact, queries)
+    row('float32 exact', found, corpus.nbytes, corpus.nbytes, timings)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            store = QuantizedStore(os.path.join(directory, mode), mode)
+            started = time.perf_counter()
+            for start in range(0, count, 5000):
+                store.add(ids[start:start + 5000], corpus[start:start + 5000])
+            build = time.perf_counter() - started
+            for rerank in args.rerank:
+                found, timings = timed(
+                    lambda query: [int(i) for i in store.search(query, args.k, rerank=rerank)[0]], queries
+                )
+                row(f"{mode} x{rerank}", found, store.resident_bytes(), directory_size(store.path), timings)
+            print(f"{'':<22} ({mode} store built in {build:.1f}s)")
+
+        if args.chroma:
+            import chromadb
+            client = chromadb.PersistentClient(path=os.path.join(directory, 'chroma'))
+            collection = client.create_collection('benchmark')
+            started = time.perf_counter()
+            for start in range(0, count, 5000):
+                collection.add(ids=ids[start:start + 5000], embeddings=corpus[start:start + 5000])
+            build = time.perf_counter() - started
+            found, timings = timed(
+                lambda query: [int(i) for i in collection.query(query_embeddings=[query], n_results=args.k)['ids'][0]],
+                queries
+            )
+            memory = count * (dim * 4 + 2 * HNSW_LINKS * 4)
+            row('chroma hnsw', found, memory, directory_size(os.path.join(directory, 'chroma')), timings)
+            print(f"{'':<22} (chroma index built in {build:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,18 @@
 from django.contrib import admin
+from django.db.models import Q
 from .models import ChatThread, Message
+from .search import matching_messages
 
 @admin.register(ChatThread)
 class ChatThreadAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'title', 'message_count', 'created_at', 'updated_at']
-    list_filter = ['created_at', 'updated_at']
+    list_display = ['id', 'user', 'title', 'message_count', 'created_at', 'updated_at', 'archived_at']
+    list_filter = ['created_at', 'updated_at', 'archived_at']
     search_fields = ['user__username', 'title']
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-updated_at']
     
     def message_count(self, obj):
-        return obj.messages.count()
+        return obj.messages.count() + obj.archived_message_count
     message_count.short_description = 'Messages'
 
 @admin.register(Message)
@@ -21,6 +23,13 @@ class MessageAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
     ordering = ['-timestamp']
     
+    def get_search_results(self, request, queryset, search_term):
+        # Content goes through the full-text index instead of a LIKE scan.
+        matches = matching_messages(search_term)
+        if matches is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(Q(id__in=matches) | Q(thread__user__username=search_term.strip())), False
+    
     def user_name(self, obj):
         return obj.thread.user.username
     user_name.short_description = 'User'
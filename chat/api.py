@@ -0,0 +1,53 @@
+"""Read-only JSON API for chat threads and messages.
+
+Every endpoint runs a fixed number of queries: counts are annotated and
+nested messages are prefetched. Responses carry an ETag from the user's
+chat stamp (see ``chat.cache.conditional_get``), so polling clients get 304s
+without the view running.
+"""
+from django.db.models import Count, F
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from .archive import rehydrate_thread
+from .cache import CHAT, conditional_get
+from .models import ChatThread, Message
+from .serializers import ChatThreadDetailSerializer, ChatThreadSerializer, MessageSerializer
+
+
+def user_threads(user):
+    return ChatThread.objects.filter(user=user).annotate(
+        message_count=Count('messages') + F('archived_message_count')
+    )
+
+
+def paginated(request, queryset, serializer_class):
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+
+@api_view(['GET'])
+@conditional_get(CHAT)
+def thread_list(request):
+    return paginated(request, user_threads(request.user).order_by('-updated_at'), ChatThreadSerializer)
+
+
+@api_view(['GET'])
+@conditional_get(CHAT)
+def thread_detail(request, thread_id):
+    thread = get_object_or_404(user_threads(request.user).prefetch_related('messages'), id=thread_id)
+    if thread.archived_at:
+        rehydrate_thread(thread)
+        thread = get_object_or_404(user_threads(request.user).prefetch_related('messages'), id=thread_id)
+    return Response(ChatThreadDetailSerializer(thread).data)
+
+
+@api_view(['GET'])
+@conditional_get(CHAT)
+def thread_messages(request, thread_id):
+    thread = get_object_or_404(ChatThread, id=thread_id, user=request.user)
+    rehydrate_thread(thread)
+    return paginated(request, Message.objects.filter(thread=thread).order_by('timestamp', 'id'), MessageSerializer)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('threads/', api.thread_list, name='api_thread_list'),
+    path('threads/<int:thread_id>/', api.thread_detail, name='api_thread_detail'),
+    path('threads/<int:thread_id>/messages/', api.thread_messages, name='api_thread_messages'),
+]
@@ -0,0 +1,238 @@
+"""Hot/cold storage for chat messages.
+
+Messages of threads idle for CHAT_ARCHIVE_AFTER_DAYS are serialized to JSON,
+zlib-compressed in blobs of up to ARCHIVE_BLOB_MESSAGES messages and stored
+as ArchivedMessageBatch rows; the Message rows are deleted, so the hot table
+and its indexes only hold recent conversations. Opening or posting to an
+archived thread restores its messages with their original ids first.
+
+Archived messages move from the full-text index of chat_message to the
+contentless chat_archive_fts index (migration 0004), so search still finds
+them; restoring or deleting the thread takes them out again. Thread titles
+stay searchable.
+
+Restoring is not activity: ``updated_at`` keeps its value, and
+``rehydrated_at`` keeps the thread out of the next CHAT_ARCHIVE_AFTER_DAYS
+of archive runs.
+"""
+import json
+import logging
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import CHAT, bump_stamp
+from .models import ArchivedMessageBatch, ChatThread, Message
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CODEC = 'zlib'
+ARCHIVE_LEVEL = 6
+ARCHIVE_BLOB_MESSAGES = 500
+
+MESSAGE_FIELDS = ['id', 'content', 'is_user', 'timestamp', 'is_rag_response', 'source_documents']
+
+
+_archive_index_available = None
+
+
+def _rows(messages):
+    return [
+        {
+            'id': message.id,
+            'content': message.content,
+            'is_user': message.is_user,
+            'timestamp': message.timestamp.isoformat(),
+            'is_rag_response': message.is_rag_response,
+            'source_documents': message.source_documents,
+        }
+        for message in messages
+    ]
+
+
+def _encode(rows):
+    raw = json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return raw, zlib.compress(raw, ARCHIVE_LEVEL)
+
+
+def decode(batch):
+    if batch.codec != ARCHIVE_CODEC:
+        raise ValueError(f"Unknown archive codec: {batch.codec}")
+    return json.loads(zlib.decompress(bytes(batch.payload)))
+
+
+def archive_index_available():
+    global _archive_index_available
+    if _archive_index_available is None:
+        _archive_index_available = (
+            connection.vendor == 'sqlite'
+            and 'chat_archive_fts' in connection.introspection.table_names(include_views=False)
+        )
+    return _archive_index_available
+
+
+def _update_archive_index(rows, owner, delete=False):
+    """Add ``rows`` to chat_archive_fts, or remove them. A contentless index
+    removes postings by the original values, which is why deleting takes
+    the decoded rows too."""
+    if not rows or not archive_index_available():
+        return
+    if delete:
+        statement = ("INSERT INTO chat_archive_fts(chat_archive_fts, rowid, content, owner) "
+                     "VALUES ('delete', %s, %s, %s)")
+    else:
+        statement = "INSERT INTO chat_archive_fts(rowid, content, owner) VALUES (%s, %s, %s)"
+    with connection.cursor() as cursor:
+        cursor.executemany(statement, [(row['id'], row['content'], owner) for row in rows])
+
+
+def idle_threads(days=None):
+    cutoff = timezone.now() - timedelta(days=settings.CHAT_ARCHIVE_AFTER_DAYS if days is None else days)
+    return ChatThread.objects.filter(archived_at__isnull=True, updated_at__lt=cutoff).filter(
+        Q(rehydrated_at__isnull=True) | Q(rehydrated_at__lt=cutoff)
+    )
+
+
+def archive_threads(thread_ids, days=None):
+    """Move the messages of those ``thread_ids`` that are still idle to the
+    cold store in one transaction. Returns (threads, messages, raw bytes,
+    compressed bytes)."""
+    threads = messages_total = raw_total = compressed_total = 0
+    now = timezone.now()
+    with transaction.atomic():
+        # A thread may have had a new message since it was picked; the lock
+        # holds off further activity until the transaction ends.
+        owners = dict(
+            idle_threads(days).select_for_update().filter(id__in=thread_ids).values_list('id', 'user_id')
+        )
+        for thread_id, owner in owners.items():
+            messages = list(Message.objects.filter(thread_id=thread_id).order_by('id').only(*MESSAGE_FIELDS))
+            rows = _rows(messages)
+            batches = []
+            for start in range(0, len(rows), ARCHIVE_BLOB_MESSAGES):
+                chunk = rows[start:start + ARCHIVE_BLOB_MESSAGES]
+                raw, payload = _encode(chunk)
+                batches.append(ArchivedMessageBatch(
+                    thread_id=thread_id,
+                    first_message_id=chunk[0]['id'],
+                    last_message_id=chunk[-1]['id'],
+                    message_count=len(chunk),
+                    raw_size=len(raw),
+                    codec=ARCHIVE_CODEC,
+                    payload=payload,
+                    archived_at=now,
+                ))
+                raw_total += len(raw)
+                compressed_total += len(payload)
+            ArchivedMessageBatch.objects.bulk_create(batches)
+            Message.objects.filter(id__in=[message.id for message in messages]).delete()
+            _update_archive_index(rows, owner)
+            # update() rather than save(): updated_at must keep meaning
+            # "last activity".
+            ChatThread.objects.filter(id=thread_id).update(
+                archived_at=now,
+                archived_message_count=len(messages)
+            )
+            threads += 1
+            messages_total += len(messages)
+        # Bulk writes and update() send no signals.
+        for user_id in set(owners.values()):
+            bump_stamp(user_id, CHAT)
+    return threads, messages_total, raw_total, compressed_total
+
+
+def archive_idle_threads(days=None, batch_size=None, max_batches=None):
+    """Archive idle threads ``batch_size`` at a time, each batch in its own
+    short transaction so the hot tables are never locked for long."""
+    batch_size = batch_size or settings.CHAT_ARCHIVE_BATCH_SIZE
+    started = time.perf_counter()
+    report = {'batches': 0, 'threads': 0, 'messages': 0, 'raw_bytes': 0, 'compressed_bytes': 0}
+    last_id = 0
+    while max_batches is None or report['batches'] < max_batches:
+        thread_ids = list(
+            idle_threads(days).filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not thread_ids:
+            break
+        last_id = thread_ids[-1]
+        threads, messages, raw, compressed = archive_threads(thread_ids, days)
+        report['batches'] += 1
+        report['threads'] += threads
+        report['messages'] += messages
+        report['raw_bytes'] += raw
+        report['compressed_bytes'] += compressed
+        logger.info(f"Archived batch {report['batches']}: {threads} threads, {messages} messages")
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def rehydrate_thread(thread):
+    """Restore an archived thread's messages to the hot table. Safe to call
+    concurrently: only the request that clears ``archived_at`` restores."""
+    if thread.archived_at is None:
+        return 0
+    with transaction.atomic():
+        claimed = ChatThread.objects.filter(id=thread.id, archived_at__isnull=False).update(
+            archived_at=None,
+            archived_message_count=0,
+            rehydrated_at=timezone.now()
+        )
+        if not claimed:
+            return 0
+        rows = [
+            row
+            for batch in ArchivedMessageBatch.objects.filter(thread=thread).order_by('first_message_id')
+            for row in decode(batch)
+        ]
+        _update_archive_index(rows, thread.user_id, delete=True)
+        restored = []
+        for row in rows:
+            restored.append(Message(
+                id=row['id'],
+                thread_id=thread.id,
+                content=row['content'],
+                is_user=row['is_user'],
+                timestamp=parse_datetime(row['timestamp']),
+                is_rag_response=row['is_rag_response'],
+                source_documents=row['source_documents'],
+            ))
+        Message.objects.bulk_create(restored, batch_size=ARCHIVE_BLOB_MESSAGES)
+        ArchivedMessageBatch.objects.filter(thread=thread).delete()
+        bump_stamp(thread.user_id, CHAT)
+    thread.archived_at = None
+    thread.archived_message_count = 0
+    thread.rehydrated_at = timezone.now()
+    logger.info(f"Rehydrated thread {thread.id}: {len(restored)} messages")
+    return len(restored)
+
+
+def drop_archive_index(thread):
+    """Take a deleted archived thread's messages out of chat_archive_fts."""
+    if thread.archived_at is None or not archive_index_available():
+        return
+    for batch in ArchivedMessageBatch.objects.filter(thread=thread):
+        _update_archive_index(decode(batch), thread.user_id, delete=True)
+
+
+def archive_stats():
+    batches = ArchivedMessageBatch.objects.aggregate(
+        batches=Count('id'),
+        messages=Sum('message_count'),
+        raw_bytes=Sum('raw_size'),
+        compressed_bytes=Sum(Length('payload')),
+    )
+    return {
+        'hot_messages': Message.objects.count(),
+        'archived_threads': ChatThread.objects.filter(archived_at__isnull=False).count(),
+        'archived_messages': batches['messages'] or 0,
+        'archived_batches': batches['batches'],
+        'archived_raw_bytes': batches['raw_bytes'] or 0,
+        'archived_compressed_bytes': batches['compressed_bytes'] or 0,
+    }
@@ -0,0 +1,120 @@
+"""Per-user caching of page listings and template fragments.
+
+Entries are keyed by user id plus a version stamp per scope ("chat" for
+threads and messages, "rag" for collections and documents). Writes bump the
+stamp (see ``chat.signals``; bulk writes, which send no signals, bump it
+explicitly), which makes every older entry unreachable, so
+nothing is ever deleted explicitly and a cached page can't outlive the data
+it was rendered from.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+CHAT = 'chat'
+RAG = 'rag'
+
+
+def _cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def _stamp_key(user_id, scope):
+    return f"stamp:{scope}:{user_id}"
+
+
+def get_stamp(user_id, scope):
+    cache = _cache()
+    key = _stamp_key(user_id, scope)
+    stamp = cache.get(key)
+    if stamp is None:
+        # Seed from the clock so a stamp that was evicted never comes back
+        # with a value an old entry was stored under.
+        cache.add(key, time.time_ns(), None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def get_stamps(user_id):
+    return {scope: get_stamp(user_id, scope) for scope in (CHAT, RAG)}
+
+
+def bump_stamp(user_id, scope):
+    """Invalidate the user's cached ``scope`` once the current transaction
+    commits (right away outside one). Bumping earlier would let a page
+    rendered concurrently from pre-commit data be cached under the new
+    stamp."""
+    if user_id is None:
+        return
+    transaction.on_commit(lambda: _increment_stamp(user_id, scope), robust=True)
+
+
+def _increment_stamp(user_id, scope):
+    cache = _cache()
+    key = _stamp_key(user_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def cached_query(user_id, scope, name, builder, *vary_on):
+    """Return ``builder()`` (which must produce something picklable, e.g. a
+    list of model instances) cached under the user's current stamp."""
+    cache = _cache()
+    parts = [str(part) for part in vary_on]
+    key = ":".join(['page', name, str(user_id), str(get_stamp(user_id, scope))] + parts)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, settings.PAGE_CACHE_TIMEOUT)
+    return value
+
+
+def page_cache_context(user_id):
+    """Template context used as vary-on arguments for ``{% cache %}`` blocks."""
+    return {
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+        'page_cache': get_stamps(user_id),
+    }
+
+
+def stamp_etag(request, scope):
+    """ETag for a per-user response: changes whenever the scope's stamp is
+    bumped, so it needs no database query."""
+    parts = [scope, str(request.user.id), str(get_stamp(request.user.id, scope)), request.get_full_path()]
+    return quote_etag(hashlib.sha1(":".join(parts).encode('utf-8')).hexdigest())
+
+
+def conditional_get(scope):
+    """Like django.views.decorators.http.condition, but applied inside a
+    REST framework view so it sees the authenticated API user. Answers 304
+    before the view (and its queries and serialization) runs.
+
+    Only an ETag from the scope's stamp is sent. No Last-Modified: deletes
+    and bulk updates don't move any timestamp, so it could answer 304 for
+    data that has changed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            etag = stamp_etag(request, scope)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                # Per-user data: shared caches must not answer for another user.
+                response.headers.setdefault('Cache-Control', 'private, no-cache')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.archive import archive_idle_threads, archive_stats, idle_threads
+
+
+class Command(BaseCommand):
+    help = "Move messages of idle threads to the compressed archive, in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Idle period before a thread is archived (default: CHAT_ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Threads per transaction (default: CHAT_ARCHIVE_BATCH_SIZE).')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches; run again to continue.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the threads that would be archived.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        days = settings.CHAT_ARCHIVE_AFTER_DAYS if options['days'] is None else options['days']
+
+        if options['dry_run']:
+            self.stdout.write(f"{idle_threads(days).count()} threads idle for more than {days} days")
+            return
+
+        report = archive_idle_threads(days, options['batch_size'], options['max_batches'])
+        report['store'] = archive_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        ratio = report['raw_bytes'] / report['compressed_bytes'] if report['compressed_bytes'] else 0
+        self.stdout.write(
+            f"Archived {report['messages']} messages from {report['threads']} threads in "
+            f"{report['batches']} batches ({report['elapsed_seconds']}s)"
+        )
+        self.stdout.write(
+            f"{report['raw_bytes'] / 1024:.0f} KB -> {report['compressed_bytes'] / 1024:.0f} KB ({ratio:.1f}x)"
+        )
+        store = report['store']
+        self.stdout.write(
+            f"Hot messages: {store['hot_messages']}; archived: {store['archived_messages']} messages "
+            f"in {store['archived_threads']} threads"
+        )
@@ -0,0 +1,102 @@
+from django.db import migrations
+
+# SQLite FTS5 indexes over message content and thread titles. Both are
+# external-content tables (the text itself is only stored once) kept in sync
+# by triggers, so every insert, update and delete path is covered, including
+# queryset and raw SQL writes. Messages are indexed through a view that adds
+# the owning user id, which lets a search filter by user inside the index.
+# On other databases search falls back to a plain scan (see chat/search.py).
+
+FORWARD_SQL = [
+    """
+    CREATE VIEW chat_message_search AS
+    SELECT m.id AS id, m.content AS content, t.user_id AS owner
+    FROM chat_message m JOIN chat_chatthread t ON t.id = m.thread_id
+    """,
+    """
+    CREATE VIRTUAL TABLE chat_message_fts USING fts5(
+        content, owner,
+        content='chat_message_search', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_ai AFTER INSERT ON chat_message BEGIN
+        INSERT INTO chat_message_fts(rowid, content, owner)
+        VALUES (new.id, new.content, (SELECT user_id FROM chat_chatthread WHERE id = new.thread_id));
+    END
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_ad AFTER DELETE ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content, owner)
+        VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_chatthread WHERE id = old.thread_id));
+    END
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_au AFTER UPDATE OF content, thread_id ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content, owner)
+        VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_chatthread WHERE id = old.thread_id));
+        INSERT INTO chat_message_fts(rowid, content, owner)
+        VALUES (new.id, new.content, (SELECT user_id FROM chat_chatthread WHERE id = new.thread_id));
+    END
+    """,
+    """
+    CREATE VIRTUAL TABLE chat_thread_fts USING fts5(
+        title, user_id,
+        content='chat_chatthread', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_ai AFTER INSERT ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_ad AFTER DELETE ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(chat_thread_fts, rowid, title, user_id)
+        VALUES ('delete', old.id, old.title, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_au AFTER UPDATE OF title, user_id ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(chat_thread_fts, rowid, title, user_id)
+        VALUES ('delete', old.id, old.title, old.user_id);
+        INSERT INTO chat_thread_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id);
+    END
+    """,
+    "INSERT INTO chat_message_fts(chat_message_fts) VALUES ('rebuild')",
+    "INSERT INTO chat_thread_fts(chat_thread_fts) VALUES ('rebuild')",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS chat_thread_fts_au",
+    "DROP TRIGGER IF EXISTS chat_thread_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_thread_fts_ai",
+    "DROP TABLE IF EXISTS chat_thread_fts",
+    "DROP TRIGGER IF EXISTS chat_message_fts_au",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ai",
+    "DROP TABLE IF EXISTS chat_message_fts",
+    "DROP VIEW IF EXISTS chat_message_search",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD_SQL), run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Adding columns rebuilds chat_chatthread on SQLite, which drops the triggers
+# of 0002_search_index and fails on the chat_message_search view. They are
+# dropped before the schema changes and created again after; the FTS tables
+# themselves are untouched, so the index stays valid.
+
+TRIGGERS_SQL = [
+    """
+    CREATE VIEW chat_message_search AS
+    SELECT m.id AS id, m.content AS content, t.user_id AS owner
+    FROM chat_message m JOIN chat_chatthread t ON t.id = m.thread_id
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_ai AFTER INSERT ON chat_message BEGIN
+        INSERT INTO chat_message_fts(rowid, content, owner)
+        VALUES (new.id, new.content, (SELECT user_id FROM chat_chatthread WHERE id = new.thread_id));
+    END
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_ad AFTER DELETE ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content, owner)
+        VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_chatthread WHERE id = old.thread_id));
+    END
+    """,
+    """
+    CREATE TRIGGER chat_message_fts_au AFTER UPDATE OF content, thread_id ON chat_message BEGIN
+        INSERT INTO chat_message_fts(chat_message_fts, rowid, content, owner)
+        VALUES ('delete', old.id, old.content, (SELECT user_id FROM chat_chatthread WHERE id = old.thread_id));
+        INSERT INTO chat_message_fts(rowid, content, owner)
+        VALUES (new.id, new.content, (SELECT user_id FROM chat_chatthread WHERE id = new.thread_id));
+    END
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_ai AFTER INSERT ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_ad AFTER DELETE ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(chat_thread_fts, rowid, title, user_id)
+        VALUES ('delete', old.id, old.title, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER chat_thread_fts_au AFTER UPDATE OF title, user_id ON chat_chatthread BEGIN
+        INSERT INTO chat_thread_fts(chat_thread_fts, rowid, title, user_id)
+        VALUES ('delete', old.id, old.title, old.user_id);
+        INSERT INTO chat_thread_fts(rowid, title, user_id) VALUES (new.id, new.title, new.user_id);
+    END
+    """,
+]
+
+DROP_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS chat_thread_fts_au",
+    "DROP TRIGGER IF EXISTS chat_thread_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_thread_fts_ai",
+    "DROP TRIGGER IF EXISTS chat_message_fts_au",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ad",
+    "DROP TRIGGER IF EXISTS chat_message_fts_ai",
+    "DROP VIEW IF EXISTS chat_message_search",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run(DROP_TRIGGERS_SQL),
+            run(TRIGGERS_SQL)
+        ),
+        migrations.CreateModel(
+            name='ArchivedMessageBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.BigIntegerField()),
+                ('message_count', models.IntegerField()),
+                ('raw_size', models.IntegerField()),
+                ('codec', models.CharField(default='zlib', max_length=10)),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['thread', 'first_message_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='archived_message_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatthread',
+            index=models.Index(fields=['archived_at', 'updated_at'], name='chat_thread_archive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmessagebatch',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_batches', to='chat.chatthread'),
+        ),
+        migrations.RunPython(
+            run(TRIGGERS_SQL),
+            run(DROP_TRIGGERS_SQL)
+        ),
+    ]
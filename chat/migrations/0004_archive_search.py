@@ -0,0 +1,69 @@
+import json
+import zlib
+
+from django.db import migrations, models
+
+# Archived messages leave chat_message, and with it the chat_message_fts
+# index. They get their own contentless FTS5 index (chat/archive.py keeps it
+# in sync): it stores only the postings, the text stays compressed in
+# ArchivedMessageBatch, and snippets for archived hits are cut from the
+# decoded batch. Rowids are message ids.
+
+CREATE_SQL = """
+    CREATE VIRTUAL TABLE chat_archive_fts USING fts5(
+        content, owner,
+        content='',
+        tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'
+    )
+"""
+
+DROP_SQL = "DROP TABLE IF EXISTS chat_archive_fts"
+
+
+def decode(batch):
+    return json.loads(zlib.decompress(bytes(batch.payload)))
+
+
+def index_archive(apps, schema_editor):
+    ArchivedMessageBatch = apps.get_model('chat', 'ArchivedMessageBatch')
+    sqlite = schema_editor.connection.vendor == 'sqlite'
+    if sqlite:
+        schema_editor.execute(CREATE_SQL)
+    for batch in ArchivedMessageBatch.objects.select_related('thread').iterator():
+        rows = decode(batch)
+        batch.last_message_id = rows[-1]['id']
+        batch.save(update_fields=['last_message_id'])
+        if sqlite:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO chat_archive_fts(rowid, content, owner) VALUES (%s, %s, %s)",
+                    [(row['id'], row['content'], batch.thread.user_id) for row in rows]
+                )
+
+
+def drop_archive_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_archive'),
+    ]
+
+    # Nullable columns without a default are added in place on SQLite; the
+    # search triggers on chat_chatthread survive.
+    operations = [
+        migrations.AddField(
+            model_name='archivedmessagebatch',
+            name='last_message_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='chatthread',
+            name='rehydrated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(index_archive, drop_archive_index),
+    ]
@@ -7,9 +7,16 @@ class ChatThread(models.Model):
     title = models.CharField(max_length=200, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set while the thread's messages live in ArchivedMessageBatch rows.
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archived_message_count = models.IntegerField(default=0)
+    # Opening a thread restores it without counting as activity; it is not
+    # archived again for CHAT_ARCHIVE_AFTER_DAYS after that.
+    rehydrated_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [models.Index(fields=['archived_at', 'updated_at'], name='chat_thread_archive_idx')]
 
     def __str__(self):
         return f"{self.user.username} - {self.title or 'Untitled'}"
@@ -26,4 +33,19 @@ class Message(models.Model):
         ordering = ['timestamp']
 
     def __str__(self):
-        return f"{'User' if self.is_user else 'AI'}: {self.content[:50]}..."
\ No newline at end of file
+        return f"{'User' if self.is_user else 'AI'}: {self.content[:50]}..."
+
+class ArchivedMessageBatch(models.Model):
+    """Compressed JSON list of up to ARCHIVE_BLOB_MESSAGES messages of one
+    archived thread (see chat/archive.py)."""
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE, related_name='archived_batches')
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField(null=True)
+    message_count = models.IntegerField()
+    raw_size = models.IntegerField()
+    codec = models.CharField(max_length=10, default='zlib')
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['thread', 'first_message_id']
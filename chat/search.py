@@ -0,0 +1,247 @@
+"""Per-user full-text search over messages and thread titles.
+
+Backed by the FTS5 indexes created in migration 0002_search_index. The owner
+is part of each index, so a search only walks the posting lists of the
+searching user's rows instead of matching the whole table and filtering
+afterwards. Results are ranked by bm25 and paged with LIMIT/OFFSET; only the
+rows of the requested page are loaded through the ORM.
+
+Messages of archived threads are matched in chat_archive_fts (see
+chat/archive.py) in the same ranked query. That index is contentless, so
+their snippets are cut from the decoded archive batch.
+
+Databases without FTS5 get the same results shape from an ``icontains``
+scan, newest first.
+"""
+import html
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from .archive import archive_index_available, decode
+from .models import ArchivedMessageBatch, ChatThread, Message
+
+PAGE_SIZE = 20
+MAX_PAGE = 50
+THREAD_RESULTS = 5
+MAX_TERMS = 16
+SNIPPET_TOKENS = 24
+
+# Control characters mark matches inside snippets so the text can be
+# escaped before <mark> tags go in.
+_OPEN, _CLOSE = '\x02', '\x03'
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and 'chat_message_fts' in connection.introspection.table_names(include_views=False)
+        )
+    return _fts_available
+
+
+def parse_query(query):
+    """Terms of a free-text query: quoted phrases stay together, everything
+    else is a single word. Returns ``[(text, is_phrase), ...]``."""
+    terms = []
+    for phrase, word in _TERM.findall(query or ''):
+        text = (phrase or word).strip()
+        if text:
+            terms.append((text, bool(phrase)))
+    return terms[:MAX_TERMS]
+
+
+def fts_expression(terms):
+    """FTS5 expression matching all terms; the last bare word is treated as a
+    prefix so results show up while the user is still typing."""
+    parts = []
+    for i, (text, is_phrase) in enumerate(terms):
+        quoted = '"' + text.replace('"', '""') + '"'
+        if i == len(terms) - 1 and not is_phrase:
+            quoted += '*'
+        parts.append(quoted)
+    return ' '.join(parts)
+
+
+def highlight(text):
+    return html.escape(text).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def matching_messages(query):
+    """Subquery of message ids matching ``query`` for every user, for use in
+    ``filter(id__in=...)``; None when the FTS index is unavailable."""
+    terms = parse_query(query)
+    if not terms or not fts_available():
+        return None
+    return RawSQL(
+        "SELECT rowid FROM chat_message_fts WHERE chat_message_fts MATCH %s",
+        [f'content : ({fts_expression(terms)})']
+    )
+
+
+def search(user, query, page=1):
+    page = max(1, min(page, MAX_PAGE))
+    terms = parse_query(query)
+    if not terms:
+        return {'threads': [], 'results': [], 'page': page, 'has_next': False}
+    if fts_available():
+        return _search_fts(user, terms, page)
+    return _search_scan(user, terms, page)
+
+
+def _search_fts(user, terms, page):
+    expression = fts_expression(terms)
+    offset = (page - 1) * PAGE_SIZE
+
+    match = f'owner : "{user.id}" AND content : ({expression})'
+
+    with connection.cursor() as cursor:
+        if archive_index_available():
+            # "rank" is a hidden column of FTS5 tables, hence "score".
+            cursor.execute(
+                "SELECT rowid, snippet(chat_message_fts, 0, %s, %s, '…', %s), "
+                "bm25(chat_message_fts, 1.0, 0.0) AS score "
+                "FROM chat_message_fts WHERE chat_message_fts MATCH %s "
+                "UNION ALL "
+                "SELECT rowid, NULL, bm25(chat_archive_fts, 1.0, 0.0) "
+                "FROM chat_archive_fts WHERE chat_archive_fts MATCH %s "
+                "ORDER BY score LIMIT %s OFFSET %s",
+                [_OPEN, _CLOSE, SNIPPET_TOKENS, match, match, PAGE_SIZE + 1, offset]
+            )
+        else:
+            cursor.execute(
+                "SELECT rowid, snippet(chat_message_fts, 0, %s, %s, '…', %s), "
+                "bm25(chat_message_fts, 1.0, 0.0) "
+                "FROM chat_message_fts WHERE chat_message_fts MATCH %s "
+                "ORDER BY bm25(chat_message_fts, 1.0, 0.0) LIMIT %s OFFSET %s",
+                [_OPEN, _CLOSE, SNIPPET_TOKENS, match, PAGE_SIZE + 1, offset]
+            )
+        hits = [(message_id, snippet) for message_id, snippet, _ in cursor.fetchall()]
+
+        threads = []
+        if page == 1:
+            cursor.execute(
+                "SELECT rowid, highlight(chat_thread_fts, 0, %s, %s) "
+                "FROM chat_thread_fts WHERE chat_thread_fts MATCH %s "
+                "ORDER BY bm25(chat_thread_fts, 1.0, 0.0) LIMIT %s",
+                [_OPEN, _CLOSE, f'user_id : "{user.id}" AND title : ({expression})', THREAD_RESULTS]
+            )
+            threads = cursor.fetchall()
+
+    has_next = len(hits) > PAGE_SIZE
+    hits = hits[:PAGE_SIZE]
+    messages = Message.objects.select_related('thread').only(
+        'id', 'is_user', 'timestamp', 'thread__id', 'thread__title'
+    ).in_bulk([message_id for message_id, snippet in hits if snippet is not None])
+    snippets = {message_id: highlight(snippet) for message_id, snippet in hits if snippet is not None}
+    archived = [message_id for message_id, snippet in hits if snippet is None]
+    if archived:
+        mark = _marker(terms)
+        for message in _archived_messages(user, archived):
+            messages[message.id] = message
+            snippets[message.id] = mark(_excerpt(message.content, terms))
+
+    return {
+        'threads': [
+            {'thread_id': thread_id, 'title': highlight(title), 'url': reverse('chat_thread', args=[thread_id])}
+            for thread_id, title in threads
+        ],
+        'results': [
+            _result(messages[message_id], snippets[message_id])
+            for message_id, _ in hits if message_id in messages
+        ],
+        'page': page,
+        'has_next': has_next,
+    }
+
+
+def _search_scan(user, terms, page):
+    offset = (page - 1) * PAGE_SIZE
+    messages = Message.objects.filter(thread__user=user).select_related('thread')
+    threads = ChatThread.objects.filter(user=user)
+    for text, _ in terms:
+        messages = messages.filter(content__icontains=text)
+        threads = threads.filter(title__icontains=text)
+    hits = list(messages.order_by('-timestamp')[offset:offset + PAGE_SIZE + 1])
+    mark = _marker(terms)
+
+    return {
+        'threads': [
+            {'thread_id': thread.id, 'title': mark(thread.title), 'url': reverse('chat_thread', args=[thread.id])}
+            for thread in (threads[:THREAD_RESULTS] if page == 1 else [])
+        ],
+        'results': [_result(message, mark(message.content[:500])) for message in hits[:PAGE_SIZE]],
+        'page': page,
+        'has_next': len(hits) > PAGE_SIZE,
+    }
+
+
+def _pattern(terms):
+    return re.compile('|'.join(re.escape(text) for text, _ in terms), re.IGNORECASE)
+
+
+def _marker(terms):
+    pattern = _pattern(terms)
+
+    def mark(text):
+        return highlight(pattern.sub(lambda match: f'{_OPEN}{match.group(0)}{_CLOSE}', text))
+    return mark
+
+
+def _excerpt(text, terms):
+    """About SNIPPET_TOKENS words of ``text`` around the first match, like
+    FTS5's snippet()."""
+    words = text.split()
+    if len(words) <= SNIPPET_TOKENS:
+        return text
+    found = _pattern(terms).search(text)
+    at = len(text[:found.start()].split()) if found else 0
+    start = max(0, min(at - SNIPPET_TOKENS // 2, len(words) - SNIPPET_TOKENS))
+    excerpt = ' '.join(words[start:start + SNIPPET_TOKENS])
+    if start > 0:
+        excerpt = '…' + excerpt
+    if start + SNIPPET_TOKENS < len(words):
+        excerpt += '…'
+    return excerpt
+
+
+def _archived_messages(user, message_ids):
+    """Unsaved Message instances for archived ``message_ids`` of ``user``,
+    decoded from the batches that hold them."""
+    wanted = set(message_ids)
+    batches = ArchivedMessageBatch.objects.filter(thread__user=user).filter(reduce(or_, (
+        Q(first_message_id__lte=message_id, last_message_id__gte=message_id) for message_id in wanted
+    ))).select_related('thread').only('thread__id', 'thread__title', 'codec', 'payload')
+    for batch in batches:
+        for row in decode(batch):
+            if row['id'] in wanted:
+                yield Message(
+                    id=row['id'],
+                    thread=batch.thread,
+                    content=row['content'],
+                    is_user=row['is_user'],
+                    timestamp=parse_datetime(row['timestamp']),
+                )
+
+
+def _result(message, snippet):
+    return {
+        'message_id': message.id,
+        'thread_id': message.thread_id,
+        'thread_title': message.thread.title,
+        'is_user': message.is_user,
+        'timestamp': message.timestamp.isoformat(),
+        'snippet': snippet,
+        'url': f"{reverse('chat_thread', args=[message.thread_id])}#message-{message.id}",
+    }
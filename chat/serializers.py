@@ -1,4 +1,4 @@
-import serializers
+from rest_framework import serializers
 from .models import ChatThread, Message
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -7,12 +7,15 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'content', 'is_user', 'timestamp', 'is_rag_response', 'source_documents']
 
 class ChatThreadSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
-    message_count = serializers.SerializerMethodField()
+    # Annotated by the queryset (see chat.api) instead of one COUNT per thread.
+    message_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = ChatThread
-        fields = ['id', 'title', 'created_at', 'updated_at', 'messages', 'message_count']
+        fields = ['id', 'title', 'created_at', 'updated_at', 'message_count']
+
+class ChatThreadDetailSerializer(ChatThreadSerializer):
+    messages = MessageSerializer(many=True, read_only=True)
 
-    def get_message_count(self, obj):
-        return obj.messages.count()
+    class Meta(ChatThreadSerializer.Meta):
+        fields = ChatThreadSerializer.Meta.fields + ['messages']
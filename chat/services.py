@@ -1,10 +1,12 @@
-import openai
 from django.conf import settings
 from rag_system.services import RAGService
 
 class ChatService:
     def __init__(self):
+        import openai
         openai.api_key = settings.OPENAI_API_KEY
+        if settings.OPENAI_BASE_URL:
+            openai.base_url = settings.OPENAI_BASE_URL
 
     def generate_response(self, user_input, conversation_history=None):
         messages = [
@@ -19,6 +21,7 @@ class ChatService:
         messages.append({"role": "user", "content": user_input})
         
         try:
+            import openai
             response = openai.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=messages,
@@ -29,6 +32,6 @@ class ChatService:
         except Exception as e:
             return f"Sorry, I encountered an error: {str(e)}"
 
-    def generate_rag_response(self, query, collection_id, user):
+    def generate_rag_response(self, query, collection_ids, user):
         rag_service = RAGService()
-        return rag_service.query_documents(query, collection_id, user)
\ No newline at end of file
+        return rag_service.query_documents(query, collection_ids, user)
\ No newline at end of file
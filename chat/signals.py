@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from rag_system.models import Document, DocumentCollection
+
+from .archive import drop_archive_index
+from .cache import CHAT, RAG, bump_stamp
+from .models import ChatThread, Message
+
+
+@receiver([post_save, post_delete], sender=ChatThread)
+def thread_changed(sender, instance, **kwargs):
+    bump_stamp(instance.user_id, CHAT)
+
+
+# The archive index is contentless and has no foreign key to cascade from;
+# its entries have to go while the batches can still be decoded.
+@receiver(pre_delete, sender=ChatThread)
+def thread_deleting(sender, instance, **kwargs):
+    drop_archive_index(instance)
+
+
+# Messages are only ever deleted together with their thread, which bumps the
+# stamp already. Listening to Message deletes would also stop Django from
+# fast-deleting them when a thread goes away.
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, **kwargs):
+    bump_stamp(instance.thread.user_id, CHAT)
+
+
+@receiver([post_save, post_delete], sender=DocumentCollection)
+def collection_changed(sender, instance, **kwargs):
+    bump_stamp(instance.user_id, RAG)
+
+
+# Deleting a document bumps the stamp in the view, and a collection's
+# documents go with it. Not listening to Document deletes keeps Django's
+# fast cascade delete.
+@receiver(post_save, sender=Document)
+def document_saved(sender, instance, **kwargs):
+    bump_stamp(document_owner(instance), RAG)
+
+
+def document_owner(document):
+    # The collection is loaded already wherever documents are created or
+    # processed, so this rarely costs a query.
+    if Document.collection.is_cached(document):
+        return document.collection.user_id
+    return DocumentCollection.objects.filter(pk=document.collection_id).values_list('user_id', flat=True).first()
@@ -1,3 +1,240 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import archive, search
+from .cache import CHAT, get_stamp
+from .models import ArchivedMessageBatch, ChatThread, Message
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PageCacheStampTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+
+    def test_stamp_is_bumped_only_after_commit(self):
+        before = get_stamp(self.user.id, CHAT)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            ChatThread.objects.create(user=self.user, title='Draft')
+        self.assertEqual(get_stamp(self.user.id, CHAT), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_stamp(self.user.id, CHAT), before)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        other = User.objects.create_user('bob', password='secret')
+        self.thread = ChatThread.objects.create(user=self.user, title='Kubernetes upgrade')
+        self.first = Message.objects.create(thread=self.thread, content='How do I drain a kubernetes node?')
+        Message.objects.create(thread=self.thread, content='Use kubectl drain <node> --ignore-daemonsets')
+        Message.objects.create(thread=self.thread, content='Unrelated question about lunch')
+        Message.objects.create(
+            thread=ChatThread.objects.create(user=other, title='Kubernetes'), content='My kubernetes cluster'
+        )
+
+    def assert_finds_own_messages(self, results):
+        self.assertEqual([hit['message_id'] for hit in results['results']], [self.first.id])
+        self.assertIn('<mark>', results['results'][0]['snippet'])
+        self.assertEqual([thread['thread_id'] for thread in results['threads']], [self.thread.id])
+        self.assertFalse(results['has_next'])
+
+    def test_full_text_search(self):
+        self.assertTrue(search.fts_available())
+        self.assert_finds_own_messages(search.search(self.user, 'kubernetes'))
+        # The last word matches as a prefix, phrases stay together.
+        self.assert_finds_own_messages(search.search(self.user, 'kubern'))
+        self.assertEqual(len(search.search(self.user, '"drain a kubernetes"')['results']), 1)
+        self.assertEqual(search.search(self.user, '"kubernetes drain"')['results'], [])
+
+    def test_results_link_to_their_thread(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/chat/search/', {'q': 'drain kubernetes'}).json()
+        self.assertEqual(response['results'][0]['url'], f'/chat/thread/{self.thread.id}/#message-{self.first.id}')
+        response = self.client.get('/chat/search/', {'q': 'upgrade'}).json()
+        self.assertEqual(response['threads'][0]['url'], f'/chat/thread/{self.thread.id}/')
+
+    def test_snippets_are_escaped(self):
+        snippet = search.search(self.user, 'kubectl')['results'][0]['snippet']
+        self.assertIn('&lt;node&gt;', snippet)
+        self.assertIn('<mark>kubectl</mark>', snippet)
+
+    def test_index_follows_edits_and_deletes(self):
+        self.first.content = 'How do I cordon a node?'
+        self.first.save()
+        self.assertEqual(search.search(self.user, 'kubernetes')['results'], [])
+        self.assertEqual(len(search.search(self.user, 'cordon')['results']), 1)
+        self.first.delete()
+        self.assertEqual(search.search(self.user, 'cordon')['results'], [])
+
+    def test_scan_fallback_has_the_same_shape(self):
+        with mock.patch.object(search, 'fts_available', return_value=False):
+            self.assert_finds_own_messages(search.search(self.user, 'Kubernetes'))
+            snippet = search.search(self.user, 'kubectl')['results'][0]['snippet']
+        self.assertIn('&lt;node&gt;', snippet)
+        self.assertIn('<mark>kubectl</mark>', snippet)
+
+    def test_pages(self):
+        for i in range(search.PAGE_SIZE):
+            Message.objects.create(thread=self.thread, content=f'kubernetes note {i}')
+        first = search.search(self.user, 'kubernetes')
+        self.assertEqual(len(first['results']), search.PAGE_SIZE)
+        self.assertTrue(first['has_next'])
+        second = search.search(self.user, 'kubernetes', page=2)
+        self.assertEqual(len(second['results']), 1)
+        self.assertEqual(second['threads'], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.thread = ChatThread.objects.create(user=self.user, title='Old thread')
+        for i in range(5):
+            Message.objects.create(
+                thread=self.thread, content=f'archived message {i} ünïcode', is_user=i % 2 == 0,
+                is_rag_response=i == 1, source_documents=[{'filename': 'a.txt'}] if i == 1 else None
+            )
+        self.idle()
+
+    def idle(self):
+        ChatThread.objects.filter(id=self.thread.id).update(updated_at=timezone.now() - timedelta(days=120))
+
+    def snapshot(self):
+        return list(self.thread.messages.order_by('id').values(
+            'id', 'content', 'is_user', 'timestamp', 'is_rag_response', 'source_documents'
+        ))
+
+    def test_round_trip(self):
+        before = self.snapshot()
+        with mock.patch.object(archive, 'ARCHIVE_BLOB_MESSAGES', 2):
+            report = archive.archive_idle_threads(days=90)
+        self.assertEqual((report['threads'], report['messages']), (1, 5))
+        self.assertFalse(self.thread.messages.exists())
+        self.assertEqual(ArchivedMessageBatch.objects.filter(thread=self.thread).count(), 3)
+
+        self.thread.refresh_from_db()
+        self.assertEqual(self.thread.archived_message_count, 5)
+        self.assertEqual(archive.rehydrate_thread(self.thread), 5)
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(ArchivedMessageBatch.objects.filter(thread=self.thread).exists())
+        self.assertEqual(len(search.search(self.user, 'archived')['results']), 5)
+        # Already restored: nothing to do.
+        self.assertEqual(archive.rehydrate_thread(ChatThread.objects.get(id=self.thread.id)), 0)
+
+    def test_archived_thread_is_found_by_search(self):
+        other = User.objects.create_user('bob', password='secret')
+        message_ids = {row['id'] for row in self.snapshot()}
+        with mock.patch.object(archive, 'ARCHIVE_BLOB_MESSAGES', 2):
+            archive.archive_idle_threads(days=90)
+
+        results = search.search(self.user, 'archived')['results']
+        self.assertEqual({result['message_id'] for result in results}, message_ids)
+        self.assertEqual({result['thread_id'] for result in results}, {self.thread.id})
+        self.assertIn('<mark>archived</mark> message', results[0]['snippet'])
+        self.assertEqual(results[0]['thread_title'], 'Old thread')
+        self.assertEqual(search.search(other, 'archived')['results'], [])
+
+        archive.rehydrate_thread(ChatThread.objects.get(id=self.thread.id))
+        results = search.search(self.user, 'archived')['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len({result['message_id'] for result in results}), 5)
+
+    def test_long_archived_message_gets_an_excerpt(self):
+        Message.objects.create(thread=self.thread, content=' '.join(
+            ['filler'] * 40 + ['needle'] + ['filler'] * 40
+        ))
+        self.idle()
+        archive.archive_idle_threads(days=90)
+        [result] = search.search(self.user, 'needle')['results']
+        self.assertIn('<mark>needle</mark>', result['snippet'])
+        self.assertTrue(result['snippet'].startswith('…') and result['snippet'].endswith('…'))
+        self.assertEqual(len(result['snippet'].split()), search.SNIPPET_TOKENS)
+
+    def test_deleting_an_archived_thread_drops_it_from_search(self):
+        archive.archive_idle_threads(days=90)
+        ChatThread.objects.get(id=self.thread.id).delete()
+        self.assertEqual(search.search(self.user, 'archived')['results'], [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM chat_archive_fts WHERE chat_archive_fts MATCH 'archived'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_rehydrated_thread_is_not_archived_again_right_away(self):
+        archive.archive_idle_threads(days=90)
+        archive.rehydrate_thread(ChatThread.objects.get(id=self.thread.id))
+        self.thread.refresh_from_db()
+        self.assertLess(self.thread.updated_at, timezone.now() - timedelta(days=90))
+        self.assertEqual(archive.archive_idle_threads(days=90)['threads'], 0)
+        self.assertEqual(self.thread.messages.count(), 5)
+
+        ChatThread.objects.filter(id=self.thread.id).update(rehydrated_at=timezone.now() - timedelta(days=91))
+        self.assertEqual(archive.archive_idle_threads(days=90)['threads'], 1)
+
+    def test_thread_active_since_it_was_picked_is_skipped(self):
+        thread_ids = list(archive.idle_threads(days=90).values_list('id', flat=True))
+        ChatThread.objects.filter(id=self.thread.id).update(updated_at=timezone.now())
+        self.assertEqual(archive.archive_threads(thread_ids, days=90), (0, 0, 0, 0))
+        self.assertEqual(self.thread.messages.count(), 5)
+
+    def test_archiving_bumps_the_page_cache_stamp(self):
+        before = get_stamp(self.user.id, CHAT)
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.archive_threads([self.thread.id], days=90)
+        self.assertNotEqual(get_stamp(self.user.id, CHAT), before)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.thread = ChatThread.objects.create(user=self.user, title='Polling')
+        Message.objects.create(thread=self.thread, content='First')
+        self.client.force_login(self.user)
+        self.url = f'/api/threads/{self.thread.id}/'
+
+    def test_etag_answers_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_deleting_a_thread_changes_the_list_etag(self):
+        other = ChatThread.objects.create(user=self.user, title='Doomed')
+        response = self.client.get('/api/threads/')
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(response.json()['count'], 2)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        response = self.client.get('/api/threads/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/chat/clear-chats/')
+        response = self.client.get('/api/threads/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_new_message_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(thread=self.thread, content='Second')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['messages']), 2)
+
+    def test_other_users_threads_are_not_found(self):
+        self.client.force_login(User.objects.create_user('bob', password='secret'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
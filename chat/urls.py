@@ -12,6 +12,7 @@ urlpatterns = [
     path('thread/', views.chat_thread, name='new_thread'),
     path('thread/<int:thread_id>/', views.chat_thread, name='chat_thread'),
     path('send/<int:thread_id>/', views.send_message, name='send_message'),
+    path('search/', views.search_messages, name='search_messages'),
     
     # NEW URLS FOR INDIVIDUAL CHAT DELETION
     path('delete-thread/<int:thread_id>/', views.delete_thread, name='delete_thread'),
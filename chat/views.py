@@ -5,9 +5,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Count, F
+from django.utils import timezone
 import json
 import logging
+from .archive import rehydrate_thread
+from .cache import RAG, cached_query, page_cache_context
 from .models import ChatThread, Message
+from .search import search
 from .services import ChatService
 from rag_system.models import DocumentCollection
 
@@ -70,33 +75,61 @@ def logout_view(request):
 # Dashboard
 @login_required
 def dashboard(request):
-    threads = ChatThread.objects.filter(user=request.user).order_by('-updated_at')[:20]
-    collections = DocumentCollection.objects.filter(user=request.user).order_by('-created_at')
+    # Both querysets stay lazy: they only run when a cached fragment misses.
+    threads = ChatThread.objects.filter(user=request.user).annotate(
+        message_count=Count('messages') + F('archived_message_count')
+    ).order_by('-updated_at')[:20]
+    collections = DocumentCollection.objects.filter(user=request.user).annotate(
+        document_count=Count('documents')
+    ).order_by('-created_at')
     
     return render(request, 'chat/dashboard.html', {
         'threads': threads,
-        'collections': collections
+        'collections': collections,
+        **page_cache_context(request.user.id)
     })
 
 @login_required
 def chat_thread(request, thread_id=None):
     if thread_id:
         thread = get_object_or_404(ChatThread, id=thread_id, user=request.user)
+        rehydrate_thread(thread)
         messages_list = thread.messages.all()
     else:
         thread = ChatThread.objects.create(user=request.user, title="New Conversation")
         messages_list = []
     
-    collections = DocumentCollection.objects.filter(
-        user=request.user, documents__processed=True
-    ).distinct()
+    collections = cached_query(
+        request.user.id, RAG, 'processed_collections',
+        lambda: list(DocumentCollection.objects.filter(
+            user=request.user, documents__processed=True
+        ).distinct())
+    )
     
     return render(request, 'chat/thread.html', {
         'thread': thread,
-        'messages': messages_list,
-        'collections': collections
+        # Not "messages": that name belongs to django.contrib.messages in base.html.
+        'thread_messages': messages_list,
+        'collections': collections,
+        **page_cache_context(request.user.id)
     })
 
+@login_required
+def search_messages(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    
+    try:
+        results = search(request.user, query, page)
+    except Exception as e:
+        logger.error(f"Error searching messages for user {request.user.id}: {str(e)}")
+        return JsonResponse({'success': False, 'error': 'Search failed.'})
+    
+    return JsonResponse({'success': True, 'query': query, **results})
+
 @csrf_exempt
 @login_required
 def send_message(request, thread_id):
@@ -107,12 +140,18 @@ def send_message(request, thread_id):
         data = json.loads(request.body)
         content = data.get('content', '').strip()
         use_rag = data.get('use_rag', False)
-        collection_id = data.get('collection_id')
+        # "collection_ids" searches several collections at once; a single
+        # "collection_id" is still accepted.
+        collection_ids = data.get('collection_ids') or [data.get('collection_id')]
+        if not isinstance(collection_ids, list):
+            collection_ids = [collection_ids]
+        collection_ids = [int(value) for value in collection_ids if str(value or '').isdigit()]
         
         if not content:
             return JsonResponse({'success': False, 'error': 'Message required.'})
         
         thread = get_object_or_404(ChatThread, id=thread_id, user=request.user)
+        rehydrate_thread(thread)
         
         # Save user message
         user_message = Message.objects.create(
@@ -123,9 +162,9 @@ def send_message(request, thread_id):
         
         # Generate AI response
         chat_service = ChatService()
-        if use_rag and collection_id:
+        if use_rag and collection_ids:
             ai_response, sources = chat_service.generate_rag_response(
-                content, collection_id, request.user
+                content, collection_ids, request.user
             )
             ai_message = Message.objects.create(
                 thread=thread,
@@ -148,6 +187,9 @@ def send_message(request, thread_id):
         if thread.messages.filter(is_user=True).count() == 1:
             thread.title = content[:50] + ("..." if len(content) > 50 else "")
             thread.save()
+        else:
+            # Keeps updated_at as "last activity" for ordering and archival.
+            ChatThread.objects.filter(id=thread.id).update(updated_at=timezone.now())
         
         return JsonResponse({
             'success': True,
@@ -0,0 +1,46 @@
+"""Gunicorn settings, picked up automatically when gunicorn runs from the
+project root:
+
+    gunicorn techChat.wsgi
+
+RAG_WARMUP controls when the embedding model and RAG client libraries are
+loaded (see rag_system.services.warm_up):
+
+    ""          lazily, on the first request that needs them
+    preload     the model once in the master, shared copy-on-write by workers
+    post_fork   everything in each worker before it accepts requests
+"""
+import os
+
+from decouple import config
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techChat.settings')
+
+wsgi_app = 'techChat.wsgi:application'
+bind = config('GUNICORN_BIND', default='127.0.0.1:8000')
+workers = config('GUNICORN_WORKERS', default=2, cast=int)
+
+RAG_WARMUP = config('RAG_WARMUP', default='')
+
+preload_app = RAG_WARMUP == 'preload'
+
+
+def _warm_up(include_chroma):
+    import django
+    django.setup()
+
+    from rag_system.services import warm_up
+    warm_up(include_chroma=include_chroma)
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any fork.
+    if preload_app:
+        _warm_up(include_chroma=False)
+
+
+def post_fork(server, worker):
+    # With preload the model is already in memory and only the Chroma client,
+    # which can't be shared across a fork, is opened here.
+    if RAG_WARMUP in ('preload', 'post_fork'):
+        _warm_up(include_chroma=True)
@@ -0,0 +1,2 @@
+"""Load-testing tools: ``loadtest.run`` drives the app over HTTP and
+``loadtest.fake_llm`` stands in for the OpenAI API. See each module for usage."""
@@ -0,0 +1,156 @@
+"""Fake OpenAI-compatible chat completions server for load tests.
+
+    python -m loadtest.fake_llm [--port 8001] [--latency 0.8] [--jitter 0.3]
+                                [--tokens-per-second 0] [--error-rate 0]
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1. Every
+POST to .../chat/completions waits ``latency`` seconds (± ``jitter``, plus
+completion tokens / ``tokens-per-second`` when that is set) and returns a
+canned completion, so the app's own overhead can be measured without paying
+for, or being rate limited by, a real model. ``error-rate`` answers that
+fraction of requests with a 500.
+
+Plain asyncio with keep-alive, no dependencies; it handles thousands of
+concurrent requests on one core.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+WORDS = (
+    "the answer depends on the context provided in the documents and on how the "
+    "system is configured for this particular workload under load"
+).split()
+
+
+class FakeLLM:
+    def __init__(self, latency=0.8, jitter=0.3, tokens_per_second=0.0, error_rate=0.0, completion_tokens=60):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.completion_tokens = completion_tokens
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def completion(self, body):
+        tokens = min(self.completion_tokens, int(body.get('max_tokens') or self.completion_tokens))
+        prompt = " ".join(str(message.get('content', '')) for message in body.get('messages', []))
+        content = " ".join(random.choice(WORDS) for _ in range(tokens))
+        return {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': len(prompt.split()),
+                'completion_tokens': tokens,
+                'total_tokens': len(prompt.split()) + tokens,
+            },
+        }
+
+    def delay(self, tokens):
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if self.tokens_per_second:
+            delay += tokens / self.tokens_per_second
+        return delay
+
+    async def respond(self, method, path, body):
+        if method == 'GET' and path.rstrip('/').endswith('/models'):
+            return 200, {'object': 'list', 'data': [{'id': 'fake', 'object': 'model'}]}
+        if method != 'POST' or not path.rstrip('/').endswith('/chat/completions'):
+            return 404, {'error': {'message': f"{method} {path} not supported", 'type': 'invalid_request_error'}}
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}}
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            payload = self.completion(request)
+            await asyncio.sleep(self.delay(payload['usage']['completion_tokens']))
+            if random.random() < self.error_rate:
+                return 500, {'error': {'message': 'Injected failure', 'type': 'server_error'}}
+            return 200, payload
+        finally:
+            self.in_flight -= 1
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                status, payload = await self.respond(method, path, body)
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, llm, report_every=10.0):
+    server = await asyncio.start_server(llm.handle, host, port, backlog=4096)
+    print(f"fake LLM listening on http://{host}:{port}/v1 "
+          f"(latency {llm.latency}s ±{llm.jitter}s, error rate {llm.error_rate})")
+    async with server:
+        last = 0
+        while True:
+            await asyncio.sleep(report_every)
+            if llm.requests != last:
+                print(f"{llm.requests} completions, {(llm.requests - last) / report_every:.1f}/s, "
+                      f"{llm.in_flight} in flight (peak {llm.peak_in_flight})")
+                last = llm.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.8, help='Base seconds per completion.')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Uniform ± seconds added to the latency.')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Extra generation time; 0 disables.')
+    parser.add_argument('--completion-tokens', type=int, default=60)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    llm = FakeLLM(args.latency, args.jitter, args.tokens_per_second, args.error_rate, args.completion_tokens)
+    try:
+        asyncio.run(serve(args.host, args.port, llm))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
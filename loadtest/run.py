@@ -0,0 +1,369 @@
+"""HTTP load generator for the chat and document endpoints.
+
+    python -m loadtest.run [--base-url http://127.0.0.1:8000] [--users 20]
+                           [--duration 60] [--mix send=6,rag=2,thread=3,upload=1]
+                           [--rate 0 | --think 1.0] [--create-users] [--json]
+
+Each virtual user has its own session: it logs in (signing up first with
+--create-users), opens a new thread and, when the mix needs them, creates a
+collection and uploads a seed document for RAG questions. Then, until
+--duration runs out, it picks actions from --mix by weight:
+
+    send    POST /chat/send/<thread>/            plain chat message
+    rag     POST /chat/send/<thread>/            message answered from the collection
+    thread  GET  /chat/thread/<thread>/          open the conversation page
+    upload  POST /rag/upload/<collection>/       upload a new small .txt document
+
+By default users are closed-loop: each waits for its response, then thinks
+for an exponentially distributed --think seconds. With --rate the arrivals
+are open-loop Poisson at that many requests per second across all users, so
+queueing shows up as latency rather than as lower offered load.
+
+Run the app against the fake model so the numbers measure this node rather
+than the LLM provider:
+
+    pip install -r loadtest/requirements.txt
+    python -m loadtest.fake_llm --latency 0.8 &
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 gunicorn techChat.wsgi -c gunicorn.conf.py &
+    python -m loadtest.run --users 50 --duration 120 --create-users
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+ACTIONS = ('send', 'rag', 'thread', 'upload')
+DEFAULT_MIX = 'send=6,rag=2,thread=3,upload=1'
+
+SEND_URL = re.compile(r'/chat/send/(\d+)/')
+APP_ERROR_PREFIXES = ('Sorry, I encountered an error', 'Error querying documents')
+
+QUESTIONS = [
+    "How do I configure connection pooling for the database?",
+    "Summarise the main points of the deployment guide.",
+    "What are the latency targets mentioned in the documents?",
+    "Explain the difference between the cache layers.",
+    "Which settings control the number of worker processes?",
+]
+
+SEED_TEXT = (
+    "Deployment guide.\n\nThe service runs behind gunicorn with several worker processes. "
+    "Latency targets are 200 milliseconds at the median and one second at the 99th percentile. "
+    "Connection pooling keeps database connections open between requests.\n\n"
+    "Caching.\n\nRendered fragments are cached per user and invalidated by version stamps. "
+    "Embeddings are computed once per chunk and stored in the vector database.\n"
+)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action '{name}' (choose from {', '.join(ACTIONS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("mix has no positive weights")
+    return mix
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(list)
+        self.dropped = 0
+
+    def record(self, endpoint, elapsed, ok, detail=''):
+        self.latencies[endpoint].append(elapsed)
+        if not ok:
+            self.errors[endpoint] += 1
+            if len(self.error_samples[endpoint]) < 3:
+                self.error_samples[endpoint].append(detail)
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            endpoints[endpoint] = {
+                'requests': len(ordered),
+                'errors': self.errors[endpoint],
+                'error_rate': round(self.errors[endpoint] / len(ordered), 4),
+                'throughput': round(len(ordered) / duration, 2) if duration else 0,
+                'mean_ms': round(statistics.fmean(ordered) * 1000, 1),
+                'p50_ms': round(percentile(ordered, 50) * 1000, 1),
+                'p90_ms': round(percentile(ordered, 90) * 1000, 1),
+                'p99_ms': round(percentile(ordered, 99) * 1000, 1),
+                'max_ms': round(ordered[-1] * 1000, 1),
+                'error_samples': self.error_samples[endpoint],
+            }
+        requests = sum(item['requests'] for item in endpoints.values())
+        errors = sum(item['errors'] for item in endpoints.values())
+        return {
+            'duration_seconds': round(duration, 2),
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0,
+            'throughput': round(requests / duration, 2) if duration else 0,
+            'dropped': self.dropped,
+            'endpoints': endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(self, base_url, username, password, timeout):
+        self.username = username
+        self.password = password
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout, follow_redirects=False)
+        self.thread_id = None
+        self.collection_id = None
+        self.uploads = 0
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _csrf_headers(self):
+        return {'X-CSRFToken': self.client.cookies.get('csrftoken', '')}
+
+    async def _form(self, path, data):
+        await self.client.get(path)
+        return await self.client.post(path, data=data, headers=self._csrf_headers())
+
+    # Setup ----------------------------------------------------------------
+
+    async def signup(self):
+        response = await self._form('/chat/signup/', {
+            'username': self.username, 'password': self.password, 'email': f"{self.username}@loadtest.invalid",
+        })
+        # 200 means the form came back, usually "Username already exists".
+        return response.status_code in (200, 302), f"HTTP {response.status_code}"
+
+    async def login(self):
+        response = await self._form('/chat/login/', {'username': self.username, 'password': self.password})
+        ok = response.status_code == 302 and '/login' not in response.headers.get('location', '')
+        return ok, f"HTTP {response.status_code}"
+
+    async def open_new_thread(self):
+        response = await self.client.get('/chat/thread/')
+        match = SEND_URL.search(response.text) if response.status_code == 200 else None
+        if match:
+            self.thread_id = int(match.group(1))
+        return match is not None, f"HTTP {response.status_code}"
+
+    async def create_collection(self):
+        name = f"loadtest-{uuid.uuid4().hex[:8]}"
+        response = await self.client.post(
+            '/rag/create-collection/',
+            data={'name': name, 'description': 'load test'},
+            headers=self._csrf_headers()
+        )
+        if response.status_code != 302:
+            return False, f"HTTP {response.status_code}"
+        listing = await self.client.get('/api/collections/')
+        if listing.status_code != 200:
+            return False, f"collection lookup HTTP {listing.status_code}"
+        for collection in listing.json().get('results', []):
+            if collection['name'] == name:
+                self.collection_id = collection['id']
+                return True, ''
+        return False, 'created collection not found'
+
+    # Actions --------------------------------------------------------------
+
+    async def send(self, use_rag=False):
+        payload = {'content': random.choice(QUESTIONS)}
+        if use_rag:
+            payload.update(use_rag=True, collection_id=self.collection_id)
+        response = await self.client.post(f'/chat/send/{self.thread_id}/', json=payload)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}"
+        data = response.json()
+        if not data.get('success'):
+            return False, data.get('error', '')
+        # Model and retrieval failures come back as a successful message
+        # carrying the error text.
+        answer = data.get('ai_message', {}).get('content', '')
+        if answer.startswith(APP_ERROR_PREFIXES):
+            return False, answer[:200]
+        return True, ''
+
+    async def rag(self):
+        return await self.send(use_rag=True)
+
+    async def thread(self):
+        response = await self.client.get(f'/chat/thread/{self.thread_id}/')
+        return response.status_code == 200, f"HTTP {response.status_code}"
+
+    async def upload(self, text=None):
+        self.uploads += 1
+        # Unique content and name: identical files are rejected as duplicates
+        # and a known name would take the re-index path instead.
+        body = (text or SEED_TEXT) + f"\nUpload {uuid.uuid4().hex}.\n"
+        filename = f"{self.username}-{self.uploads}-{uuid.uuid4().hex[:6]}.txt"
+        response = await self.client.post(
+            f'/rag/upload/{self.collection_id}/',
+            files={'file': (filename, body.encode('utf-8'), 'text/plain')},
+            headers=self._csrf_headers()
+        )
+        ok = response.status_code == 302 and '/collection/' in response.headers.get('location', '')
+        return ok, f"HTTP {response.status_code}"
+
+
+async def timed(stats, endpoint, call):
+    started = time.perf_counter()
+    try:
+        ok, detail = await call()
+    except (httpx.HTTPError, ValueError) as e:
+        ok, detail = False, f"{type(e).__name__}: {e}"
+    stats.record(endpoint, time.perf_counter() - started, ok, detail)
+    return ok
+
+
+async def set_up(user, args, needs_collection, stats):
+    if args.create_users and not await timed(stats, 'setup:signup', user.signup):
+        return False
+    if not await timed(stats, 'setup:login', user.login):
+        return False
+    if not await timed(stats, 'setup:new_thread', user.open_new_thread):
+        return False
+    if needs_collection:
+        if not await timed(stats, 'setup:create_collection', user.create_collection):
+            return False
+        if not await timed(stats, 'setup:seed_upload', user.upload):
+            return False
+    return True
+
+
+def choose(mix):
+    names = list(mix)
+    return random.choices(names, weights=[mix[name] for name in names])[0]
+
+
+async def closed_loop(user, mix, think, deadline, stats):
+    while time.perf_counter() < deadline:
+        action = choose(mix)
+        await timed(stats, action, getattr(user, action))
+        if think > 0:
+            await asyncio.sleep(min(random.expovariate(1 / think), max(0.0, deadline - time.perf_counter())))
+
+
+async def open_loop(users, mix, rate, deadline, max_in_flight, stats):
+    in_flight = set()
+    while True:
+        await asyncio.sleep(random.expovariate(rate))
+        if time.perf_counter() >= deadline:
+            break
+        if len(in_flight) >= max_in_flight:
+            stats.dropped += 1
+            continue
+        user = random.choice(users)
+        action = choose(mix)
+        task = asyncio.create_task(timed(stats, action, getattr(user, action)))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def run(args):
+    mix = {name: weight for name, weight in args.mix.items() if weight > 0}
+    needs_collection = 'rag' in mix or 'upload' in mix
+    users = [
+        VirtualUser(args.base_url, f"{args.user_prefix}{i}", args.password, args.timeout)
+        for i in range(args.users)
+    ]
+    stats = Stats()
+    try:
+        setup_limit = asyncio.Semaphore(args.setup_concurrency)
+
+        async def limited_set_up(user):
+            async with setup_limit:
+                return await set_up(user, args, needs_collection, stats)
+
+        print(f"setting up {len(users)} users against {args.base_url} ...", file=sys.stderr)
+        ready = await asyncio.gather(*(limited_set_up(user) for user in users))
+        users = [user for user, ok in zip(users, ready) if ok]
+        if not users:
+            print("no user could be set up; check --base-url, --password and --create-users", file=sys.stderr)
+            return stats.report(0)
+
+        mode = f"open loop at {args.rate}/s" if args.rate else f"closed loop, think {args.think}s"
+        print(f"{len(users)} users ready; running {args.duration}s ({mode}, mix {mix})", file=sys.stderr)
+        load = Stats()
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.rate:
+            await open_loop(users, mix, args.rate, deadline, args.max_in_flight, load)
+        else:
+            await asyncio.gather(*(closed_loop(user, mix, args.think, deadline, load) for user in users))
+        report = load.report(time.perf_counter() - started)
+        report['users'] = len(users)
+        report['setup'] = stats.report(0)['endpoints']
+        return report
+    finally:
+        await asyncio.gather(*(user.close() for user in users), return_exceptions=True)
+
+
+def print_report(report):
+    header = f"{'endpoint':<24} {'reqs':>7} {'err%':>6} {'req/s':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, item in report['endpoints'].items():
+        print(
+            f"{name:<24} {item['requests']:>7} {item['error_rate'] * 100:>5.1f}% {item['throughput']:>7.2f} "
+            f"{item['p50_ms']:>6.0f}ms {item['p90_ms']:>6.0f}ms {item['p99_ms']:>6.0f}ms {item['max_ms']:>6.0f}ms"
+        )
+    print('-' * len(header))
+    print(
+        f"{'total':<24} {report['requests']:>7} {report['error_rate'] * 100:>5.1f}% {report['throughput']:>7.2f}"
+        f"   over {report['duration_seconds']}s with {report.get('users', 0)} users"
+        + (f", {report['dropped']} arrivals dropped" if report['dropped'] else '')
+    )
+    for name, item in report['endpoints'].items():
+        for sample in item['error_samples']:
+            print(f"  {name} error: {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of load after setup.')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Action weights (default {DEFAULT_MIX}).')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean think time between actions (closed loop).')
+    parser.add_argument('--rate', type=float, default=0.0, help='Open-loop arrivals per second across all users.')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='Open loop: drop arrivals beyond this.')
+    parser.add_argument('--create-users', action='store_true', help='Sign the users up before logging in.')
+    parser.add_argument('--user-prefix', default='loadtest-user-')
+    parser.add_argument('--password', default='loadtest-password')
+    parser.add_argument('--setup-concurrency', type=int, default=10)
+    parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds.')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report['requests'] == 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
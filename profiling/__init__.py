@@ -0,0 +1 @@
+"""Opt-in sampling profiler for individual requests (see middleware.py)."""
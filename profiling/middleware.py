@@ -0,0 +1,122 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries the PROFILING_HEADER with the
+PROFILING_TOKEN as value (staff users may send any value), or when it is
+picked by PROFILING_SAMPLE_RATE. Profiled requests run under the stack
+sampler with every database query timed, and the result is saved to
+PROFILING_DIR; the response carries the profile id in X-Profile-Id.
+
+With PROFILING_ENABLED off the middleware removes itself from the chain at
+startup. When it is on, requests that are not picked cost one header lookup
+and one random() call.
+"""
+import logging
+import random
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+from .sampler import StackSampler
+from .storage import save_profile
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = 10
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that times every query of the profiled request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.statements[sql] += 1
+            self.slowest.append((elapsed, sql))
+            if len(self.slowest) > SLOW_QUERIES * 4:
+                self.slowest = sorted(self.slowest, reverse=True)[:SLOW_QUERIES]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'ms': round(self.seconds * 1000, 2),
+            'duplicates': sum(n - 1 for n in self.statements.values() if n > 1),
+            'slowest': [
+                {'ms': round(elapsed * 1000, 2), 'sql': sql[:500]}
+                for elapsed, sql in sorted(self.slowest, reverse=True)[:SLOW_QUERIES]
+            ],
+        }
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.paths = tuple(settings.PROFILING_PATHS)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        return self.profile(request)
+
+    def should_profile(self, request):
+        value = request.META.get(self.header)
+        if value is not None:
+            token = settings.PROFILING_TOKEN
+            if token and constant_time_compare(value, token):
+                return True
+            user = getattr(request, 'user', None)
+            return bool(user is not None and user.is_staff)
+        if self.sample_rate and random.random() < self.sample_rate:
+            return not self.paths or request.path.startswith(self.paths)
+        return False
+
+    def profile(self, request):
+        recorder = QueryRecorder()
+        wrappers = [connection.execute_wrapper(recorder) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        sampler = StackSampler(interval=settings.PROFILING_INTERVAL_MS / 1000).start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+        user = getattr(request, 'user', None)
+        summary = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user': user.get_username() if user is not None and user.is_authenticated else None,
+            'trigger': 'header' if self.header in request.META else 'sample',
+            'ms': round(elapsed * 1000, 2),
+            'samples': sampler.samples,
+            'interval_ms': settings.PROFILING_INTERVAL_MS,
+            'sql': recorder.summary(),
+        }
+        try:
+            response['X-Profile-Id'] = save_profile(summary, sampler.stacks)
+        except OSError as e:
+            logger.error(f"Could not save profile for {request.path}: {str(e)}")
+        return response
@@ -0,0 +1,83 @@
+"""Wall-clock stack sampler for one thread.
+
+A background thread reads the target thread's current frame from
+``sys._current_frames()`` every ``interval`` seconds and counts each call
+stack in folded form ("outer;inner;innermost"), the input format of
+flamegraph.pl and speedscope. Nothing is hooked into the profiled thread,
+so overhead is limited to the sampler itself and the measured code runs at
+full speed between samples.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+
+_SITE_PACKAGES = os.path.dirname(os.path.dirname(django.__file__))
+
+
+def _short_path(filename):
+    for root in (str(settings.BASE_DIR), _SITE_PACKAGES):
+        if filename.startswith(root):
+            return os.path.relpath(filename, root)
+    return filename
+
+
+class StackSampler:
+    def __init__(self, thread_id=None, interval=0.005, max_depth=200):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _label(self, code):
+        # Code objects are long-lived, so their labels are built once.
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == me:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+
+def profile_call(func, interval=0.005):
+    """Run ``func()`` under a sampler; returns (result, sampler, seconds)."""
+    sampler = StackSampler(interval=interval).start()
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+    return result, sampler, elapsed
@@ -0,0 +1,84 @@
+"""Profiles on disk: ``<id>.json`` holds the request summary and SQL stats,
+``<id>.folded`` the sampled stacks (one "frame;frame;frame count" per line,
+open it with speedscope or flamegraph.pl). Ids sort by time."""
+import json
+import os
+import re
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+
+def _path(profile_id, suffix):
+    if not _ID.match(profile_id or ''):
+        raise FileNotFoundError(profile_id)
+    return os.path.join(settings.PROFILING_DIR, f"{profile_id}{suffix}")
+
+
+def function_totals(stacks, limit=30):
+    """Self and total sample counts per function, busiest first."""
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        {'function': frame, 'self': self_counts[frame], 'total': total}
+        for frame, total in total_counts.most_common(limit)
+    ]
+
+
+def save_profile(summary, stacks):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    summary = dict(summary, id=profile_id, functions=function_totals(stacks))
+    with open(_path(profile_id, '.folded'), 'w', encoding='utf-8') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    # The summary is written last: listings only pick up complete profiles.
+    with open(_path(profile_id, '.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f)
+    prune(settings.PROFILING_KEEP)
+    return profile_id
+
+
+def profile_ids():
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-5] for name in names if name.endswith('.json') and _ID.match(name[:-5])), reverse=True)
+
+
+def load_profile(profile_id):
+    with open(_path(profile_id, '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_stacks(profile_id):
+    stacks = Counter()
+    with open(_path(profile_id, '.folded'), encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def folded_path(profile_id):
+    return _path(profile_id, '.folded')
+
+
+def prune(keep):
+    for profile_id in profile_ids()[keep:]:
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(_path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
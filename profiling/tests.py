@@ -0,0 +1,119 @@
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import storage
+from .middleware import ProfilingMiddleware
+from .views import _flame_rows
+
+
+def slow_view(request):
+    User.objects.count()
+    time.sleep(0.05)
+    return HttpResponse('ok')
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles, ignore_errors=True)
+        overrides = override_settings(
+            PROFILING_ENABLED=True,
+            PROFILING_DIR=self.profiles,
+            PROFILING_TOKEN='secret-token',
+            PROFILING_SAMPLE_RATE=0.0,
+            PROFILING_PATHS=[],
+            PROFILING_INTERVAL_MS=1,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.factory = RequestFactory()
+
+
+class MiddlewareTests(ProfilingTestCase):
+    def test_disabled_middleware_removes_itself(self):
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(slow_view)
+
+    def test_sampled_request_is_stored(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            middleware = ProfilingMiddleware(slow_view)
+            response = middleware(self.factory.get('/chat/dashboard/'))
+
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(storage.profile_ids(), [profile_id])
+        profile = storage.load_profile(profile_id)
+        self.assertEqual((profile['method'], profile['path'], profile['status']), ('GET', '/chat/dashboard/', 200))
+        self.assertEqual(profile['trigger'], 'sample')
+        self.assertEqual(profile['sql']['count'], 1)
+        self.assertGreater(profile['samples'], 0)
+        self.assertTrue(any('slow_view' in stack for stack in storage.load_stacks(profile_id)))
+
+    def test_sample_rate_respects_paths(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_PATHS=['/rag/']):
+            middleware = ProfilingMiddleware(slow_view)
+            self.assertNotIn('X-Profile-Id', middleware(self.factory.get('/chat/dashboard/')))
+            self.assertIn('X-Profile-Id', middleware(self.factory.get('/rag/')))
+
+    def test_header_needs_the_token_or_a_staff_user(self):
+        middleware = ProfilingMiddleware(slow_view)
+        request = self.factory.get('/', HTTP_X_PROFILE='wrong')
+        request.user = User.objects.create_user('alice', password='secret')
+        self.assertNotIn('X-Profile-Id', middleware(request))
+
+        request = self.factory.get('/', HTTP_X_PROFILE='secret-token')
+        request.user = User.objects.get(username='alice')
+        response = middleware(request)
+        self.assertEqual(storage.load_profile(response['X-Profile-Id'])['user'], 'alice')
+
+        request = self.factory.get('/', HTTP_X_PROFILE='1')
+        request.user = User.objects.create_user('root', password='secret', is_staff=True)
+        self.assertIn('X-Profile-Id', middleware(request))
+        self.assertEqual(len(storage.profile_ids()), 2)
+
+
+class ViewTests(ProfilingTestCase):
+    def setUp(self):
+        super().setUp()
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            self.profile_id = ProfilingMiddleware(slow_view)(self.factory.get('/slow/'))['X-Profile-Id']
+        self.urls = [
+            '/profiles/',
+            f'/profiles/{self.profile_id}/',
+            f'/profiles/{self.profile_id}/folded/',
+        ]
+
+    def test_views_are_staff_only(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+        self.client.force_login(User.objects.create_user('alice', password='secret'))
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 302, url)
+
+        self.client.force_login(User.objects.create_user('root', password='secret', is_staff=True))
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+        self.assertContains(self.client.get('/profiles/'), '/slow/')
+
+    def test_unknown_profile_is_404(self):
+        self.client.force_login(User.objects.create_user('root', password='secret', is_staff=True))
+        self.assertEqual(self.client.get('/profiles/20260101T000000-deadbeef/').status_code, 404)
+        self.assertEqual(self.client.get('/profiles/..%2Fsettings/').status_code, 404)
+
+
+class FlameGraphTests(TestCase):
+    def test_cells_nest_under_their_parents(self):
+        cells, depth = _flame_rows({'main;a;b': 3, 'main;a': 1, 'main;c': 4})
+        by_frame = {cell['frame']: cell for cell in cells}
+        self.assertEqual(depth, 3)
+        self.assertEqual(by_frame['main']['width'], 100)
+        self.assertEqual((by_frame['a']['left'], by_frame['a']['width']), (0, 50))
+        self.assertEqual((by_frame['c']['left'], by_frame['c']['width']), (50, 50))
+        self.assertEqual(by_frame['b']['depth'], 2)
+        self.assertEqual(_flame_rows({}), ([], 0))
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.profile_list, name='profile_list'),
+    path('<str:profile_id>/', views.profile_detail, name='profile_detail'),
+    path('<str:profile_id>/folded/', views.profile_download, name='profile_download'),
+]
@@ -0,0 +1,81 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from . import storage
+
+FLAME_MIN_FRACTION = 0.005
+
+
+def _flame_rows(stacks):
+    """Flame graph cells as absolutely positioned boxes: merge the folded
+    stacks into a tree and lay each node out under its parent, dropping
+    nodes below FLAME_MIN_FRACTION of all samples."""
+    total = sum(stacks.values())
+    if not total:
+        return [], 0
+    root = {}
+    for stack, count in stacks.items():
+        level = root
+        for frame in stack.split(';'):
+            node = level.setdefault(frame, [0, {}])
+            node[0] += count
+            level = node[1]
+
+    cells = []
+    depth_max = 0
+
+    def walk(level, depth, offset):
+        nonlocal depth_max
+        for frame, (count, children) in sorted(level.items()):
+            if count / total >= FLAME_MIN_FRACTION:
+                depth_max = max(depth_max, depth)
+                cells.append({
+                    'frame': frame,
+                    'name': frame.split(' (', 1)[0],
+                    'samples': count,
+                    'depth': depth,
+                    'left': round(100 * offset / total, 3),
+                    'width': round(100 * count / total, 3),
+                    'percent': round(100 * count / total, 1),
+                })
+                walk(children, depth + 1, offset)
+            offset += count
+
+    walk(root, 0, 0)
+    return cells, depth_max + 1
+
+
+@staff_member_required
+def profile_list(request):
+    profiles = []
+    for profile_id in storage.profile_ids()[:200]:
+        try:
+            profiles.append(storage.load_profile(profile_id))
+        except (OSError, ValueError):
+            continue
+    return render(request, 'profiling/profile_list.html', {'profiles': profiles})
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    try:
+        profile = storage.load_profile(profile_id)
+        stacks = storage.load_stacks(profile_id)
+    except (OSError, ValueError):
+        raise Http404("Profile not found")
+    cells, depth = _flame_rows(stacks)
+    return render(request, 'profiling/profile_detail.html', {
+        'profile': profile,
+        'cells': cells,
+        'flame_height': depth * 18,
+    })
+
+
+@staff_member_required
+def profile_download(request, profile_id):
+    try:
+        f = open(storage.folded_path(profile_id), 'rb')
+    except OSError:
+        raise Http404("Profile not found")
+    return FileResponse(f, as_attachment=True, filename=f"{profile_id}.folded", content_type='text/plain')
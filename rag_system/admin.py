@@ -5,8 +5,8 @@ from .models import DocumentCollection, Document, DocumentChunk
 
 @admin.register(DocumentCollection)
 class DocumentCollectionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'user', 'document_count', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['id', 'name', 'user', 'document_count', 'chunk_strategy', 'vector_storage', 'created_at']
+    list_filter = ['created_at', 'chunk_strategy', 'vector_storage']
     search_fields = ['name', 'user__username', 'description']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
@@ -17,10 +17,10 @@ class DocumentCollectionAdmin(admin.ModelAdmin):
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'collection', 'file_type', 'file_size_mb', 'processed', 'chunk_count', 'uploaded_at']
+    list_display = ['filename', 'collection', 'file_type', 'file_size_mb', 'version', 'processed', 'chunk_count', 'uploaded_at']
     list_filter = ['file_type', 'processed', 'uploaded_at']
     search_fields = ['filename', 'collection__name', 'collection__user__username']
-    readonly_fields = ['id', 'uploaded_at', 'file_size', 'chroma_collection_name']
+    readonly_fields = ['id', 'uploaded_at', 'file_size', 'chroma_collection_name', 'content_hash', 'version']
     ordering = ['-uploaded_at']
     
     def file_size_mb(self, obj):
@@ -0,0 +1,53 @@
+"""Read-only JSON API for document collections and documents.
+
+Counts are annotated and nested documents prefetched, so each endpoint runs
+a fixed number of queries. Conditional GET works as in ``chat.api``, but on
+the ETag alone: re-indexing, processing and deleting documents move no
+timestamp, so a Last-Modified here would go stale.
+"""
+from django.db.models import Count, Prefetch
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from chat.api import paginated
+from chat.cache import RAG, conditional_get
+
+from .models import Document, DocumentCollection
+from .serializers import DocumentCollectionDetailSerializer, DocumentCollectionSerializer, DocumentSerializer
+
+
+def user_collections(user):
+    return DocumentCollection.objects.filter(user=user).annotate(document_count=Count('documents'))
+
+
+@api_view(['GET'])
+@conditional_get(RAG)
+def collection_list(request):
+    return paginated(request, user_collections(request.user).order_by('-created_at'), DocumentCollectionSerializer)
+
+
+@api_view(['GET'])
+@conditional_get(RAG)
+def collection_detail(request, collection_id):
+    collection = get_object_or_404(
+        user_collections(request.user).prefetch_related(
+            Prefetch('documents', queryset=Document.objects.order_by('-uploaded_at'))
+        ),
+        id=collection_id
+    )
+    return Response(DocumentCollectionDetailSerializer(collection).data)
+
+
+@api_view(['GET'])
+@conditional_get(RAG)
+def collection_documents(request, collection_id):
+    collection = get_object_or_404(DocumentCollection, id=collection_id, user=request.user)
+    return paginated(request, collection.documents.order_by('-uploaded_at'), DocumentSerializer)
+
+
+@api_view(['GET'])
+@conditional_get(RAG)
+def document_detail(request, document_id):
+    document = get_object_or_404(Document, id=document_id, collection__user=request.user)
+    return Response(DocumentSerializer(document).data)
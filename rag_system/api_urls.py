@@ -0,0 +1,9 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('collections/', api.collection_list, name='api_collection_list'),
+    path('collections/<int:collection_id>/', api.collection_detail, name='api_collection_detail'),
+    path('collections/<int:collection_id>/documents/', api.collection_documents, name='api_collection_documents'),
+    path('documents/<uuid:document_id>/', api.document_detail, name='api_document_detail'),
+]
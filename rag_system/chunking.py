@@ -0,0 +1,235 @@
+"""Token-aware chunking.
+
+The embedding model only sees its first ``max_seq_length`` word pieces
+(256 for all-MiniLM-L6-v2, special tokens included) and silently drops the
+rest, so chunks are measured with the model's own tokenizer rather than in
+characters. All pages (or blocks) of a document are tokenized in one batched
+call and chunk text is cut from the token offsets, so nothing is tokenized
+twice.
+
+A fast tokenizer keeps its truncation and padding settings as mutable
+state, and ``model.encode`` turns truncation on, so while it runs on
+another thread (ingest workers, the query encoder) a shared tokenizer can
+hand back truncated offsets. Every thread chunks with its own copy.
+
+Strategies, chosen per collection:
+
+    characters  the original RecursiveCharacterTextSplitter (1000/200 chars)
+    tokens      fixed windows of ``chunk_size_tokens`` with token overlap
+    structure   paragraphs and headings packed up to ``chunk_size_tokens``;
+                a heading starts a new chunk (and stays with the text
+                under it); only paragraphs longer than the budget are
+                windowed, with overlap
+"""
+import copy
+import re
+import statistics
+import threading
+from dataclasses import dataclass
+
+LEGACY_CHUNK_SIZE = 1000
+LEGACY_CHUNK_OVERLAP = 200
+
+# [CLS] and [SEP] count against the model window.
+SPECIAL_TOKENS = 2
+
+_BLOCK_SPLIT = re.compile(r'\n\s*\n')
+_HEADING = re.compile(
+    r'^(#{1,6}\s+\S.*'                       # markdown heading
+    r'|(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+[A-Z].{0,80}'  # "2.1 Scope", "IV. Results"
+    r'|[A-Z][A-Z0-9 ,:&/()\-]{2,80})$'       # SHOUTED TITLE
+)
+
+
+@dataclass
+class Chunk:
+    text: str
+    page_number: int = None
+    token_count: int = 0
+
+
+class WhitespaceTokenizer:
+    """Stand-in with the HF tokenizer call signature, used when the embedding
+    model (and so its tokenizer) is unavailable. Counts words, not word pieces."""
+
+    _TOKEN = re.compile(r'\S+')
+
+    def __call__(self, texts, **kwargs):
+        return {
+            'offset_mapping': [
+                [match.span() for match in self._TOKEN.finditer(text)] for text in texts
+            ]
+        }
+
+
+_local = threading.local()
+
+
+def thread_tokenizer(tokenizer):
+    """The calling thread's copy of ``tokenizer``."""
+    if isinstance(tokenizer, WhitespaceTokenizer):
+        return tokenizer
+    copies = getattr(_local, 'copies', None)
+    if copies is None:
+        copies = _local.copies = {}
+    # The original is kept alongside so its id can't be reused.
+    original, private = copies.get(id(tokenizer), (None, None))
+    if original is not tokenizer:
+        private = copy.deepcopy(tokenizer)
+        copies[id(tokenizer)] = (tokenizer, private)
+    return private
+
+
+def model_tokenizer(model):
+    """(tokenizer, max tokens per chunk) for a SentenceTransformer, or a
+    whitespace fallback when no model is loaded."""
+    if model is None or getattr(model, 'tokenizer', None) is None:
+        return WhitespaceTokenizer(), 256 - SPECIAL_TOKENS
+    return model.tokenizer, model.max_seq_length - SPECIAL_TOKENS
+
+
+class ChunkingEngine:
+    def __init__(self, tokenizer, max_tokens, overlap_tokens=0, strategy='structure'):
+        self.tokenizer = tokenizer
+        self.max_tokens = max(8, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.strategy = strategy
+        self._legacy_splitter = None
+
+    @classmethod
+    def for_collection(cls, collection, model):
+        tokenizer, window = model_tokenizer(model)
+        max_tokens = min(collection.chunk_size_tokens or window, window)
+        return cls(tokenizer, max_tokens, collection.chunk_overlap_tokens, collection.chunk_strategy)
+
+    def split_pages(self, pages):
+        """Split ``[(page_number, text), ...]`` into a list of ``Chunk``."""
+        pages = [(number, text) for number, text in pages if text and text.strip()]
+        if not pages:
+            return []
+        if self.strategy == 'characters':
+            return self._split_legacy(pages)
+        if self.strategy == 'tokens':
+            return self._split_windows(pages)
+        return self._split_structure(pages)
+
+    def count_tokens(self, texts):
+        if not texts:
+            return []
+        return [len(offsets) for offsets in self._offsets(texts)]
+
+    def _offsets(self, texts):
+        encoded = thread_tokenizer(self.tokenizer)(
+            list(texts),
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return encoded['offset_mapping']
+
+    def _split_legacy(self, pages):
+        if self._legacy_splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._legacy_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=LEGACY_CHUNK_SIZE,
+                chunk_overlap=LEGACY_CHUNK_OVERLAP
+            )
+        text = "\n".join(text for _, text in pages)
+        return [Chunk(text=chunk) for chunk in self._legacy_splitter.split_text(text)]
+
+    def _split_windows(self, pages):
+        chunks = []
+        for (number, text), offsets in zip(pages, self._offsets([text for _, text in pages])):
+            chunks.extend(self._windows(text, offsets, number))
+        return chunks
+
+    def _windows(self, text, offsets, page_number, prefix='', prefix_tokens=0):
+        """Cut ``text`` into windows of at most ``max_tokens``; ``prefix``
+        (e.g. a heading) is prepended to the first window and counted
+        against its budget."""
+        chunks = []
+        start = 0
+        budget = self.max_tokens - prefix_tokens
+        while start < len(offsets):
+            end = min(start + budget, len(offsets))
+            piece = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if prefix:
+                piece = f"{prefix}\n\n{piece}"
+            if piece:
+                chunks.append(Chunk(text=piece, page_number=page_number, token_count=end - start + prefix_tokens))
+            if end == len(offsets):
+                break
+            start = max(start + 1, end - self.overlap_tokens)
+            budget, prefix, prefix_tokens = self.max_tokens, '', 0
+        return chunks
+
+    def _split_structure(self, pages):
+        blocks = []
+        for number, text in pages:
+            for block in _BLOCK_SPLIT.split(text):
+                block = block.strip()
+                if block:
+                    blocks.append((number, block))
+        if not blocks:
+            return []
+
+        chunks = []
+        current, current_tokens, current_page = [], 0, None
+        # Headings waiting for the body text that follows them.
+        headings_only = False
+
+        def flush():
+            if current:
+                chunks.append(Chunk(text="\n\n".join(current), page_number=current_page, token_count=current_tokens))
+
+        for (number, block), offsets in zip(blocks, self._offsets([block for _, block in blocks])):
+            size = len(offsets)
+            if size == 0:
+                continue
+            is_heading = '\n' not in block and bool(_HEADING.match(block))
+            if size > self.max_tokens:
+                if headings_only and number == current_page and current_tokens <= self.max_tokens // 4:
+                    chunks.extend(self._windows(block, offsets, number, "\n\n".join(current), current_tokens))
+                else:
+                    flush()
+                    chunks.extend(self._windows(block, offsets, number))
+                current, current_tokens, headings_only = [], 0, False
+                continue
+            starts_section = is_heading and not headings_only
+            if current and (starts_section or number != current_page or current_tokens + size > self.max_tokens):
+                flush()
+                current, current_tokens = [], 0
+            if not current:
+                current_page = number
+                headings_only = True
+            headings_only = headings_only and is_heading
+            current.append(block)
+            current_tokens += size
+        flush()
+        return chunks
+
+
+def chunk_length_stats(token_counts, limit=None):
+    """Distribution of chunk lengths in tokens; ``over_limit`` counts chunks
+    the model would truncate."""
+    if not token_counts:
+        return {'count': 0}
+    ordered = sorted(token_counts)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    stats = {
+        'count': len(ordered),
+        'total_tokens': sum(ordered),
+        'min': ordered[0],
+        'mean': round(statistics.fmean(ordered), 1),
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': ordered[-1],
+    }
+    if limit is not None:
+        stats['over_limit'] = sum(1 for count in ordered if count > limit)
+    return stats
@@ -0,0 +1,153 @@
+"""Post-retrieval context compression.
+
+Retrieved chunks overlap (token windows share ``chunk_overlap_tokens`` with
+their neighbour, the legacy splitter 200 characters) and most of their
+sentences have nothing to do with the question. Before the LLM call the
+candidates are reduced to the sentences that matter:
+
+1. the text a chunk shares with the previous chunk of the same document is
+   cut, and sentences seen before are dropped;
+2. every remaining sentence is scored against the query by the share of
+   query terms it contains plus the cosine similarity of its chunk's
+   embedding with the query embedding. Both vectors come back from
+   retrieval, so compression runs no model: a sentence inherits its
+   chunk's relevance, and the terms pick the sentences within a chunk.
+   Earlier-ranked chunks get a small bonus;
+3. the best sentences are packed into the token budget, skipping those far
+   below the best score, and put back in retrieval order, one paragraph
+   per chunk.
+
+Prompt tokens are counted with tiktoken when it is installed and estimated
+(words and punctuation) otherwise.
+"""
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+MIN_OVERLAP_CHARS = 20
+RANK_BONUS = 0.02
+# Sentences scoring under this fraction of the best one are left out even
+# when the budget has room.
+MIN_RELATIVE_SCORE = 0.5
+MIN_SENTENCE_CHARS = 3
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+_WORD = re.compile(r'\w+')
+_APPROX_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_prompt_tokens(text):
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('o200k_base')
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(_APPROX_TOKEN.findall(text))
+
+
+def trim_overlap(previous, text):
+    """``text`` without the prefix it shares with the end of ``previous``."""
+    anchor = text[:MIN_OVERLAP_CHARS]
+    if len(anchor) < MIN_OVERLAP_CHARS:
+        return text
+    start = previous.find(anchor)
+    while start != -1:
+        if text.startswith(previous[start:]):
+            return text[len(previous) - start:].lstrip()
+        start = previous.find(anchor, start + 1)
+    return text
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if len(sentence.strip()) >= MIN_SENTENCE_CHARS]
+
+
+@dataclass
+class CompressedContext:
+    text: str
+    used_hits: list = field(default_factory=list)
+    sentences_in: int = 0
+    sentences_out: int = 0
+
+
+def _without_overlaps(hits):
+    """Chunk texts with the text shared with the previous chunk of the same
+    document removed; the earlier chunk keeps it."""
+    texts = [hit['text'] or '' for hit in hits]
+    by_position = {}
+    for i, hit in enumerate(hits):
+        metadata = hit['metadata']
+        key = (getattr(hit.get('collection'), 'id', None), metadata.get('document_id'), metadata.get('chunk_index'))
+        if key[1] is not None and key[2] is not None:
+            by_position[key] = i
+    for (collection_id, document_id, chunk_index), i in by_position.items():
+        previous = by_position.get((collection_id, document_id, chunk_index - 1))
+        if previous is not None:
+            texts[i] = trim_overlap(hits[previous]['text'] or '', texts[i])
+    return texts
+
+
+def _scores(query, sentences, ranks, hits, query_embedding):
+    terms = {word for word in _WORD.findall(query.lower()) if len(word) > 2}
+    similarity = np.array([
+        len(terms & set(_WORD.findall(sentence.lower()))) / (len(terms) or 1)
+        for sentence in sentences
+    ], dtype=np.float32)
+    embeddings = [hit.get('embedding') for hit in hits]
+    if query_embedding is not None and all(embedding is not None for embedding in embeddings):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        chunk_similarity = vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+        similarity += chunk_similarity[ranks]
+    return similarity + RANK_BONUS / (1.0 + np.asarray(ranks, dtype=np.float32))
+
+
+def compress_context(query, hits, token_budget, query_embedding=None):
+    """Pack the sentences of ``hits`` (best first) most relevant to
+    ``query`` into ``token_budget`` prompt tokens. Hits may carry the
+    ``embedding`` of their chunk, as returned by retrieval."""
+    sentences, ranks, seen = [], [], set()
+    for rank, text in enumerate(_without_overlaps(hits)):
+        for sentence in split_sentences(text):
+            key = ' '.join(sentence.lower().split())
+            if key in seen:
+                continue
+            seen.add(key)
+            sentences.append(sentence)
+            ranks.append(rank)
+    if not sentences:
+        return CompressedContext('')
+
+    scores = _scores(query, sentences, ranks, hits, query_embedding)
+    floor = scores.max() * MIN_RELATIVE_SCORE if scores.max() > 0 else -np.inf
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind='stable'):
+        if scores[i] < floor:
+            break
+        tokens = count_prompt_tokens(sentences[i]) + 1
+        if used + tokens > token_budget:
+            continue
+        chosen.append(int(i))
+        used += tokens
+
+    # Sentences were collected in rank, then text order; sorting the chosen
+    # indexes restores that order.
+    paragraphs = {}
+    for i in sorted(chosen):
+        paragraphs.setdefault(ranks[i], []).append(sentences[i])
+    return CompressedContext(
+        text="\n\n".join(' '.join(paragraph) for paragraph in paragraphs.values()),
+        used_hits=list(paragraphs),
+        sentences_in=len(sentences),
+        sentences_out=len(chosen),
+    )
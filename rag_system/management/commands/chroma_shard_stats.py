@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from rag_system.sharding import existing_locations, location_stats, shard_count, shard_path
+
+
+class Command(BaseCommand):
+    help = "Report collections, vectors, disk size and query latency of every Chroma store."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--probes', type=int, default=5, help='Timed queries per collection.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        configured = {str(shard_path(shard)) for shard in range(shard_count())}
+        stats = []
+        for location in existing_locations():
+            row = location_stats(location, probes=options['probes'])
+            row['active'] = row['path'] in configured
+            stats.append(row)
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        if not stats:
+            self.stdout.write("No Chroma stores found.")
+            return
+        for row in stats:
+            latency = (
+                f"query p50 {row['query_ms_p50']} ms, max {row['query_ms_max']} ms"
+                if row['query_ms_p50'] is not None else "no vectors to query"
+            )
+            self.stdout.write(
+                f"{row['path']}{' (not in use, migrate it)' if row['collections'] and not row['active'] else ''}: "
+                f"{row['collections']} collections, {row['vectors']} vectors, "
+                f"{row['bytes'] / 1024 / 1024:.1f} MB ({row['sqlite_bytes'] / 1024 / 1024:.1f} MB sqlite), {latency}"
+            )
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_system.chunking import ChunkingEngine, chunk_length_stats
+from rag_system.models import DocumentChunk, DocumentCollection
+from rag_system.services import get_embedding_model
+
+
+class Command(BaseCommand):
+    help = "Report the token-length distribution of a collection's stored chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('collection_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            collection = DocumentCollection.objects.get(id=options['collection_id'])
+        except DocumentCollection.DoesNotExist:
+            raise CommandError(f"Collection {options['collection_id']} does not exist.")
+
+        chunker = ChunkingEngine.for_collection(collection, get_embedding_model())
+        contents = DocumentChunk.objects.filter(
+            document__collection=collection
+        ).values_list('content', flat=True).iterator(chunk_size=options['batch_size'])
+
+        token_counts, batch = [], []
+        for content in contents:
+            batch.append(content)
+            if len(batch) >= options['batch_size']:
+                token_counts.extend(chunker.count_tokens(batch))
+                batch = []
+        token_counts.extend(chunker.count_tokens(batch))
+
+        stats = chunk_length_stats(token_counts, limit=chunker.max_tokens)
+        stats['strategy'] = collection.chunk_strategy
+        stats['model_limit'] = chunker.max_tokens
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        if not stats['count']:
+            self.stdout.write(f"\"{collection.name}\" has no chunks.")
+            return
+        self.stdout.write(f"\"{collection.name}\" ({stats['strategy']}): {stats['count']} chunks, {stats['total_tokens']} tokens")
+        self.stdout.write(
+            f"tokens per chunk: min {stats['min']}, mean {stats['mean']}, p50 {stats['p50']}, "
+            f"p90 {stats['p90']}, p99 {stats['p99']}, max {stats['max']}"
+        )
+        self.stdout.write(f"{stats['over_limit']} chunks exceed the {stats['model_limit']}-token model window and are truncated")
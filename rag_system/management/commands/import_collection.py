@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_system.snapshots import CollectionImporter, SnapshotError
+
+
+class Command(BaseCommand):
+    help = "Import a collection snapshot archive without re-embedding its chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive')
+        parser.add_argument('--user', required=True, help='Username that will own the imported collection.')
+        parser.add_argument('--name', help='Name for the new collection (default: the exported name).')
+        parser.add_argument('--no-files', action='store_true', help="Don't restore the original uploads.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        importer = CollectionImporter(user, name=options['name'], include_files=not options['no_files'])
+        try:
+            report = importer.import_archive(options['archive'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+
+        collection = report['collection']
+        self.stdout.write(
+            f"Imported \"{collection.name}\" (id {collection.id}): {report['documents']} documents, "
+            f"{report['chunks']} chunks in {report['elapsed_seconds']}s"
+        )
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from rag_system.sharding import (
+    COLLECTION_NAME, client_at, existing_locations, move_collection, shard_count, shard_for_name, shard_path,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move user_{id}_col_{id} Chroma collections into the shard they hash to under the current "
+        "CHROMA_SHARDS / CHROMA_SHARD_BY. Stop ingestion while it runs; rerunning is safe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the moves.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Vectors copied per request.')
+
+    def handle(self, *args, **options):
+        shards = shard_count()
+        moved = kept = skipped = vectors = 0
+        for location in existing_locations():
+            source = client_at(location)
+            for collection in source.list_collections():
+                name = collection.name
+                if not COLLECTION_NAME.match(name):
+                    self.stdout.write(f"skip {name} in {location}: not an app collection")
+                    skipped += 1
+                    continue
+                target_path = shard_path(shard_for_name(name), shards)
+                if target_path == location:
+                    kept += 1
+                    continue
+                self.stdout.write(f"{name}: {location} -> {target_path}")
+                if options['dry_run']:
+                    moved += 1
+                    continue
+                vectors += move_collection(name, source, client_at(target_path), options['batch_size'])
+                moved += 1
+
+        verb = 'would move' if options['dry_run'] else 'moved'
+        self.stdout.write(self.style.SUCCESS(
+            f"{shards} shard(s): {verb} {moved} collections ({vectors} vectors), "
+            f"{kept} already in place, {skipped} skipped"
+        ))
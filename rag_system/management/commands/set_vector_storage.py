@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_system.models import DocumentCollection
+from rag_system.services import drop_vector_collection, vector_collection
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch a collection between float32 (Chroma), int8 and binary vector storage, copying its "
+        "vectors to the new store. Stop ingestion into the collection while it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('collection_id', type=int)
+        parser.add_argument('storage', choices=[value for value, _ in DocumentCollection.VECTOR_STORAGE_CHOICES])
+        parser.add_argument('--batch-size', type=int, default=1000, help='Vectors copied per request.')
+
+    def handle(self, *args, **options):
+        try:
+            collection = DocumentCollection.objects.get(id=options['collection_id'])
+        except DocumentCollection.DoesNotExist:
+            raise CommandError(f"Collection {options['collection_id']} does not exist.")
+        source_storage, target_storage = collection.vector_storage, options['storage']
+        if source_storage == target_storage:
+            self.stdout.write(f"\"{collection.name}\" already uses {target_storage} vector storage.")
+            return
+
+        try:
+            source = vector_collection(collection, create=False)
+        except Exception:
+            source = None  # Nothing was ever embedded.
+        try:
+            # Left over from an interrupted run; it isn't being served.
+            drop_vector_collection(collection, storage=target_storage)
+        except Exception:
+            pass
+        target = vector_collection(collection, storage=target_storage)
+
+        copied = orphaned = 0
+        while source is not None:
+            page = source.get(
+                limit=options['batch_size'], offset=copied, include=['embeddings', 'documents', 'metadatas']
+            )
+            if not len(page['ids']):
+                break
+            # Vectors whose chunk row is gone can't be searched usefully.
+            rows = [i for i, document in enumerate(page['documents']) if document is not None]
+            orphaned += len(page['ids']) - len(rows)
+            if rows:
+                target.upsert(
+                    ids=[page['ids'][i] for i in rows],
+                    embeddings=[page['embeddings'][i] for i in rows],
+                    documents=[page['documents'][i] for i in rows],
+                    metadatas=[page['metadatas'][i] for i in rows],
+                )
+            copied += len(page['ids'])
+            self.stdout.write(f"copied {copied} vectors")
+
+        if target.count() != copied - orphaned:
+            raise CommandError(
+                f"{target.count()} vectors in the {target_storage} store, {copied - orphaned} expected; "
+                f"the collection still uses {source_storage}"
+            )
+
+        collection.vector_storage = target_storage
+        collection.save(update_fields=['vector_storage'])
+        if source is not None:
+            drop_vector_collection(collection, storage=source_storage)
+        self.stdout.write(self.style.SUCCESS(
+            f"\"{collection.name}\": {source_storage} -> {target_storage}, {target.count()} vectors"
+            + (f", {orphaned} without a chunk dropped" if orphaned else '')
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_system', '0003_document_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentcollection',
+            name='chunk_overlap_tokens',
+            field=models.PositiveIntegerField(default=16),
+        ),
+        migrations.AddField(
+            model_name='documentcollection',
+            name='chunk_size_tokens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        # Existing collections keep the character splitter their chunks were
+        # made with; new collections default to structure-aware chunking.
+        migrations.AddField(
+            model_name='documentcollection',
+            name='chunk_strategy',
+            field=models.CharField(choices=[('structure', 'Headings & paragraphs'), ('tokens', 'Fixed token windows'), ('characters', 'Characters (legacy)')], default='characters', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='documentcollection',
+            name='chunk_strategy',
+            field=models.CharField(choices=[('structure', 'Headings & paragraphs'), ('tokens', 'Fixed token windows'), ('characters', 'Characters (legacy)')], default='structure', max_length=20),
+        ),
+    ]
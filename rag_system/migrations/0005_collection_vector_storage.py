@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rag_system', '0004_collection_chunking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentcollection',
+            name='vector_storage',
+            field=models.CharField(choices=[('float32', 'Float32 (Chroma)'), ('int8', 'Int8, re-scored'), ('binary', 'Binary, re-scored')], default='float32', max_length=10),
+        ),
+    ]
@@ -3,10 +3,28 @@ from django.contrib.auth.models import User
 import uuid
 
 class DocumentCollection(models.Model):
+    CHUNK_STRATEGY_CHOICES = [
+        ('structure', 'Headings & paragraphs'),
+        ('tokens', 'Fixed token windows'),
+        ('characters', 'Characters (legacy)'),
+    ]
+    VECTOR_STORAGE_CHOICES = [
+        ('float32', 'Float32 (Chroma)'),
+        ('int8', 'Int8, re-scored'),
+        ('binary', 'Binary, re-scored'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    chunk_strategy = models.CharField(max_length=20, choices=CHUNK_STRATEGY_CHOICES, default='structure')
+    # Capped at the embedding model's window; 0 means "use the whole window".
+    chunk_size_tokens = models.PositiveIntegerField(default=0)
+    chunk_overlap_tokens = models.PositiveIntegerField(default=16)
+    # Quantized modes keep compact codes in memory and the floats on disk;
+    # change it with `manage.py set_vector_storage`, which moves the vectors.
+    vector_storage = models.CharField(max_length=10, choices=VECTOR_STORAGE_CHOICES, default='float32')
     
     def __str__(self):
         return f"{self.user.username} - {self.name}"
@@ -22,6 +40,8 @@ class Document(models.Model):
     processed = models.BooleanField(default=False)
     chroma_collection_name = models.CharField(max_length=100, blank=True)
     chunk_count = models.IntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    version = models.IntegerField(default=1)
 
     def __str__(self):
         return self.filename
@@ -31,6 +51,37 @@ class DocumentChunk(models.Model):
     content = models.TextField()
     chunk_index = models.IntegerField()
     page_number = models.IntegerField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    vector_id = models.CharField(max_length=100, blank=True)
     
     class Meta:
-        unique_together = ['document', 'chunk_index']
\ No newline at end of file
+        unique_together = ['document', 'chunk_index']
+
+    @property
+    def chroma_id(self):
+        # Chunks stored before vector_id existed were keyed by position.
+        return self.vector_id or f"{self.document_id}_{self.chunk_index}"
+
+class UploadSession(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection = models.ForeignKey(DocumentCollection, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=10)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    expected_hash = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    error = models.TextField(blank=True)
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.total_size})"
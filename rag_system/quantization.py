@@ -0,0 +1,425 @@
+"""Quantized vector storage with two-stage search.
+
+Collections whose ``vector_storage`` is "int8" or "binary" keep their
+vectors here instead of in Chroma. Per vector, memory holds only a code:
+
+- int8: one signed byte per dimension plus a float32 scale and the squared
+  norm, about 4x smaller than float32;
+- binary: the sign bit of every dimension, 32x smaller.
+
+The float32 vectors stay on disk, memory-mapped. A query scans all codes
+(float query against int8 codes, or Hamming distance against the query's
+sign bits), keeps the best ``n_results * rerank`` candidates and re-scores
+only those with the exact floats, so results carry the squared L2
+distances Chroma returns and can be merged with Chroma hits.
+
+A store is a directory of immutable segments, one per ``add``, and a
+``manifest.json`` listing them with their deleted rows. Writers hold a file
+lock and replace the manifest atomically; readers reload when it changes,
+so every process sees the same store.
+
+Segments are merged by size tier: a segment's tier is the number of
+MERGE_FACTOR-fold steps in its live row count, and MERGE_FACTOR segments
+of one tier are rewritten as one segment of the next. Each row is thus
+rewritten about log(rows) / log(MERGE_FACTOR) times over the store's life,
+and there are at most MERGE_FACTOR - 1 segments per tier. Segments with no
+live rows left are dropped without a rewrite, and when more than
+MAX_DELETED_FRACTION of all rows are deleted everything is compacted into
+one segment.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+MODES = ('int8', 'binary')
+# Candidates re-scored per requested result; see benchmarks/quantization.py.
+RERANK = {'int8': 4, 'binary': 40}
+MIN_CANDIDATES = 20
+MERGE_FACTOR = 8
+MAX_DELETED_FRACTION = 0.25
+# Rows decoded at a time by the int8 scan, to bound its temporary memory.
+SCAN_BLOCK = 8192
+
+MANIFEST = 'manifest.json'
+
+
+def encode(vectors, mode):
+    """Codes of ``vectors`` (an n x dim float32 array) for ``mode``."""
+    if mode == 'binary':
+        return {'codes': np.packbits(vectors > 0, axis=1)}
+    scale = np.abs(vectors).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    return {
+        'codes': np.rint(vectors / scale[:, None]).astype(np.int8),
+        'scale': scale.astype(np.float32),
+        'norms': np.einsum('ij,ij->i', vectors, vectors).astype(np.float32),
+    }
+
+
+@dataclass
+class Segment:
+    name: str
+    ids: np.ndarray
+    codes: np.ndarray
+    vectors: np.ndarray
+    scale: np.ndarray = None
+    norms: np.ndarray = None
+    deleted: frozenset = frozenset()
+    dead: np.ndarray = None
+    # (row order, ids in that order), built on the first lookup by id.
+    by_id: tuple = None
+
+    def set_deleted(self, rows):
+        self.deleted = frozenset(rows)
+        self.dead = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+
+    def live_rows(self):
+        alive = np.ones(len(self.ids), dtype=bool)
+        alive[self.dead] = False
+        return np.flatnonzero(alive)
+
+    def find(self, keys):
+        """Live row of each id in ``keys`` (a bytes array), -1 where the
+        segment has none. Segments are immutable, so the sorted ids are
+        computed once and every lookup is a binary search."""
+        if self.by_id is None:
+            order = np.argsort(self.ids, kind='stable')
+            self.by_id = (order, self.ids[order])
+        order, sorted_ids = self.by_id
+        # The last of equal ids, as the stable sort keeps row order.
+        positions = np.searchsorted(sorted_ids, keys, side='right') - 1
+        clipped = np.maximum(positions, 0)
+        found = (positions >= 0) & (sorted_ids[clipped] == keys)
+        rows = np.where(found, order[clipped], -1)
+        rows[np.isin(rows, self.dead)] = -1
+        return rows
+
+    def approximate(self, query, query_bits, mode):
+        """Approximate distance of every row to the query (lower is closer),
+        inf for deleted rows."""
+        if mode == 'binary':
+            distances = np.bitwise_count(self.codes ^ query_bits).sum(axis=1, dtype=np.int32).astype(np.float32)
+        else:
+            distances = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), SCAN_BLOCK):
+                block = slice(start, start + SCAN_BLOCK)
+                dots = (self.codes[block].astype(np.float32) @ query) * self.scale[block]
+                # |q|^2 is the same for every row and left out.
+                distances[block] = self.norms[block] - 2 * dots
+        distances[self.dead] = np.inf
+        return distances
+
+    def resident_bytes(self):
+        arrays = (self.ids, self.codes, self.scale, self.norms) + (self.by_id or ())
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+class QuantizedStore:
+    def __init__(self, path, mode):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self._segments = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._version = None
+        self._lock = threading.Lock()
+
+    # Reading
+
+    def _manifest(self):
+        try:
+            with open(self.path / MANIFEST) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {'mode': self.mode, 'dim': None, 'segments': []}
+        if manifest['mode'] != self.mode:
+            raise ValueError(f"{self.path} holds {manifest['mode']} vectors, not {self.mode}")
+        return manifest
+
+    def _load_segment(self, entry):
+        prefix = self.path / entry['name']
+        arrays = {'codes': np.load(f"{prefix}.codes.npy"), 'ids': np.load(f"{prefix}.ids.npy")}
+        if self.mode == 'int8':
+            arrays['scale'] = np.load(f"{prefix}.scale.npy")
+            arrays['norms'] = np.load(f"{prefix}.norms.npy")
+        segment = Segment(name=entry['name'], vectors=np.load(f"{prefix}.f32.npy", mmap_mode='r'), **arrays)
+        segment.set_deleted(entry['deleted'])
+        return segment
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path / MANIFEST)
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            loaded = {segment.name: segment for segment in self._segments}
+            manifest = self._manifest()
+            segments = []
+            for entry in manifest['segments']:
+                segment = loaded.get(entry['name'])
+                if segment is None:
+                    segment = self._load_segment(entry)
+                elif len(entry['deleted']) != len(segment.deleted):
+                    segment.set_deleted(entry['deleted'])
+                segments.append(segment)
+            self._offsets = np.cumsum([0] + [len(segment.ids) for segment in segments])
+            self._segments = segments
+            self._version = version
+
+    def _snapshot(self):
+        # A compaction can remove segment files between reading the manifest
+        # and loading them; the next manifest lists their replacement.
+        for attempt in range(3):
+            try:
+                self._refresh()
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                self._version = None
+        return self._segments, self._offsets
+
+    def count(self):
+        segments, _ = self._snapshot()
+        return sum(len(segment.ids) - len(segment.deleted) for segment in segments)
+
+    def resident_bytes(self):
+        segments, _ = self._snapshot()
+        return sum(segment.resident_bytes() for segment in segments)
+
+    def search(self, query, n_results, rerank=None):
+        """ids and exact squared L2 distances of the ``n_results`` nearest
+        live vectors, closest first."""
+        segments, offsets = self._snapshot()
+        if not segments or n_results <= 0:
+            return [], []
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query_bits = np.packbits(query > 0) if self.mode == 'binary' else None
+        approximate = np.concatenate([segment.approximate(query, query_bits, self.mode) for segment in segments])
+
+        candidates = max(n_results * (rerank or RERANK[self.mode]), MIN_CANDIDATES)
+        if candidates < len(approximate):
+            rows = np.argpartition(approximate, candidates - 1)[:candidates]
+        else:
+            rows = np.arange(len(approximate))
+        rows = np.sort(rows[np.isfinite(approximate[rows])])
+        if not len(rows):
+            return [], []
+
+        owners = np.searchsorted(offsets, rows, side='right') - 1
+        vectors = np.empty((len(rows), len(query)), dtype=np.float32)
+        ids = np.empty(len(rows), dtype=object)
+        for owner in np.unique(owners):
+            mask = owners == owner
+            local = rows[mask] - offsets[owner]
+            vectors[mask] = segments[owner].vectors[local]
+            ids[mask] = segments[owner].ids[local]
+        difference = vectors - query
+        exact = np.einsum('ij,ij->i', difference, difference)
+        order = np.argsort(exact, kind='stable')[:n_results]
+        return [ids[i].decode() for i in order], exact[order].tolist()
+
+    def _locate(self, segments, ids):
+        """(segment number, row) of the live vector of each of ``ids`` that
+        is stored; a newer segment wins over an older one."""
+        ids = list(dict.fromkeys(ids))
+        keys = np.array([vector_id.encode() if isinstance(vector_id, str) else vector_id for vector_id in ids],
+                        dtype=bytes)
+        locations = {}
+        for number in range(len(segments) - 1, -1, -1):
+            if not len(keys):
+                break
+            rows = segments[number].find(keys)
+            found = rows >= 0
+            for i in np.flatnonzero(found):
+                locations[ids[i]] = (number, int(rows[i]))
+            ids = [vector_id for vector_id, hit in zip(ids, found) if not hit]
+            keys = keys[~found]
+        return locations
+
+    def get_vectors(self, ids=None, limit=None, offset=0):
+        """(id, float32 vector) pairs for ``ids``, or for a page of all live
+        rows in storage order."""
+        segments, _ = self._snapshot()
+        if ids is not None:
+            locations = self._locate(segments, ids)
+            return [
+                (vector_id, np.array(segments[locations[vector_id][0]].vectors[locations[vector_id][1]]))
+                for vector_id in ids if vector_id in locations
+            ]
+        pairs = []
+        for segment in segments:
+            rows = segment.live_rows()
+            if offset >= len(rows):
+                offset -= len(rows)
+                continue
+            rows = rows[offset:] if limit is None else rows[offset:offset + limit - len(pairs)]
+            offset = 0
+            pairs.extend(zip((vector_id.decode() for vector_id in segment.ids[rows]), segment.vectors[rows]))
+            if limit is not None and len(pairs) >= limit:
+                break
+        return pairs
+
+    # Writing
+
+    @contextmanager
+    def _writing(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._version = None
+                yield self._manifest()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_manifest(self, manifest):
+        temporary = self.path / f".{MANIFEST}.{uuid.uuid4().hex}"
+        with open(temporary, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temporary, self.path / MANIFEST)
+
+    def _write_segment(self, ids, vectors):
+        name = uuid.uuid4().hex[:16]
+        prefix = self.path / name
+        np.save(f"{prefix}.f32.npy", vectors)
+        np.save(f"{prefix}.ids.npy", np.array([
+            vector_id.encode() if isinstance(vector_id, str) else vector_id for vector_id in ids
+        ], dtype=bytes))
+        for suffix, array in encode(vectors, self.mode).items():
+            np.save(f"{prefix}.{suffix}.npy", array)
+        return {'name': name, 'rows': len(ids), 'deleted': []}
+
+    def _remove_segment_files(self, name):
+        for path in self.path.glob(f"{name}.*.npy"):
+            path.unlink(missing_ok=True)
+
+    def _mark_deleted(self, manifest, ids):
+        segments, _ = self._snapshot()
+        entries = {entry['name']: entry for entry in manifest['segments']}
+        locations = self._locate(segments, ids)
+        for number, row in locations.values():
+            entries[segments[number].name]['deleted'].append(row)
+        return len(locations)
+
+    def add(self, ids, embeddings):
+        """Store ``embeddings`` under ``ids``, replacing vectors already stored
+        under any of them."""
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id.")
+        with self._writing() as manifest:
+            if manifest['dim'] is None:
+                manifest['dim'] = vectors.shape[1]
+            elif vectors.shape[1] != manifest['dim']:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {manifest['dim']}")
+            self._mark_deleted(manifest, ids)
+            manifest['segments'].append(self._write_segment(list(ids), vectors))
+            self._commit(manifest)
+
+    def delete(self, ids):
+        with self._writing() as manifest:
+            if self._mark_deleted(manifest, ids):
+                self._commit(manifest)
+
+    def _commit(self, manifest):
+        segments = manifest['segments']
+        emptied = [entry['name'] for entry in segments if len(entry['deleted']) >= entry['rows']]
+        manifest['segments'] = [entry for entry in segments if entry['name'] not in emptied]
+
+        rows = sum(entry['rows'] for entry in manifest['segments'])
+        deleted = sum(len(entry['deleted']) for entry in manifest['segments'])
+        self._write_manifest(manifest)
+        if deleted > rows * MAX_DELETED_FRACTION:
+            self._merge(manifest, [entry['name'] for entry in manifest['segments']])
+        else:
+            # A merge can fill the next tier up.
+            names = _tier_to_merge(manifest['segments'])
+            while names:
+                self._merge(manifest, names)
+                names = _tier_to_merge(manifest['segments'])
+        for name in emptied:
+            self._remove_segment_files(name)
+
+    def _merge(self, manifest, names):
+        """Rewrite the live rows of the segments ``names`` as one segment in
+        place of the first of them. The manifest on disk still lists the
+        old segments until the new one is written, so a crash in between
+        leaves a valid store."""
+        self._version = None
+        segments, _ = self._snapshot()
+        live = [(segment, segment.live_rows()) for segment in segments if segment.name in names]
+        merged = None
+        if sum(len(rows) for _, rows in live):
+            merged = self._write_segment(
+                np.concatenate([segment.ids[rows] for segment, rows in live]),
+                np.concatenate([segment.vectors[rows] for segment, rows in live]),
+            )
+        entries = []
+        for entry in manifest['segments']:
+            if entry['name'] not in names:
+                entries.append(entry)
+            elif merged is not None:
+                entries.append(merged)
+                merged = None
+        manifest['segments'] = entries
+        self._write_manifest(manifest)
+        for name in names:
+            self._remove_segment_files(name)
+
+    def drop(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._segments = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._version = None
+
+
+def _tier(entry):
+    live, tier = entry['rows'] - len(entry['deleted']), 0
+    while live >= MERGE_FACTOR:
+        live //= MERGE_FACTOR
+        tier += 1
+    return tier
+
+
+def _tier_to_merge(entries):
+    """Names of MERGE_FACTOR segments of the lowest tier that has that
+    many, or None."""
+    tiers = {}
+    for entry in entries:
+        tiers.setdefault(_tier(entry), []).append(entry['name'])
+    for tier in sorted(tiers):
+        if len(tiers[tier]) >= MERGE_FACTOR:
+            return tiers[tier][:MERGE_FACTOR]
+    return None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path, mode):
+    """Process-wide store for ``path``, so loaded segments are shared by
+    every request."""
+    key = (str(path), mode)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, QuantizedStore(path, mode))
+    return store
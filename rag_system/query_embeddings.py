@@ -0,0 +1,248 @@
+"""Query embedding cache and micro-batching.
+
+RAG requests embed one query string each. A QueryEncoder, one per embedding
+model and process, sits between them and the model:
+
+- queries are normalized first: whitespace is collapsed and, when the
+  model's tokenizer lowercases anyway, case is folded, so a normalized
+  query embeds exactly like the original;
+- embeddings of the most recent RAG_QUERY_CACHE_SIZE normalized queries
+  are kept in an LRU cache;
+- misses go to one encoder thread, which waits up to
+  RAG_QUERY_BATCH_WINDOW_MS for more queries and embeds up to
+  RAG_QUERY_BATCH_SIZE of them with a single ``encode`` call. Queries
+  arriving while a batch is encoded form the next one, so under load
+  batches fill up even without a window. Concurrent requests for the same
+  query wait on the same slot.
+
+Counters and histograms are per process; the staff-only
+rag/embedding-stats/ view serves them as JSON or, with
+``?format=prometheus``, in the Prometheus text format.
+"""
+import bisect
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+ENCODE_MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """Cumulative counts per upper bound, as Prometheus expects."""
+        cumulative, total = [], 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {'buckets': cumulative, 'sum': round(self.sum, 3), 'count': self.count}
+
+
+class QueryEncoder:
+    def __init__(self, model, name, cache_size, batch_size, window_ms):
+        self.model = model
+        self.name = name
+        self.cache_size = cache_size
+        self.batch_size = max(1, batch_size)
+        self.window = window_ms / 1000.0
+        tokenizer = getattr(model, 'tokenizer', None)
+        self.lowercase = bool(getattr(tokenizer, 'do_lower_case', False))
+
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.errors = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.encode_ms = Histogram(ENCODE_MS_BUCKETS)
+
+    def normalize(self, query):
+        query = ' '.join(query.split())
+        return query.lower() if self.lowercase else query
+
+    def encode(self, query):
+        """Embedding of ``query`` as a read-only float32 array."""
+        return self.encode_many([query])[0]
+
+    def encode_many(self, texts):
+        """Embeddings of ``texts``, one read-only row each. The misses are
+        queued together, so they share as few encode calls as possible."""
+        keys = [self.normalize(text) for text in texts]
+        vectors = {}
+        owned = []
+        with self._lock:
+            for key in keys:
+                if key in vectors:
+                    continue
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+                    continue
+                self.misses += 1
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    owned.append((key, future))
+                    if self.batch_size > 1:
+                        self._queue.put((key, future))
+                else:
+                    self.shared += 1
+                vectors[key] = future
+            if owned and self.batch_size > 1:
+                self._start_worker()
+        if owned and self.batch_size == 1:
+            self._encode_batch(owned)
+        for key, value in vectors.items():
+            if isinstance(value, Future):
+                vectors[key] = value.result()
+        return [vectors[key] for key in keys]
+
+    def _start_worker(self):
+        # Also restarts the thread in a process forked after it was started.
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='rag-query-encoder', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.batch_size:
+                try:
+                    remaining = deadline - time.monotonic()
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            vectors = np.asarray(self.model.encode([key for key, _ in batch]), dtype=np.float32)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                for key, future in batch:
+                    self._in_flight.pop(key, None)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.batch_sizes.observe(len(batch))
+            self.encode_ms.observe(elapsed_ms)
+            for (key, _), vector in zip(batch, vectors):
+                vector.setflags(write=False)
+                self._cache[key] = vector
+                self._in_flight.pop(key, None)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model': self.name,
+                'cache_entries': len(self._cache),
+                'cache_size': self.cache_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'shared': self.shared,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'batch_size': self.batch_sizes.snapshot(),
+                'encode_ms': self.encode_ms.snapshot(),
+            }
+
+
+def get_query_encoder(model, name):
+    """Process-wide QueryEncoder for ``model``."""
+    encoder = _encoders.get(id(model))
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(id(model))
+            if encoder is None:
+                encoder = QueryEncoder(
+                    model, name,
+                    cache_size=settings.RAG_QUERY_CACHE_SIZE,
+                    batch_size=settings.RAG_QUERY_BATCH_SIZE,
+                    window_ms=settings.RAG_QUERY_BATCH_WINDOW_MS,
+                )
+                _encoders[id(model)] = encoder
+    return encoder
+
+
+def encoder_stats():
+    return [encoder.stats() for encoder in list(_encoders.values())]
+
+
+def prometheus_text(stats):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{label}="{label_value}"' for label, label_value in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    for key, help_text in (
+        ('hits', 'Query embeddings served from the cache.'),
+        ('misses', 'Query embeddings not in the cache.'),
+        ('shared', 'Cache misses that waited on an identical query already being encoded.'),
+        ('evictions', 'Query embeddings evicted from the cache.'),
+        ('errors', 'Failed encode calls.'),
+    ):
+        metric(f"rag_query_embedding_{key}_total", 'counter', help_text,
+               [({'model': row['model'], 'pid': os.getpid()}, row[key]) for row in stats])
+    metric('rag_query_embedding_cache_entries', 'gauge', 'Query embeddings in the cache.',
+           [({'model': row['model'], 'pid': os.getpid()}, row['cache_entries']) for row in stats])
+
+    for key, help_text in (
+        ('batch_size', 'Queries embedded per encode call.'),
+        ('encode_ms', 'Duration of query encode calls in milliseconds.'),
+    ):
+        name = f"rag_query_embedding_{key}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for row in stats:
+            labels = f'model="{row["model"]}",pid="{os.getpid()}"'
+            for bound, count in row[key]['buckets']:
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {row[key]['sum']}")
+            lines.append(f"{name}_count{{{labels}}} {row[key]['count']}")
+    return '\n'.join(lines) + '\n'
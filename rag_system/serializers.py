@@ -1,18 +1,21 @@
-import serializers
+from rest_framework import serializers
 from .models import DocumentCollection, Document
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = ['id', 'filename', 'file_type', 'file_size', 'uploaded_at', 'processed', 'chunk_count']
+        fields = ['id', 'filename', 'file_type', 'file_size', 'uploaded_at', 'processed', 'chunk_count', 'version']
 
 class DocumentCollectionSerializer(serializers.ModelSerializer):
-    documents = DocumentSerializer(many=True, read_only=True)
-    document_count = serializers.SerializerMethodField()
+    # Annotated by the queryset (see rag_system.api) instead of one COUNT per collection.
+    document_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = DocumentCollection
-        fields = ['id', 'name', 'description', 'created_at', 'documents', 'document_count']
+        fields = ['id', 'name', 'description', 'created_at', 'chunk_strategy', 'vector_storage', 'document_count']
+
+class DocumentCollectionDetailSerializer(DocumentCollectionSerializer):
+    documents = DocumentSerializer(many=True, read_only=True)
 
-    def get_document_count(self, obj):
-        return obj.documents.count()
\ No newline at end of file
+    class Meta(DocumentCollectionSerializer.Meta):
+        fields = DocumentCollectionSerializer.Meta.fields + ['documents']
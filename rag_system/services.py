@@ -1,141 +1,532 @@
 import os 
-import openai
-import chromadb
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader  
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
+import fcntl
+import hashlib
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 from django.conf import settings
-from .models import Document, DocumentChunk, DocumentCollection
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from .chunking import ChunkingEngine, chunk_length_stats
+from .compression import compress_context, count_prompt_tokens
+from .quantization import MODES as QUANTIZED_MODES, open_store
+from .query_embeddings import get_query_encoder
+from .sharding import client_for, shard_client, shard_count
+from .models import Document, DocumentChunk, DocumentCollection, UploadSession
 import logging
 
 logger = logging.getLogger(__name__)
 
+# openai, chromadb, langchain and sentence_transformers (torch) take seconds to
+# import, so they are imported inside the functions that use them. Nothing
+# that only imports this module (URL conf, migrations, management commands)
+# pays for them; call warm_up() to load them ahead of the first request.
+
+ALLOWED_EXTENSIONS = ['.pdf', '.docx', '.doc', '.txt']
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+CHROMA_ADD_BATCH_SIZE = 512
+RAG_RESULTS_PER_COLLECTION = 5
+RAG_CONTEXT_CHUNKS = 3
+RAG_COMPRESSION_CANDIDATES = 8
+
+_embedding_model = None
+_embedding_model_loaded = False
+_query_executor = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """Process-wide SentenceTransformer, loaded on first use (None if unavailable)."""
+    global _embedding_model, _embedding_model_loaded
+    if not _embedding_model_loaded:
+        with _shared_lock:
+            if not _embedding_model_loaded:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                except Exception as e:
+                    logger.error(f"Error loading embedding model: {str(e)}")
+                    _embedding_model = None
+                _embedding_model_loaded = True
+    return _embedding_model
+
+
+def get_chroma_client(collection):
+    """Chroma client of the shard that stores ``collection`` (see sharding.py)."""
+    return client_for(collection)
+
+
+def get_query_executor():
+    """Shared pool for fanning a RAG query out over several collections."""
+    global _query_executor
+    if _query_executor is None:
+        with _shared_lock:
+            if _query_executor is None:
+                _query_executor = ThreadPoolExecutor(
+                    max_workers=settings.RAG_QUERY_WORKERS, thread_name_prefix='rag-query'
+                )
+    return _query_executor
+
+
+def warm_up(include_chroma=True):
+    """Load the embedding model and heavy client libraries now instead of on
+    the first request. See gunicorn.conf.py for when this is called.
+
+    Don't open Chroma before forking: its SQLite handles and background
+    threads must not be shared between processes.
+    """
+    started = time.perf_counter()
+    import openai  # noqa: F401
+    from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
+    get_embedding_model()
+    if include_chroma:
+        for shard in range(shard_count()):
+            shard_client(shard)
+    logger.info(f"RAG warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def chroma_collection_name(collection):
+    return f"user_{collection.user_id}_col_{collection.id}"
+
+
+def find_current_version(collection, filename):
+    """The document an upload named ``filename`` would replace, if any."""
+    return collection.documents.filter(filename=filename).order_by('-uploaded_at').first()
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_vector_id(document, content_hash, occurrence):
+    # Keyed by content rather than position so a chunk keeps its vector when
+    # a revision shifts it to another index.
+    return f"{document.id}_{content_hash[:16]}_{occurrence}"
+
+
+def chunk_metadata(document, chunk_index):
+    return {
+        "document_id": str(document.id),
+        "chunk_index": chunk_index,
+        "filename": document.filename
+    }
+
+
+def vector_collection(collection, create=True, storage=None):
+    """The store holding ``collection``'s vectors: its Chroma collection, or
+    a QuantizedCollection for the "int8" and "binary" storage modes.
+    ``storage`` overrides the collection's mode (for conversions)."""
+    storage = storage or collection.vector_storage
+    if storage in QUANTIZED_MODES:
+        return QuantizedCollection(collection, storage)
+    client = get_chroma_client(collection)
+    name = chroma_collection_name(collection)
+    return client.get_or_create_collection(name=name) if create else client.get_collection(name=name)
+
+
+def drop_vector_collection(collection, storage=None):
+    storage = storage or collection.vector_storage
+    if storage in QUANTIZED_MODES:
+        QuantizedCollection(collection, storage).store.drop()
+    else:
+        get_chroma_client(collection).delete_collection(name=chroma_collection_name(collection))
+
+
+def delete_document_vectors(document):
+    """Remove ``document``'s vectors from its collection's store. Failures
+    are logged: the document goes either way, and search skips vectors
+    whose chunk is gone."""
+    vector_ids = [chunk.chroma_id for chunk in document.chunks.only('document_id', 'chunk_index', 'vector_id')]
+    if not vector_ids:
+        return
+    try:
+        vector_collection(document.collection, create=False).delete(ids=vector_ids)
+    except Exception as e:
+        logger.warning(f"Could not remove the vectors of {document.filename}: {str(e)}")
+
+
+def delete_collection_vectors(collection):
+    try:
+        drop_vector_collection(collection)
+    except Exception as e:
+        logger.warning(f"Could not remove the vectors of collection {collection.id}: {str(e)}")
+
+
+def chunks_by_vector_id(vector_ids):
+    chunks = {
+        chunk.vector_id: chunk
+        for chunk in DocumentChunk.objects.filter(vector_id__in=vector_ids).select_related('document')
+    }
+    # Chunks stored before vector_id existed are keyed "<document>_<index>".
+    legacy = Q()
+    for vector_id in vector_ids:
+        document_id, _, chunk_index = vector_id.rpartition('_')
+        if vector_id in chunks or not chunk_index.isdigit():
+            continue
+        try:
+            document_id = uuid.UUID(document_id)
+        except ValueError:
+            # A current-style id whose chunk is gone.
+            continue
+        legacy |= Q(document_id=document_id, chunk_index=int(chunk_index), vector_id='')
+    if legacy:
+        for chunk in DocumentChunk.objects.filter(legacy).select_related('document'):
+            chunks[chunk.chroma_id] = chunk
+    return chunks
+
+
+class QuantizedCollection:
+    """The part of Chroma's collection API this app uses, over a
+    QuantizedStore (see quantization.py). Chunk text and metadata are
+    already in DocumentChunk rows, so only ids and vectors are stored and
+    ``update`` has nothing to do."""
+
+    def __init__(self, collection, storage=None):
+        self.name = chroma_collection_name(collection)
+        storage = storage or collection.vector_storage
+        self.store = open_store(Path(settings.QUANTIZED_VECTOR_DIRECTORY) / storage / self.name, storage)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self.store.add(ids, embeddings)
+
+    upsert = add
+
+    def update(self, ids, metadatas=None, documents=None):
+        pass
+
+    def delete(self, ids):
+        self.store.delete(ids)
+
+    def count(self):
+        return self.store.count()
+
+    def _results(self, ids, include, **columns):
+        """Chroma-style results for ``ids``; ``columns`` are further per-id
+        lists. With documents or metadatas, vectors whose chunk is gone (or
+        not committed yet) are left out."""
+        results = {'ids': ids, **columns}
+        if 'documents' in include or 'metadatas' in include:
+            chunks = chunks_by_vector_id(ids)
+            keep = [i for i, vector_id in enumerate(ids) if vector_id in chunks]
+            results = {key: [values[i] for i in keep] for key, values in results.items()}
+            found = [chunks[vector_id] for vector_id in results['ids']]
+            if 'documents' in include:
+                results['documents'] = [chunk.content for chunk in found]
+            if 'metadatas' in include:
+                results['metadatas'] = [chunk_metadata(chunk.document, chunk.chunk_index) for chunk in found]
+        return results
+
+    def get(self, ids=None, include=('metadatas', 'documents'), limit=None, offset=0):
+        pairs = self.store.get_vectors(ids, limit=limit, offset=offset or 0)
+        columns = {'embeddings': [vector for _, vector in pairs]} if 'embeddings' in include else {}
+        return self._results([vector_id for vector_id, _ in pairs], include, **columns)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10,
+              include=('documents', 'metadatas', 'distances')):
+        if query_embeddings is None:
+            raise ValueError('Quantized collections can only be searched with a query embedding.')
+        # Skipped vectors must not take result slots: search deeper until
+        # there are enough hits or the store runs out.
+        wanted = n_results
+        while True:
+            ids, distances = self.store.search(query_embeddings[0], wanted)
+            results = self._results(ids, ('documents', 'metadatas'), distances=distances)
+            if len(results['ids']) >= n_results or len(ids) < wanted:
+                break
+            wanted *= 2
+        results = {key: values[:n_results] for key, values in results.items()}
+        if 'embeddings' in include:
+            vectors = dict(self.store.get_vectors(results['ids']))
+            results['embeddings'] = [vectors.get(vector_id) for vector_id in results['ids']]
+        return {key: [values] for key, values in results.items()}
+
+
 class DocumentProcessingService:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        try:
-            self.embeddings = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            logger.error(f"Error loading embedding model: {str(e)}")
-            self.embeddings = None
+        self.embeddings = get_embedding_model()
+        self._chunkers = {}
+
+    def chunker_for(self, collection):
+        key = (collection.chunk_strategy, collection.chunk_size_tokens, collection.chunk_overlap_tokens)
+        if key not in self._chunkers:
+            self._chunkers[key] = ChunkingEngine.for_collection(collection, self.embeddings)
+        return self._chunkers[key]
 
-    def process_document(self, document):
+    def split_document(self, document):
+        chunker = self.chunker_for(document.collection)
+        chunks = chunker.split_pages(self._extract_pages(document))
+        if chunks:
+            token_counts = [chunk.token_count for chunk in chunks]
+            if chunker.strategy == 'characters':
+                token_counts = chunker.count_tokens([chunk.text for chunk in chunks])
+            stats = chunk_length_stats(token_counts, limit=chunker.max_tokens)
+            logger.info(f"Chunked {document.filename} ({chunker.strategy}): {stats}")
+        return chunks
+
+    def process_document(self, document, chroma_collection=None):
         try:
-            text_content = self._extract_text(document)
-            if not text_content:
-                return False
-            
-            chunks = self.text_splitter.split_text(text_content)
-            if not chunks:
+            prepared = self.prepare_document(document)
+            if prepared is None:
                 return False
+            self.store_document(document, *prepared, chroma_collection=chroma_collection)
+            return True
             
-            collection_name = f"user_{document.collection.user.id}_col_{document.collection.id}"
-            document.chroma_collection_name = collection_name
-            
-            client = chromadb.PersistentClient(path=str(settings.CHROMA_PERSIST_DIRECTORY))
-            chroma_collection = client.get_or_create_collection(name=collection_name)
-            
-            for i, chunk in enumerate(chunks):
-                DocumentChunk.objects.create(
-                    document=document,
-                    content=chunk,
-                    chunk_index=i
-                )
-                
-                if self.embeddings:
-                    try:
-                        embedding = self.embeddings.encode([chunk])[0].tolist()
-                        chroma_collection.add(
-                            documents=[chunk],
-                            embeddings=[embedding],
-                            metadatas=[{
-                                "document_id": str(document.id),
-                                "chunk_index": i,
-                                "filename": document.filename
-                            }],
-                            ids=[f"{document.id}_{i}"]
-                        )
-                    except Exception as e:
-                        logger.warning(f"Error generating embedding: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            return False
+
+    def prepare_document(self, document):
+        """Extract, split and embed. Touches neither the database nor Chroma,
+        so it is safe to run on worker threads."""
+        chunks = self.split_document(document)
+        if not chunks:
+            return None
+        
+        embeddings = None
+        if self.embeddings:
+            try:
+                # One forward pass over all chunks instead of one per chunk.
+                embeddings = self.embeddings.encode([chunk.text for chunk in chunks]).tolist()
+            except Exception as e:
+                logger.warning(f"Error generating embedding: {str(e)}")
+        return chunks, embeddings
+
+    def store_document(self, document, chunks, embeddings, chroma_collection=None):
+        collection_name = chroma_collection_name(document.collection)
+        document.chroma_collection_name = collection_name
+        
+        texts = [chunk.text for chunk in chunks]
+        hashes = [chunk_hash(text) for text in texts]
+        occurrences = defaultdict(int)
+        vector_ids = []
+        for content_hash in hashes:
+            vector_ids.append(chunk_vector_id(document, content_hash, occurrences[content_hash]))
+            occurrences[content_hash] += 1
+        
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(
+                document=document,
+                content=chunk.text,
+                chunk_index=i,
+                page_number=chunk.page_number,
+                content_hash=hashes[i],
+                vector_id=vector_ids[i]
+            )
+            for i, chunk in enumerate(chunks)
+        ])
+        
+        if embeddings is not None:
+            if chroma_collection is None:
+                chroma_collection = vector_collection(document.collection)
+            try:
+                self._add_vectors(chroma_collection, document, list(range(len(texts))), texts, embeddings, vector_ids)
+            except Exception as e:
+                logger.warning(f"Error storing embeddings: {str(e)}")
+        
+        document.chunk_count = len(chunks)
+        document.processed = True
+        document.save()
+
+    def reindex_document(self, document, storage_name, file_size, content_hash, filename=None):
+        """Make the file at ``storage_name`` the next version of ``document``.
+
+        The new text is chunked and diffed against the stored chunks by
+        content hash: unchanged chunks keep their vectors (only their position
+        metadata is updated), new chunks are embedded and added, and chunks
+        that disappeared are removed from the database and Chroma.
+        """
+        started = time.perf_counter()
+        previous_name = document.file_path.name
+        previous = (document.filename, document.file_type)
+        
+        document.file_path.name = storage_name
+        if filename:
+            document.filename = filename
+            document.file_type = os.path.splitext(filename)[1].lower()[1:]
+        
+        chunks = self.split_document(document)
+        if not chunks:
+            document.file_path.name = previous_name
+            document.filename, document.file_type = previous
+            default_storage.delete(storage_name)
+            raise ValueError('No text could be extracted from the new version.')
+        
+        old_chunks = defaultdict(deque)
+        for chunk in document.chunks.order_by('chunk_index'):
+            old_chunks[chunk.content_hash or chunk_hash(chunk.content)].append(chunk)
+        
+        rows = []
+        added = []
+        moved = []
+        occurrences = defaultdict(int)
+        renamed = document.filename != previous[0]
+        texts = [chunk.text for chunk in chunks]
+        for i, chunk in enumerate(chunks):
+            content_hash_i = chunk_hash(chunk.text)
+            occurrence = occurrences[content_hash_i]
+            occurrences[content_hash_i] += 1
             
+            if old_chunks[content_hash_i]:
+                old = old_chunks[content_hash_i].popleft()
+                vector_id = old.chroma_id
+                if old.chunk_index != i or renamed:
+                    moved.append((vector_id, i))
+            else:
+                vector_id = chunk_vector_id(document, content_hash_i, occurrence)
+                added.append(i)
+            rows.append(DocumentChunk(
+                document=document,
+                content=chunk.text,
+                chunk_index=i,
+                page_number=chunk.page_number,
+                content_hash=content_hash_i,
+                vector_id=vector_id
+            ))
+        removed = [chunk.chroma_id for group in old_chunks.values() for chunk in group]
+        
+        embeddings = None
+        if self.embeddings and added:
+            embeddings = self.embeddings.encode([texts[i] for i in added]).tolist()
+        
+        with transaction.atomic():
+            # Rewriting the rows is cheap next to embedding, and avoids
+            # shuffling chunk_index under the unique constraint.
+            document.chunks.all().delete()
+            DocumentChunk.objects.bulk_create(rows)
+            document.file_size = file_size
+            document.content_hash = content_hash
+            document.version += 1
             document.chunk_count = len(chunks)
+            document.chroma_collection_name = chroma_collection_name(document.collection)
             document.processed = True
             document.save()
-            return True
-            
+        
+        try:
+            chroma_collection = vector_collection(document.collection)
+            if removed:
+                chroma_collection.delete(ids=removed)
+            if moved:
+                chroma_collection.update(
+                    ids=[vector_id for vector_id, _ in moved],
+                    metadatas=[chunk_metadata(document, i) for _, i in moved]
+                )
+            if embeddings is not None:
+                self._add_vectors(
+                    chroma_collection, document, added,
+                    [texts[i] for i in added], embeddings, [rows[i].vector_id for i in added]
+                )
         except Exception as e:
-            logger.error(f"Error processing document: {str(e)}")
-            return False
+            logger.warning(f"Error updating embeddings for {document.filename}: {str(e)}")
+        
+        if previous_name and previous_name != storage_name:
+            try:
+                default_storage.delete(previous_name)
+            except Exception:
+                pass
+        
+        stats = {
+            'document_id': str(document.id),
+            'version': document.version,
+            'chunks': len(chunks),
+            'reused': len(chunks) - len(added),
+            'added': len(added),
+            'removed': len(removed),
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+        logger.info(f"Re-indexed {document.filename} v{document.version}: {stats}")
+        return stats
+
+    def _add_vectors(self, chroma_collection, document, indexes, chunks, embeddings, vector_ids):
+        for start in range(0, len(chunks), CHROMA_ADD_BATCH_SIZE):
+            end = min(start + CHROMA_ADD_BATCH_SIZE, len(chunks))
+            chroma_collection.add(
+                documents=chunks[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=[chunk_metadata(document, i) for i in indexes[start:end]],
+                ids=vector_ids[start:end]
+            )
 
-    def _extract_text(self, document):
+    def _extract_pages(self, document):
+        """[(page_number, text), ...]; page_number is None for formats without pages."""
+        from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
         try:
             file_path = document.file_path.path
             
             if document.file_type == 'pdf':
                 loader = PyPDFLoader(file_path)
                 pages = loader.load()
-                return "\n".join([page.page_content for page in pages])
+                return [(page.metadata.get('page', i) + 1, page.page_content) for i, page in enumerate(pages)]
             elif document.file_type in ['docx', 'doc']:
                 loader = Docx2txtLoader(file_path)
                 doc = loader.load()
-                return doc[0].page_content if doc else ""
+                return [(None, doc[0].page_content)] if doc else []
             elif document.file_type == 'txt':
                 with open(file_path, 'r', encoding='utf-8') as file:
-                    return file.read()
+                    return [(None, file.read())]
             
         except Exception as e:
             logger.error(f"Error extracting text: {str(e)}")
-        return ""
+        return []
 
 class RAGService:
     def __init__(self):
+        import openai
         openai.api_key = settings.OPENAI_API_KEY
-        try:
-            self.embeddings = SentenceTransformer('all-MiniLM-L6-v2')
-        except:
-            self.embeddings = None
+        if settings.OPENAI_BASE_URL:
+            openai.base_url = settings.OPENAI_BASE_URL
+        self.embeddings = get_embedding_model()
+        self.last_prompt_tokens = None
 
-    def query_documents(self, query, collection_id, user):
+    def query_documents(self, query, collection_ids, user):
+        """Answer ``query`` from one or more of the user's collections with a
+        single LLM call. ``collection_ids`` is an id or a list of ids."""
         try:
-            collection = DocumentCollection.objects.get(id=collection_id, user=user)
+            if not isinstance(collection_ids, (list, tuple, set)):
+                collection_ids = [collection_ids]
+            collections = list(DocumentCollection.objects.filter(
+                id__in=list(collection_ids)[:settings.RAG_MAX_COLLECTIONS],
+                user=user,
+                documents__processed=True
+            ).distinct())
             
-            if not collection.documents.filter(processed=True).exists():
+            if not collections:
                 return "No processed documents found.", []
             
-            client = chromadb.PersistentClient(path=str(settings.CHROMA_PERSIST_DIRECTORY))
-            chroma_collection_name = f"user_{user.id}_col_{collection_id}"
-            chroma_collection = client.get_collection(name=chroma_collection_name)
+            query_embedding = self.embed_query(query)
+            hits = self.retrieve(query, collections, query_embedding)
             
-            if self.embeddings:
-                query_embedding = self.embeddings.encode([query])[0].tolist()
-                results = chroma_collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=5
-                )
-            else:
-                results = chroma_collection.query(
-                    query_texts=[query],
-                    n_results=5
-                )
-            
-            relevant_chunks = results['documents'][0] if results['documents'] else []
-            metadatas = results['metadatas'][0] if results['metadatas'] else []
-            
-            if not relevant_chunks:
+            if not hits:
                 return "No relevant information found.", []
             
-            context = "\n\n".join(relevant_chunks[:3])
-            prompt = f"""Based on the following context, answer the question.
-
-            Context: {context}
-
-            Question: {query}
-
-            Answer:"""
+            uncompressed_context = "\n\n".join(hit['text'] for hit in hits[:RAG_CONTEXT_CHUNKS])
+            uncompressed = build_prompt(query, uncompressed_context)
+            if settings.RAG_CONTEXT_TOKEN_BUDGET:
+                # Never more than the three whole chunks would have cost.
+                budget = min(settings.RAG_CONTEXT_TOKEN_BUDGET, count_prompt_tokens(uncompressed_context))
+                candidates = hits[:RAG_COMPRESSION_CANDIDATES]
+                compressed = compress_context(query, candidates, budget, query_embedding)
+                context_hits = [candidates[i] for i in compressed.used_hits]
+                prompt = build_prompt(query, compressed.text)
+            else:
+                context_hits = hits[:RAG_CONTEXT_CHUNKS]
+                prompt = uncompressed
+            self.last_prompt_tokens = {
+                'uncompressed': count_prompt_tokens(uncompressed),
+                'sent': count_prompt_tokens(prompt),
+            }
+            logger.info(
+                f"RAG prompt: {self.last_prompt_tokens['uncompressed']} tokens uncompressed, "
+                f"{self.last_prompt_tokens['sent']} sent"
+            )
             
+            import openai
             response = openai.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
@@ -147,14 +538,17 @@ class RAGService:
             
             sources = []
             seen_files = set()
-            for metadata in metadatas[:3]:
-                filename = metadata.get('filename', 'Unknown')
-                if filename not in seen_files:
+            for hit in context_hits:
+                collection = hit['collection']
+                filename = hit['metadata'].get('filename', 'Unknown')
+                if (collection.id, filename) not in seen_files:
                     sources.append({
                         'filename': filename,
-                        'chunk_index': metadata.get('chunk_index', 0)
+                        'chunk_index': hit['metadata'].get('chunk_index', 0),
+                        'collection_id': collection.id,
+                        'collection': collection.name
                     })
-                    seen_files.add(filename)
+                    seen_files.add((collection.id, filename))
             
             return answer, sources
             
@@ -162,3 +556,496 @@ class RAGService:
             logger.error(f"Error in RAG query: {str(e)}")
             return f"Error querying documents: {str(e)}", []
 
+    def embed_query(self, query):
+        if not self.embeddings:
+            return None
+        return get_query_encoder(self.embeddings, EMBEDDING_MODEL_NAME).encode(query).tolist()
+
+    def retrieve(self, query, collections, query_embedding=None, n_results=RAG_RESULTS_PER_COLLECTION):
+        """Nearest chunks across ``collections``, best first.
+
+        The query is embedded once (pass ``query_embedding`` to reuse one)
+        and the collections are searched in parallel (they may live in
+        different Chroma shards). Every collection is embedded with the same
+        model, so distances are comparable and the hits are merged by
+        distance alone. Hits carry their chunk's ``embedding`` when the
+        query was embedded; context compression scores with it.
+        """
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+
+        def search(collection):
+            chroma_collection = vector_collection(collection, create=False)
+            if query_embedding is not None:
+                return chroma_collection.query(
+                    query_embeddings=[query_embedding], n_results=n_results,
+                    include=['documents', 'metadatas', 'distances', 'embeddings']
+                )
+            return chroma_collection.query(query_texts=[query], n_results=n_results)
+
+        if len(collections) == 1:
+            outcomes = [_run(search, collections[0])]
+        else:
+            outcomes = list(get_query_executor().map(lambda collection: _run(search, collection), collections))
+
+        hits = []
+        errors = []
+        for collection, (results, error) in zip(collections, outcomes):
+            if error is not None:
+                logger.warning(f"RAG query skipped collection {collection.id}: {str(error)}")
+                errors.append(error)
+                continue
+            documents = results['documents'][0] if results.get('documents') else []
+            metadatas = results['metadatas'][0] if results.get('metadatas') else []
+            distances = results['distances'][0] if results.get('distances') else [None] * len(documents)
+            embeddings = results['embeddings'][0] if results.get('embeddings') is not None else [None] * len(documents)
+            for text, metadata, distance, embedding in zip(documents, metadatas, distances, embeddings):
+                if text is None:
+                    continue
+                hits.append({
+                    'text': text,
+                    'metadata': metadata or {},
+                    'distance': distance,
+                    'embedding': embedding,
+                    'collection': collection,
+                })
+        if errors and len(errors) == len(collections):
+            raise errors[0]
+        hits.sort(key=lambda hit: float('inf') if hit['distance'] is None else hit['distance'])
+        return hits
+
+
+def build_prompt(query, context):
+    return f"""Based on the following context, answer the question.
+
+            Context: {context}
+
+            Question: {query}
+
+            Answer:"""
+
+
+def _run(func, *args):
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, e
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploadService:
+    """Resumable uploads written to disk part by part.
+
+    Each part is appended to ``<RAG_UPLOAD_TEMP_DIR>/<session id>.part`` while
+    the SHA-256 of the file is updated incrementally, so the finished file is
+    never read back for hashing or copying: it is moved into storage and handed
+    to ``DocumentProcessingService`` as is.
+    """
+
+    READ_BLOCK_SIZE = 64 * 1024
+    MAX_TRACKED_HASHERS = 256
+
+    # In-flight hash state per session. A hasher can't be persisted, so when a
+    # session resumes on another worker (or after a restart) the state is
+    # rebuilt once from the partial file.
+    _hashers = OrderedDict()
+    _hashers_lock = threading.Lock()
+
+    def start(self, collection, filename, total_size, expected_hash=''):
+        filename = os.path.basename(filename or '').strip()
+        file_extension = os.path.splitext(filename)[1].lower()
+
+        if not filename:
+            raise UploadError('Filename is required.')
+        if file_extension not in ALLOWED_EXTENSIONS:
+            raise UploadError('File type not supported.')
+        if total_size <= 0:
+            raise UploadError('File is empty.')
+        if total_size > settings.RAG_MAX_UPLOAD_SIZE:
+            raise UploadError(
+                f'File too large. Maximum {settings.RAG_MAX_UPLOAD_SIZE // (1024 * 1024)}MB.',
+                status=413
+            )
+
+        expected_hash = (expected_hash or '').lower()
+        if expected_hash and self._is_duplicate(collection, expected_hash):
+            raise UploadError(f'"{filename}" is already in this collection.', status=409)
+
+        # Resume an interrupted upload of the same file rather than starting over.
+        session = UploadSession.objects.filter(
+            collection=collection,
+            filename=filename,
+            total_size=total_size,
+            status='uploading'
+        ).order_by('-updated_at').first()
+
+        if session:
+            partial_size = self._partial_size(session)
+            if session.received_size != partial_size:
+                session.received_size = partial_size
+                session.save(update_fields=['received_size', 'updated_at'])
+
+        if session is None:
+            session = UploadSession.objects.create(
+                collection=collection,
+                filename=filename,
+                file_type=file_extension[1:],
+                total_size=total_size,
+                expected_hash=expected_hash
+            )
+        return session
+
+    def write_chunk(self, session, offset, stream, length):
+        with transaction.atomic():
+            # A client retry can arrive while the first attempt at the same
+            # offset is still being written. The row lock serializes them on
+            # databases that support it; the file lock also covers SQLite and
+            # every worker process.
+            session.refresh_from_db(from_queryset=UploadSession.objects.select_for_update())
+            if session.status != 'uploading':
+                raise UploadError('Upload is no longer active.', status=409)
+            path = self._partial_path(session)
+            with open(path, 'ab') as part:
+                fcntl.flock(part, fcntl.LOCK_EX)
+                if os.fstat(part.fileno()).st_size < session.received_size:
+                    # The partial file lost data (removed or replaced): resume
+                    # from what is on disk instead of zero-filling the gap.
+                    self._forget_hasher(session)
+                    session.received_size = os.fstat(part.fileno()).st_size
+                    session.save(update_fields=['received_size', 'updated_at'])
+                    hasher = None
+                else:
+                    hasher = self._write_locked(session, part, offset, stream, length)
+        if hasher is None:
+            raise UploadError('Partial upload is missing data.', status=409, offset=session.received_size)
+
+        if session.received_size == session.total_size:
+            return self._finish(session, hasher.hexdigest())
+        return None
+
+    def _write_locked(self, session, part, offset, stream, length):
+        if os.fstat(part.fileno()).st_size > session.received_size:
+            # Left over from a write that failed before the session was saved.
+            part.truncate(session.received_size)
+
+        if offset != session.received_size:
+            raise UploadError('Offset mismatch.', status=409, offset=session.received_size)
+        if length > settings.RAG_UPLOAD_CHUNK_SIZE:
+            raise UploadError('Chunk too large.', status=413, offset=session.received_size)
+        if offset + length > session.total_size:
+            raise UploadError('Chunk exceeds declared file size.', status=413, offset=session.received_size)
+
+        hasher = self._get_hasher(session)
+        written = 0
+        while written < length:
+            block = stream.read(min(self.READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            hasher.update(block)
+            written += len(block)
+
+        if written != length:
+            # Drop the torn part so the client can retry from the last good offset.
+            part.truncate(offset)
+            self._forget_hasher(session)
+            raise UploadError('Incomplete chunk received.', offset=offset)
+
+        part.flush()
+        session.received_size = offset + written
+        session.save(update_fields=['received_size', 'updated_at'])
+        self._remember_hasher(session, hasher)
+        return hasher
+
+    def abort(self, session):
+        self._forget_hasher(session)
+        try:
+            os.remove(self._partial_path(session))
+        except FileNotFoundError:
+            pass
+        session.delete()
+
+    def _finish(self, session, content_hash):
+        self._forget_hasher(session)
+        session.content_hash = content_hash
+        collection = session.collection
+
+        if session.expected_hash and session.expected_hash != content_hash:
+            return self._fail(session, 'Checksum mismatch.')
+        if self._is_duplicate(collection, content_hash):
+            return self._fail(session, f'"{session.filename}" is already in this collection.', status=409)
+
+        name = default_storage.get_available_name(f'documents/{session.filename}')
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(self._partial_path(session), target)
+
+        previous = find_current_version(collection, session.filename)
+        if previous is not None:
+            try:
+                DocumentProcessingService().reindex_document(previous, name, session.total_size, content_hash)
+            except Exception as e:
+                logger.error(f"Error re-indexing {session.filename}: {str(e)}")
+                return self._fail(session, 'New version could not be processed.')
+            session.document = previous
+            session.status = 'complete'
+            session.save(update_fields=['document', 'status', 'content_hash', 'updated_at'])
+            return previous
+
+        document = Document(
+            collection=collection,
+            filename=session.filename,
+            file_type=session.file_type,
+            file_size=session.total_size,
+            content_hash=content_hash
+        )
+        document.file_path.name = name
+        document.save()
+
+        session.document = document
+        session.status = 'complete'
+        session.save(update_fields=['document', 'status', 'content_hash', 'updated_at'])
+
+        DocumentProcessingService().process_document(document)
+        return document
+
+    def _fail(self, session, message, status=400):
+        try:
+            os.remove(self._partial_path(session))
+        except FileNotFoundError:
+            pass
+        session.status = 'failed'
+        session.error = message
+        session.save(update_fields=['status', 'error', 'content_hash', 'updated_at'])
+        raise UploadError(message, status=status)
+
+    def _is_duplicate(self, collection, content_hash):
+        return Document.objects.filter(collection=collection, content_hash=content_hash).exists()
+
+    def _partial_path(self, session):
+        os.makedirs(settings.RAG_UPLOAD_TEMP_DIR, exist_ok=True)
+        return os.path.join(str(settings.RAG_UPLOAD_TEMP_DIR), f"{session.id}.part")
+
+    def _partial_size(self, session):
+        try:
+            return os.path.getsize(self._partial_path(session))
+        except OSError:
+            return 0
+
+    def _get_hasher(self, session):
+        with self._hashers_lock:
+            entry = self._hashers.pop(session.id, None)
+        if entry and entry[0] == session.received_size:
+            return entry[1]
+
+        hasher = hashlib.sha256()
+        remaining = session.received_size
+        if remaining:
+            with open(self._partial_path(session), 'rb') as part:
+                while remaining:
+                    block = part.read(min(self.READ_BLOCK_SIZE, remaining))
+                    if not block:
+                        raise UploadError('Partial upload is missing data.', status=409, offset=0)
+                    hasher.update(block)
+                    remaining -= len(block)
+        return hasher
+
+    def _remember_hasher(self, session, hasher):
+        with self._hashers_lock:
+            self._hashers[session.id] = (session.received_size, hasher)
+            while len(self._hashers) > self.MAX_TRACKED_HASHERS:
+                self._hashers.popitem(last=False)
+
+    def _forget_hasher(self, session):
+        with self._hashers_lock:
+            self._hashers.pop(session.id, None)
+
+
+class BatchIngestionService:
+    """Ingest many files into one collection with a bounded worker pool.
+
+    Files are staged one after another (hashed while being written to disk,
+    duplicates dropped), then extracted, chunked and embedded in parallel on
+    the process-wide embedding model. Results are written to the database and
+    the shared Chroma collection handle from the calling thread, so SQLite
+    never sees concurrent writers.
+    """
+
+    READ_BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, collection, workers=None):
+        self.collection = collection
+        self.workers = max(1, workers or settings.RAG_INGEST_WORKERS)
+        self.processor = DocumentProcessingService()
+
+    def ingest(self, sources):
+        started = time.perf_counter()
+        report = {
+            'collection_id': self.collection.id,
+            'workers': self.workers,
+            'files_total': 0,
+            'ingested': 0,
+            'duplicates': 0,
+            'replaced': 0,
+            'chunks_reembedded': 0,
+            'failed': [],
+            'bytes': 0,
+            'chunks': 0,
+        }
+
+        documents = []
+        revisions = []
+        for filename, fileobj in sources:
+            report['files_total'] += 1
+            try:
+                document, revision = self._stage(filename, fileobj)
+            except UploadError as e:
+                if e.status == 409:
+                    report['duplicates'] += 1
+                else:
+                    report['failed'].append({'filename': filename, 'error': str(e)})
+                continue
+            if revision is None:
+                report['bytes'] += document.file_size
+                documents.append(document)
+            else:
+                report['bytes'] += revision['file_size']
+                revisions.append((document, revision))
+
+        chroma_collection = vector_collection(self.collection)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(self.processor.prepare_document, document): document
+                for document in documents
+            }
+            for future in as_completed(futures):
+                document = futures[future]
+                try:
+                    prepared = future.result()
+                    if prepared is None:
+                        raise ValueError('No text could be extracted.')
+                    self.processor.store_document(document, *prepared, chroma_collection=chroma_collection)
+                except Exception as e:
+                    logger.error(f"Error processing document {document.filename}: {str(e)}")
+                    report['failed'].append({'filename': document.filename, 'error': str(e)})
+                    continue
+                report['ingested'] += 1
+                report['chunks'] += document.chunk_count
+
+        # New versions of existing files only re-embed what changed; they run
+        # after the pool so a file replaced within the same batch is in place.
+        for document, revision in revisions:
+            try:
+                stats = self.processor.reindex_document(document, **revision)
+            except Exception as e:
+                logger.error(f"Error re-indexing {document.filename}: {str(e)}")
+                report['failed'].append({'filename': document.filename, 'error': str(e)})
+                continue
+            report['replaced'] += 1
+            report['chunks'] += stats['chunks']
+            report['chunks_reembedded'] += stats['added']
+
+        elapsed = time.perf_counter() - started
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['files_per_second'] = round(report['ingested'] / elapsed, 2) if elapsed else 0
+        report['chunks_per_second'] = round(report['chunks'] / elapsed, 2) if elapsed else 0
+        report['mb_per_second'] = round(report['bytes'] / (1024 * 1024) / elapsed, 2) if elapsed else 0
+        return report
+
+    def _stage(self, filename, fileobj):
+        filename = os.path.basename(filename or '').strip()
+        file_extension = os.path.splitext(filename)[1].lower()
+        if file_extension not in ALLOWED_EXTENSIONS:
+            raise UploadError('File type not supported.')
+
+        os.makedirs(settings.RAG_UPLOAD_TEMP_DIR, exist_ok=True)
+        temp_path = os.path.join(str(settings.RAG_UPLOAD_TEMP_DIR), f"batch_{uuid.uuid4().hex}.part")
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as out:
+                while True:
+                    block = fileobj.read(self.READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > settings.RAG_MAX_UPLOAD_SIZE:
+                        raise UploadError('File too large.', status=413)
+                    hasher.update(block)
+                    out.write(block)
+
+            if size == 0:
+                raise UploadError('File is empty.')
+            content_hash = hasher.hexdigest()
+            if Document.objects.filter(collection=self.collection, content_hash=content_hash).exists():
+                raise UploadError('Duplicate file.', status=409)
+
+            name = default_storage.get_available_name(f'documents/{filename}')
+            target = default_storage.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        previous = find_current_version(self.collection, filename)
+        if previous is not None:
+            return previous, {'storage_name': name, 'file_size': size, 'content_hash': content_hash}
+
+        document = Document(
+            collection=self.collection,
+            filename=filename,
+            file_type=file_extension[1:],
+            file_size=size,
+            content_hash=content_hash
+        )
+        document.file_path.name = name
+        document.save()
+        return document, None
+
+
+def expand_uploaded_files(files):
+    """Yield (filename, fileobj) for uploaded files, unpacking .zip archives."""
+    for uploaded in files:
+        if uploaded.name.lower().endswith('.zip'):
+            yield from _iter_zip(uploaded)
+        else:
+            yield uploaded.name, uploaded
+
+
+def expand_paths(paths):
+    """Yield (filename, fileobj) for files, directories (recursively) and .zip archives."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs.sort()
+                yield from expand_paths(os.path.join(root, name) for name in sorted(filenames))
+        elif path.lower().endswith('.zip'):
+            with open(path, 'rb') as fileobj:
+                yield from _iter_zip(fileobj)
+        else:
+            with open(path, 'rb') as fileobj:
+                yield os.path.basename(path), fileobj
+
+
+def _iter_zip(fileobj):
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                continue
+            with archive.open(info) as member:
+                yield os.path.basename(info.filename), member
+
+
+def hash_uploaded_file(file):
+    hasher = hashlib.sha256()
+    for block in file.chunks():
+        hasher.update(block)
+    file.seek(0)
+    return hasher.hexdigest()
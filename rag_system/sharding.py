@@ -0,0 +1,175 @@
+"""Chroma persistence sharded across directories.
+
+Every Chroma PersistentClient owns one ``chroma.sqlite3`` plus its index
+files, and all reads and writes to it share that database's locks. With
+CHROMA_SHARDS > 1 collections are spread over ``shard_NNN`` directories
+under CHROMA_PERSIST_DIRECTORY, one client each, so one tenant's ingestion
+only contends with the tenants that hash to the same shard.
+
+The shard comes from a jump consistent hash of the user id (or of the
+collection id with CHROMA_SHARD_BY = "collection"): it is stable across
+processes and restarts, and growing from N to N + 1 shards only moves about
+1 / (N + 1) of the collections. With a single shard the store stays in
+CHROMA_PERSIST_DIRECTORY itself, the pre-sharding layout.
+
+``manage.py migrate_chroma_shards`` moves collections whose shard changed;
+``manage.py chroma_shard_stats`` reports size and latency per shard.
+"""
+import hashlib
+import os
+import re
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+SHARD_DIR_PREFIX = 'shard_'
+COLLECTION_NAME = re.compile(r'^user_(\d+)_col_(\d+)$')
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def jump_hash(key, buckets):
+    """Lamping & Veach jump consistent hash of an integer key."""
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_count():
+    return max(1, settings.CHROMA_SHARDS)
+
+
+def shard_for(user_id, collection_id, shards=None):
+    key = collection_id if settings.CHROMA_SHARD_BY == 'collection' else user_id
+    # Hash first so consecutive ids don't land on consecutive jump sequences.
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return jump_hash(int.from_bytes(digest, 'big'), shards or shard_count())
+
+
+def shard_for_name(name, shards=None):
+    """Shard of a ``user_{id}_col_{id}`` collection name, None for others."""
+    match = COLLECTION_NAME.match(name)
+    if match is None:
+        return None
+    return shard_for(int(match.group(1)), int(match.group(2)), shards)
+
+
+def shard_path(shard, shards=None):
+    root = Path(settings.CHROMA_PERSIST_DIRECTORY)
+    if (shards or shard_count()) == 1:
+        return root
+    return root / f"{SHARD_DIR_PREFIX}{shard:03d}"
+
+
+def existing_locations():
+    """Every directory that currently holds a Chroma store: the root (the
+    single-shard layout) and any shard directory, whatever CHROMA_SHARDS is."""
+    root = Path(settings.CHROMA_PERSIST_DIRECTORY)
+    locations = []
+    if (root / 'chroma.sqlite3').exists():
+        locations.append(root)
+    if root.is_dir():
+        locations.extend(sorted(
+            path for path in root.iterdir()
+            if path.is_dir() and path.name.startswith(SHARD_DIR_PREFIX) and (path / 'chroma.sqlite3').exists()
+        ))
+    return locations
+
+
+def client_at(path):
+    """Process-wide PersistentClient for one directory."""
+    key = str(path)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                import chromadb
+                client = chromadb.PersistentClient(path=key)
+                _clients[key] = client
+    return client
+
+
+def shard_client(shard):
+    return client_at(shard_path(shard))
+
+
+def client_for(collection):
+    return shard_client(shard_for(collection.user_id, collection.id))
+
+
+def move_collection(name, source, target, batch_size=1000):
+    """Copy a collection between clients page by page, check the count and
+    drop the source. Upserts make an interrupted move safe to rerun."""
+    source_collection = source.get_collection(name=name)
+    target_collection = target.get_or_create_collection(name=name, metadata=source_collection.metadata or None)
+    offset = 0
+    while True:
+        page = source_collection.get(
+            limit=batch_size, offset=offset, include=['embeddings', 'documents', 'metadatas']
+        )
+        if not page['ids']:
+            break
+        target_collection.upsert(
+            ids=page['ids'],
+            embeddings=page['embeddings'],
+            documents=page['documents'],
+            metadatas=page['metadatas'],
+        )
+        offset += len(page['ids'])
+    if target_collection.count() != source_collection.count():
+        raise RuntimeError(
+            f"{name}: {target_collection.count()} vectors copied, {source_collection.count()} expected"
+        )
+    source.delete_collection(name=name)
+    return offset
+
+
+def directory_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        # Shard directories nested in the root store are counted on their own.
+        dirs[:] = [name for name in dirs if not name.startswith(SHARD_DIR_PREFIX)]
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+def location_stats(path, probes=5, n_results=5):
+    """Size of one store and the latency of nearest-neighbour queries
+    against each of its collections."""
+    client = client_at(path)
+    collections = client.list_collections()
+    vectors = 0
+    latencies = []
+    for collection in collections:
+        vectors += collection.count()
+        sample = collection.get(limit=1, include=['embeddings'])
+        if not sample['ids']:
+            continue
+        embedding = list(sample['embeddings'][0])
+        for _ in range(probes):
+            started = time.perf_counter()
+            collection.query(query_embeddings=[embedding], n_results=n_results)
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {
+        'path': str(path),
+        'collections': len(collections),
+        'vectors': vectors,
+        'bytes': directory_size(path),
+        'sqlite_bytes': os.path.getsize(Path(path) / 'chroma.sqlite3'),
+        'query_ms_p50': round(statistics.median(latencies), 2) if latencies else None,
+        'query_ms_max': round(latencies[-1], 2) if latencies else None,
+    }
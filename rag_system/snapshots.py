@@ -0,0 +1,357 @@
+"""Portable collection snapshots.
+
+A snapshot is a zip archive laid out like a numpy ``.npz``: numeric columns
+are stored uncompressed as ``.npy`` members so they can be read straight off
+the stream, text is newline-delimited JSON. Chunks are written in shards so
+neither export nor import holds more than one shard in memory:
+
+    manifest.json                   format version, model, collection settings
+    documents.jsonl                 one document per line
+    files/<n>/<filename>            original uploads (optional)
+    shards/<n>/embeddings.npy       float32 or float16, (rows, dimensions)
+    shards/<n>/document.npy         int32 index into documents.jsonl
+    shards/<n>/chunk_index.npy      int32
+    shards/<n>/page_number.npy      int32, -1 for none
+    shards/<n>/texts.jsonl          chunk text, one JSON string per line
+
+Importing bulk-loads the rows and the stored vectors, so nothing is
+re-embedded.
+"""
+import io
+import json
+import logging
+import shutil
+import time
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from chat.cache import RAG, bump_stamp
+
+from .models import Document, DocumentChunk, DocumentCollection
+from .services import (
+    CHROMA_ADD_BATCH_SIZE, EMBEDDING_MODEL_NAME, chroma_collection_name, chunk_hash, chunk_metadata,
+    chunk_vector_id, drop_vector_collection, get_embedding_model, vector_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'techchat-collection'
+SNAPSHOT_VERSION = 1
+DEFAULT_SHARD_SIZE = 4096
+NO_PAGE = -1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _write_array(archive, name, array):
+    # Stored, not deflated: floats barely compress and the reader can then
+    # stream the member without inflating it.
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    with archive.open(info, 'w', force_zip64=True) as member:
+        np.lib.format.write_array(member, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _read_array(archive, name):
+    with archive.open(name) as member:
+        return np.lib.format.read_array(member, allow_pickle=False)
+
+
+def _write_lines(archive, name, rows):
+    with archive.open(name, 'w', force_zip64=True) as member:
+        with io.TextIOWrapper(member, encoding='utf-8') as text:
+            for row in rows:
+                text.write(json.dumps(row, ensure_ascii=False))
+                text.write('\n')
+
+
+def _read_lines(archive, name):
+    with archive.open(name) as member:
+        for line in io.TextIOWrapper(member, encoding='utf-8'):
+            if line.strip():
+                yield json.loads(line)
+
+
+class CollectionExporter:
+    def __init__(self, collection, shard_size=DEFAULT_SHARD_SIZE, include_files=True, dtype='float32'):
+        if dtype not in ('float32', 'float16'):
+            raise SnapshotError(f"Unsupported embedding dtype: {dtype}")
+        self.collection = collection
+        self.shard_size = max(1, shard_size)
+        self.include_files = include_files
+        self.dtype = dtype
+
+    def export(self, path):
+        started = time.perf_counter()
+        documents = list(self.collection.documents.filter(processed=True).order_by('uploaded_at', 'id'))
+        document_index = {document.id: i for i, document in enumerate(documents)}
+        try:
+            chroma_collection = vector_collection(self.collection, create=False)
+        except Exception as e:
+            raise SnapshotError(f"Vector store collection is unavailable: {str(e)}")
+
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            files = self._write_documents(archive, documents)
+
+            shards = []
+            dimensions = None
+            reembedded = 0
+            chunks = (
+                DocumentChunk.objects
+                .filter(document__in=documents)
+                .order_by('document__uploaded_at', 'document_id', 'chunk_index')
+                .only('document_id', 'chunk_index', 'page_number', 'content', 'vector_id')
+            )
+            buffer = []
+            for chunk in chunks.iterator(chunk_size=self.shard_size):
+                buffer.append(chunk)
+                if len(buffer) == self.shard_size:
+                    rows, dimensions, missing = self._write_shard(archive, len(shards), buffer, document_index, chroma_collection)
+                    shards.append(rows)
+                    reembedded += missing
+                    buffer = []
+            if buffer:
+                rows, dimensions, missing = self._write_shard(archive, len(shards), buffer, document_index, chroma_collection)
+                shards.append(rows)
+                reembedded += missing
+
+            manifest = {
+                'format': SNAPSHOT_FORMAT,
+                'version': SNAPSHOT_VERSION,
+                'created_at': timezone.now().isoformat(),
+                'embedding_model': EMBEDDING_MODEL_NAME,
+                'dimensions': dimensions,
+                'dtype': self.dtype,
+                'collection': {
+                    'source_id': self.collection.id,
+                    'owner': self.collection.user.username,
+                    'name': self.collection.name,
+                    'description': self.collection.description,
+                    'chunk_strategy': self.collection.chunk_strategy,
+                    'chunk_size_tokens': self.collection.chunk_size_tokens,
+                    'chunk_overlap_tokens': self.collection.chunk_overlap_tokens,
+                    'vector_storage': self.collection.vector_storage,
+                },
+                'documents': len(documents),
+                'chunks': sum(shards),
+                'shards': shards,
+                'files': files,
+            }
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+        return {
+            'documents': len(documents),
+            'chunks': manifest['chunks'],
+            'shards': len(shards),
+            'files': files,
+            'reembedded': reembedded,
+            'elapsed_seconds': round(time.perf_counter() - started, 2),
+        }
+
+    def _write_documents(self, archive, documents):
+        files = 0
+        rows = []
+        for i, document in enumerate(documents):
+            member = ''
+            if self.include_files and document.file_path:
+                member = f"files/{i}/{document.filename}"
+                try:
+                    with document.file_path.open('rb') as source:
+                        with archive.open(member, 'w', force_zip64=True) as target:
+                            shutil.copyfileobj(source, target, 1024 * 1024)
+                    files += 1
+                except (FileNotFoundError, OSError) as e:
+                    logger.warning(f"Snapshot: file for {document.filename} not included: {str(e)}")
+                    member = ''
+            rows.append({
+                'filename': document.filename,
+                'file_type': document.file_type,
+                'file_size': document.file_size,
+                'content_hash': document.content_hash,
+                'version': document.version,
+                'uploaded_at': document.uploaded_at.isoformat(),
+                'file': member,
+                'source_id': str(document.id),
+            })
+        _write_lines(archive, 'documents.jsonl', rows)
+        return files
+
+    def _write_shard(self, archive, number, chunks, document_index, chroma_collection):
+        ids = [chunk.chroma_id for chunk in chunks]
+        found = chroma_collection.get(ids=ids, include=['embeddings'])
+        vectors = dict(zip(found['ids'], found['embeddings']))
+
+        # Chunks whose vector is gone (e.g. a damaged store) are embedded again
+        # rather than silently dropped from the snapshot.
+        missing = [i for i, vector_id in enumerate(ids) if vector_id not in vectors]
+        if missing:
+            model = get_embedding_model()
+            if model is None:
+                raise SnapshotError(f"{len(missing)} chunks have no stored vector and the embedding model is unavailable.")
+            for i, vector in zip(missing, model.encode([chunks[i].content for i in missing])):
+                vectors[ids[i]] = vector
+
+        embeddings = np.asarray([vectors[vector_id] for vector_id in ids], dtype=self.dtype)
+        prefix = f"shards/{number:05d}"
+        _write_array(archive, f"{prefix}/embeddings.npy", embeddings)
+        _write_array(archive, f"{prefix}/document.npy", np.array([document_index[chunk.document_id] for chunk in chunks], dtype=np.int32))
+        _write_array(archive, f"{prefix}/chunk_index.npy", np.array([chunk.chunk_index for chunk in chunks], dtype=np.int32))
+        _write_array(archive, f"{prefix}/page_number.npy", np.array(
+            [NO_PAGE if chunk.page_number is None else chunk.page_number for chunk in chunks], dtype=np.int32
+        ))
+        _write_lines(archive, f"{prefix}/texts.jsonl", (chunk.content for chunk in chunks))
+        return len(chunks), embeddings.shape[1], len(missing)
+
+
+class CollectionImporter:
+    def __init__(self, user, name=None, include_files=True):
+        self.user = user
+        self.name = name
+        self.include_files = include_files
+
+    def import_archive(self, path):
+        started = time.perf_counter()
+        try:
+            archive = zipfile.ZipFile(path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise SnapshotError(f"Not a snapshot archive: {str(e)}")
+
+        with archive:
+            manifest = self._read_manifest(archive)
+            chroma_collection = None
+            self._saved_files = []
+            try:
+                with transaction.atomic():
+                    collection = self._create_collection(manifest)
+                    documents = self._create_documents(archive, collection)
+                    chroma_collection = vector_collection(collection)
+                    chunks = self._load_chunks(archive, manifest, documents, chroma_collection)
+                    # The documents and chunks were bulk-created, which sends
+                    # no signals.
+                    bump_stamp(self.user.id, RAG)
+            except Exception:
+                if chroma_collection is not None:
+                    try:
+                        drop_vector_collection(collection)
+                    except Exception as e:
+                        logger.warning(f"Snapshot: could not remove partial vector collection: {str(e)}")
+                # The rollback removes the rows but not the files saved for them.
+                for name in self._saved_files:
+                    try:
+                        default_storage.delete(name)
+                    except Exception as e:
+                        logger.warning(f"Snapshot: could not remove {name}: {str(e)}")
+                raise
+
+        return {
+            'collection': collection,
+            'documents': len(documents),
+            'chunks': chunks,
+            'elapsed_seconds': round(time.perf_counter() - started, 2),
+        }
+
+    def _read_manifest(self, archive):
+        try:
+            manifest = json.loads(archive.read('manifest.json'))
+        except KeyError:
+            raise SnapshotError("Archive has no manifest.json.")
+        if manifest.get('format') != SNAPSHOT_FORMAT:
+            raise SnapshotError("Archive is not a collection snapshot.")
+        if manifest.get('version', 0) > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot version {manifest['version']} is newer than this server supports ({SNAPSHOT_VERSION}).")
+        if manifest.get('embedding_model') != EMBEDDING_MODEL_NAME:
+            raise SnapshotError(
+                f"Snapshot vectors come from {manifest.get('embedding_model')}, this server embeds with {EMBEDDING_MODEL_NAME}."
+            )
+        return manifest
+
+    def _create_collection(self, manifest):
+        settings = manifest['collection']
+        return DocumentCollection.objects.create(
+            user=self.user,
+            name=self.name or settings['name'],
+            description=settings.get('description', ''),
+            chunk_strategy=settings.get('chunk_strategy', 'characters'),
+            chunk_size_tokens=settings.get('chunk_size_tokens', 0),
+            chunk_overlap_tokens=settings.get(
+                'chunk_overlap_tokens', DocumentCollection._meta.get_field('chunk_overlap_tokens').default
+            ),
+            vector_storage=settings.get('vector_storage', 'float32'),
+        )
+
+    def _create_documents(self, archive, collection):
+        documents = []
+        for row in _read_lines(archive, 'documents.jsonl'):
+            document = Document(
+                collection=collection,
+                filename=row['filename'],
+                file_type=row['file_type'],
+                file_size=row['file_size'],
+                content_hash=row.get('content_hash', ''),
+                version=row.get('version', 1),
+                processed=True,
+                chroma_collection_name=chroma_collection_name(collection),
+            )
+            if self.include_files and row.get('file'):
+                with archive.open(row['file']) as source:
+                    # Saves through the storage backend in chunks; nothing is
+                    # read into memory.
+                    document.file_path.save(row['filename'], source, save=False)
+                self._saved_files.append(document.file_path.name)
+            documents.append(document)
+        Document.objects.bulk_create(documents)
+        return documents
+
+    def _load_chunks(self, archive, manifest, documents, chroma_collection):
+        occurrences = defaultdict(int)
+        chunk_counts = defaultdict(int)
+        total = 0
+        for number, rows in enumerate(manifest['shards']):
+            prefix = f"shards/{number:05d}"
+            embeddings = _read_array(archive, f"{prefix}/embeddings.npy").astype(np.float32, copy=False)
+            document_column = _read_array(archive, f"{prefix}/document.npy")
+            index_column = _read_array(archive, f"{prefix}/chunk_index.npy")
+            page_column = _read_array(archive, f"{prefix}/page_number.npy")
+            texts = list(_read_lines(archive, f"{prefix}/texts.jsonl"))
+            if not (len(texts) == len(embeddings) == len(document_column) == rows):
+                raise SnapshotError(f"Shard {number} is truncated or inconsistent.")
+
+            chunks = []
+            for text, document_number, chunk_index, page_number in zip(texts, document_column, index_column, page_column):
+                document = documents[document_number]
+                content_hash = chunk_hash(text)
+                key = (document.id, content_hash)
+                chunks.append(DocumentChunk(
+                    document=document,
+                    content=text,
+                    chunk_index=int(chunk_index),
+                    page_number=None if page_number == NO_PAGE else int(page_number),
+                    content_hash=content_hash,
+                    vector_id=chunk_vector_id(document, content_hash, occurrences[key]),
+                ))
+                occurrences[key] += 1
+                chunk_counts[document.id] += 1
+            DocumentChunk.objects.bulk_create(chunks, batch_size=CHROMA_ADD_BATCH_SIZE)
+
+            for start in range(0, len(chunks), CHROMA_ADD_BATCH_SIZE):
+                batch = chunks[start:start + CHROMA_ADD_BATCH_SIZE]
+                chroma_collection.add(
+                    documents=[chunk.content for chunk in batch],
+                    embeddings=embeddings[start:start + CHROMA_ADD_BATCH_SIZE],
+                    metadatas=[chunk_metadata(chunk.document, chunk.chunk_index) for chunk in batch],
+                    ids=[chunk.vector_id for chunk in batch]
+                )
+            total += len(chunks)
+            logger.info(f"Snapshot: loaded shard {number + 1}/{len(manifest['shards'])} ({total} chunks)")
+
+        for document in documents:
+            document.chunk_count = chunk_counts[document.id]
+        Document.objects.bulk_update(documents, ['chunk_count'])
+        return total
@@ -1,3 +1,859 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .chunking import ChunkingEngine, WhitespaceTokenizer
+from .compression import CompressedContext, compress_context, count_prompt_tokens
+from .models import Document, DocumentCollection, UploadSession
+from .services import (
+    BatchIngestionService, ChunkedUploadService, DocumentProcessingService, RAGService, UploadError,
+    vector_collection,
+)
+from .quantization import MERGE_FACTOR, MODES, QuantizedStore
+from .query_embeddings import QueryEncoder
+from .sharding import client_at, jump_hash, move_collection, shard_for, shard_for_name
+from .snapshots import CollectionExporter, CollectionImporter, SnapshotError
+
+DIM = 32
+
+
+class FakeEncoder:
+    """Stands in for the SentenceTransformer: a deterministic unit vector
+    per distinct text, no tokenizer (chunking falls back to whitespace)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'big')
+            vector = np.random.default_rng(seed).normal(size=DIM)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def fast_tokenizer(words):
+    """A Hugging Face fast tokenizer over ``words``, built offline."""
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(['[UNK]'] + words)}, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token='[UNK]', pad_token='[UNK]')
+
+
+class TokenizerModel(FakeEncoder):
+    """FakeEncoder with a real fast tokenizer, which ``encode`` truncates
+    and pads like SentenceTransformer does."""
+
+    max_seq_length = 16
+
+    def __init__(self, words):
+        super().__init__()
+        self.tokenizer = fast_tokenizer(words)
+
+    def encode(self, texts):
+        self.tokenizer(list(texts), truncation=True, max_length=self.max_seq_length, padding=True)
+        return super().encode(texts)
+
+
+class ChunkingTests(TestCase):
+    def engine(self, strategy='structure', max_tokens=20, overlap=0):
+        return ChunkingEngine(WhitespaceTokenizer(), max_tokens, overlap, strategy)
+
+    def words(self, count, start=0):
+        return ' '.join(f'word{i}' for i in range(start, start + count))
+
+    def test_token_budget_is_never_exceeded(self):
+        pages = [(1, f"INTRODUCTION\n\n{self.words(15)}\n\n{self.words(55, 100)}"), (2, self.words(33, 200))]
+        for strategy in ('structure', 'tokens'):
+            engine = self.engine(strategy, overlap=4)
+            chunks = engine.split_pages(pages)
+            self.assertTrue(chunks)
+            for chunk, tokens in zip(chunks, engine.count_tokens([chunk.text for chunk in chunks])):
+                self.assertLessEqual(tokens, 20, strategy)
+                self.assertEqual(chunk.token_count, tokens, strategy)
+
+    def test_offsets_rebuild_the_text(self):
+        text = "  First line,\twith tabs.\nSecond   line ünïcode. " + self.words(50)
+        chunks = self.engine('tokens').split_pages([(None, text)])
+        self.assertEqual(' '.join(chunk.text for chunk in chunks).split(), text.split())
+        self.assertTrue(all(chunk.text in text for chunk in chunks))
+
+    def test_headings_start_a_new_chunk(self):
+        text = "\n\n".join([
+            "Short intro paragraph.", "2.1 Scope", "Scope body text.", "# Results", "Results body text."
+        ])
+        chunks = self.engine(max_tokens=100).split_pages([(None, text)])
+        self.assertEqual([chunk.text for chunk in chunks], [
+            "Short intro paragraph.", "2.1 Scope\n\nScope body text.", "# Results\n\nResults body text."
+        ])
+
+    def test_small_paragraphs_are_packed(self):
+        text = "\n\n".join(self.words(5, i * 10) for i in range(6))
+        chunks = self.engine(max_tokens=12).split_pages([(None, text)])
+        self.assertEqual([chunk.token_count for chunk in chunks], [10, 10, 10])
+
+    def test_long_paragraphs_are_windowed_with_overlap(self):
+        chunks = self.engine(max_tokens=10, overlap=3).split_pages([(None, self.words(24))])
+        windows = [chunk.text.split() for chunk in chunks]
+        self.assertEqual(windows[0], self.words(10).split())
+        for previous, window in zip(windows, windows[1:]):
+            self.assertEqual(window[:3], previous[-3:])
+        self.assertEqual(windows[-1][-1], 'word23')
+
+    def test_heading_stays_with_a_long_paragraph(self):
+        chunks = self.engine(max_tokens=10).split_pages([(None, "OVERVIEW\n\n" + self.words(15))])
+        self.assertTrue(chunks[0].text.startswith("OVERVIEW\n\nword0"))
+        self.assertEqual(chunks[0].token_count, 10)
+
+    def test_page_numbers_are_kept(self):
+        pages = [(1, self.words(5)), (2, self.words(5, 5)), (3, self.words(25, 10))]
+        for strategy in ('structure', 'tokens'):
+            chunks = self.engine(strategy).split_pages(pages)
+            self.assertEqual([chunk.page_number for chunk in chunks], [1, 2, 3, 3], strategy)
+            # Chunks never span pages.
+            self.assertEqual(chunks[1].text, self.words(5, 5))
+
+    def test_characters_strategy_matches_the_old_splitter(self):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        pages = [(1, "Paragraph one. " * 60), (2, "\n\n".join("Paragraph two. " * 20 for _ in range(4)))]
+        old = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(
+            "\n".join(text for _, text in pages)
+        )
+        self.assertEqual([chunk.text for chunk in self.engine('characters').split_pages(pages)], old)
+
+    def test_blank_pages_give_no_chunks(self):
+        self.assertEqual(self.engine().split_pages([(1, ''), (2, '  \n\n ')]), [])
+
+
+class RAGTestCase(TestCase):
+    """Media, uploads and vector stores in a temporary directory; the
+    embedding model is ``encoder`` (None: nothing is embedded)."""
+
+    encoder = None
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        overrides = override_settings(
+            MEDIA_ROOT=os.path.join(self.root, 'media'),
+            RAG_UPLOAD_TEMP_DIR=os.path.join(self.root, 'uploads'),
+            CHROMA_PERSIST_DIRECTORY=os.path.join(self.root, 'chroma'),
+            QUANTIZED_VECTOR_DIRECTORY=os.path.join(self.root, 'quantized'),
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch('rag_system.services.get_embedding_model', return_value=self.encoder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user('alice', password='secret')
+        self.collection = DocumentCollection.objects.create(user=self.user, name='docs', chunk_strategy='tokens')
+
+    def upload(self, filename, text, collection=None):
+        name = default_storage.save(f'documents/{filename}', ContentFile(text.encode()))
+        return Document.objects.create(
+            collection=collection or self.collection, filename=filename, file_path=name,
+            file_type='txt', file_size=len(text)
+        )
+
+
+class ChunkedUploadTests(RAGTestCase):
+    data = ("Resumable uploads are written part by part. " * 400).encode()
+
+    def setUp(self):
+        super().setUp()
+        ChunkedUploadService._hashers.clear()
+        self.service = ChunkedUploadService()
+        self.session = self.service.start(self.collection, 'notes.txt', len(self.data))
+
+    def write(self, offset, end):
+        return self.service.write_chunk(self.session, offset, io.BytesIO(self.data[offset:end]), end - offset)
+
+    def test_resume_on_another_worker_keeps_the_hash(self):
+        self.assertIsNone(self.write(0, 5000))
+        # Another worker has no cached hasher and resumes from the file.
+        ChunkedUploadService._hashers.clear()
+        resumed = self.service.start(self.collection, 'notes.txt', len(self.data))
+        self.assertEqual(resumed.id, self.session.id)
+        self.assertEqual(resumed.received_size, 5000)
+
+        self.session = resumed
+        document = self.write(5000, len(self.data))
+        self.assertEqual(document.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertTrue(document.processed)
+        with open(document.file_path.path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_retry_at_a_written_offset_is_rejected(self):
+        self.write(0, 5000)
+        with self.assertRaises(UploadError) as raised:
+            self.write(0, 5000)
+        self.assertEqual(raised.exception.status, 409)
+        self.assertEqual(raised.exception.offset, 5000)
+        self.assertEqual(os.path.getsize(self.service._partial_path(self.session)), 5000)
+
+    def test_missing_partial_file_restarts_from_disk(self):
+        self.write(0, 5000)
+        os.remove(self.service._partial_path(self.session))
+        with self.assertRaises(UploadError) as raised:
+            self.write(5000, 10000)
+        self.assertEqual(raised.exception.offset, 0)
+        self.assertEqual(UploadSession.objects.get(id=self.session.id).received_size, 0)
+
+        self.write(0, 5000)
+        document = self.write(5000, len(self.data))
+        self.assertEqual(document.content_hash, hashlib.sha256(self.data).hexdigest())
+
+    def test_chunk_past_declared_size_is_rejected(self):
+        with self.assertRaises(UploadError) as raised:
+            self.service.write_chunk(self.session, 0, io.BytesIO(self.data + b'x'), len(self.data) + 1)
+        self.assertEqual(raised.exception.status, 413)
+
+
+def paragraphs(*labels):
+    return "\n\n".join(f"Paragraph {label} talks about topic {label} in seven words." for label in labels)
+
+
+class IndexedTestCase(RAGTestCase):
+    """One paragraph per chunk; int8 storage keeps the vectors on disk in
+    the test directory."""
+
+    encoder = FakeEncoder()
+
+    def setUp(self):
+        super().setUp()
+        self.collection.chunk_strategy = 'structure'
+        self.collection.chunk_size_tokens = 12
+        self.collection.chunk_overlap_tokens = 0
+        self.collection.vector_storage = 'int8'
+        self.collection.save()
+        self.service = DocumentProcessingService()
+
+
+class ReindexTests(IndexedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload('notes.txt', paragraphs(*'ABCDEF'))
+        self.service.process_document(self.document)
+
+    def reindex(self, text):
+        name = default_storage.save('documents/notes.txt', ContentFile(text.encode()))
+        return self.service.reindex_document(self.document, name, len(text), '')
+
+    def vector_ids(self):
+        return {chunk.content.split()[1]: chunk.vector_id for chunk in self.document.chunks.all()}
+
+    def test_reorder_keeps_every_vector(self):
+        before = self.vector_ids()
+        calls = self.encoder.calls
+        stats = self.reindex(paragraphs(*'FEDCBA'))
+
+        self.assertEqual((stats['reused'], stats['added'], stats['removed']), (6, 0, 0))
+        self.assertEqual(self.encoder.calls, calls)
+        self.assertEqual(self.vector_ids(), before)
+        self.assertEqual(
+            [chunk.content.split()[1] for chunk in self.document.chunks.order_by('chunk_index')], list('FEDCBA')
+        )
+        self.assertEqual(self.document.version, 2)
+
+    def test_changed_paragraphs_are_added_and_removed(self):
+        before = self.vector_ids()
+        stats = self.reindex(paragraphs(*'ABXEFY'))
+
+        self.assertEqual((stats['reused'], stats['added'], stats['removed']), (4, 2, 2))
+        after = self.vector_ids()
+        for label in 'ABEF':
+            self.assertEqual(after[label], before[label])
+        self.assertNotIn('C', after)
+
+        store = vector_collection(self.collection)
+        self.assertEqual(store.count(), 6)
+        stored = store.get(ids=list(after.values()), include=['embeddings'])
+        self.assertEqual(sorted(stored['ids']), sorted(after.values()))
+        self.assertEqual(store.get(ids=[before['C'], before['D']])['ids'], [])
+
+
+class SnapshotImportTests(IndexedTestCase):
+    def setUp(self):
+        super().setUp()
+        for filename, labels in (('a.txt', 'ABC'), ('b.txt', 'DEF')):
+            self.service.process_document(self.upload(filename, paragraphs(*labels)))
+        self.archive = os.path.join(self.root, 'docs.zip')
+        CollectionExporter(self.collection).export(self.archive)
+
+    def rewrite_manifest(self, change):
+        with zipfile.ZipFile(self.archive) as source:
+            entries = {name: source.read(name) for name in source.namelist()}
+        manifest = json.loads(entries['manifest.json'])
+        change(manifest)
+        entries['manifest.json'] = json.dumps(manifest)
+        with zipfile.ZipFile(self.archive, 'w') as target:
+            for name, data in entries.items():
+                target.writestr(name, data)
+
+    def media_files(self):
+        return set(os.listdir(os.path.join(settings.MEDIA_ROOT, 'documents')))
+
+    def test_missing_overlap_uses_the_model_default(self):
+        self.rewrite_manifest(lambda manifest: manifest['collection'].pop('chunk_overlap_tokens'))
+        result = CollectionImporter(self.user, name='copy').import_archive(self.archive)
+        self.assertEqual(result['collection'].chunk_overlap_tokens, 16)
+        self.assertEqual(result['chunks'], 6)
+
+    def test_failed_import_removes_saved_files(self):
+        before = self.media_files()
+        self.rewrite_manifest(lambda manifest: manifest['shards'].__setitem__(0, manifest['shards'][0] + 1))
+        with self.assertRaises(SnapshotError):
+            CollectionImporter(self.user, name='copy').import_archive(self.archive)
+        self.assertEqual(self.media_files(), before)
+        self.assertFalse(DocumentCollection.objects.filter(name='copy').exists())
+
+
+class ConditionalGetTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload('a.txt', 'Some text')
+        self.client.force_login(self.user)
+        self.urls = [
+            '/api/collections/',
+            f'/api/collections/{self.collection.id}/',
+            f'/api/collections/{self.collection.id}/documents/',
+            f'/api/documents/{self.document.id}/',
+        ]
+
+    def test_matching_etag_answers_304(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            # Processing, re-indexing and deletes move no timestamp.
+            self.assertNotIn('Last-Modified', response)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_processing_a_document_changes_the_etag(self):
+        url = self.urls[2]
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document.processed = True
+            self.document.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'][0]['processed'])
+
+    def test_deleting_a_document_changes_the_etag(self):
+        url = self.urls[1]
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/rag/delete-document/{self.document.id}/')
+        self.assertFalse(self.collection.documents.exists())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FakeChroma:
+    def __init__(self, documents=(), distances=(), error=None):
+        self.documents = list(documents)
+        self.distances = list(distances)
+        self.error = error
+
+    def query(self, **kwargs):
+        if self.error is not None:
+            raise self.error
+        return {
+            'documents': [self.documents],
+            'metadatas': [[{'filename': f'{text}.txt'} for text in self.documents]],
+            'distances': [self.distances],
+        }
+
+
+class RAGServiceTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collections = [
+            DocumentCollection.objects.create(user=self.user, name=name) for name in ('a', 'b', 'c')
+        ]
+        self.service = RAGService()
+
+    def retrieve(self, *stores):
+        fakes = dict(zip((collection.id for collection in self.collections), stores))
+        with mock.patch('rag_system.services.vector_collection',
+                        side_effect=lambda collection, create=True: fakes[collection.id]):
+            return self.service.retrieve('query', self.collections[:len(stores)], query_embedding=[0.0] * DIM)
+
+    def test_hits_are_merged_by_distance(self):
+        hits = self.retrieve(
+            FakeChroma(['a1', 'a2'], [0.1, 0.5]),
+            FakeChroma(['b1', None, 'b2'], [0.3, 0.35, None]),
+            FakeChroma(['c1'], [0.2]),
+        )
+        self.assertEqual([hit['text'] for hit in hits], ['a1', 'c1', 'b1', 'a2', 'b2'])
+        self.assertEqual([hit['collection'].name for hit in hits], ['a', 'c', 'b', 'a', 'b'])
+
+    def test_failing_collection_is_skipped(self):
+        with self.assertLogs('rag_system.services', 'WARNING'):
+            hits = self.retrieve(
+                FakeChroma(['a1'], [0.4]),
+                FakeChroma(error=RuntimeError('shard unavailable')),
+                FakeChroma(['c1'], [0.2]),
+            )
+        self.assertEqual([hit['text'] for hit in hits], ['c1', 'a1'])
+
+    def test_all_collections_failing_raises(self):
+        with self.assertLogs('rag_system.services', 'WARNING'), self.assertRaisesRegex(RuntimeError, 'down'):
+            self.retrieve(FakeChroma(error=RuntimeError('down')), FakeChroma(error=RuntimeError('down')))
+
+    def test_sources_cover_every_hit_in_the_compressed_context(self):
+        collection = self.collections[0]
+        document = self.upload('a.txt', 'text', collection)
+        Document.objects.filter(id=document.id).update(processed=True)
+        hits = [
+            {'text': f'chunk {i}', 'metadata': {'filename': f'f{i}.txt', 'chunk_index': i},
+             'distance': i / 10, 'collection': collection}
+            for i in range(6)
+        ]
+        compressed = CompressedContext(text='chunk 0 chunk 2 chunk 4 chunk 5', used_hits=[0, 2, 4, 5])
+        completion = mock.Mock(choices=[mock.Mock(message=mock.Mock(content='answer'))])
+        with mock.patch.object(RAGService, 'retrieve', return_value=hits), \
+                mock.patch('rag_system.services.compress_context', return_value=compressed), \
+                mock.patch('openai.chat.completions.create', return_value=completion), \
+                override_settings(RAG_CONTEXT_TOKEN_BUDGET=400):
+            answer, sources = self.service.query_documents('query', [collection.id], self.user)
+
+        self.assertEqual(answer, 'answer')
+        self.assertEqual([source['filename'] for source in sources], ['f0.txt', 'f2.txt', 'f4.txt', 'f5.txt'])
+        self.assertEqual([source['chunk_index'] for source in sources], [0, 2, 4, 5])
+
+
+class CompressionTests(TestCase):
+    def hits(self):
+        backups, rebuild = np.eye(DIM, dtype=np.float32)[:2]
+        return [
+            {'text': 'Backups run nightly. Snapshots are kept for a week.', 'metadata': {}, 'embedding': backups},
+            {'text': 'Run VACUUM after bulk loads. Logs rotate daily.', 'metadata': {}, 'embedding': rebuild},
+        ]
+
+    def test_terms_pick_sentences_without_embeddings(self):
+        hits = [dict(hit, embedding=None) for hit in self.hits()]
+        compressed = compress_context('when do logs rotate', hits, 100, np.eye(DIM)[1])
+        self.assertEqual(compressed.text, 'Logs rotate daily.')
+        self.assertEqual(compressed.used_hits, [1])
+
+    def test_chunk_embeddings_score_sentences_without_shared_terms(self):
+        query_embedding = np.eye(DIM, dtype=np.float32)[1] + 0.1 * np.eye(DIM, dtype=np.float32)[0]
+        compressed = compress_context('reclaim disk space', self.hits(), 100, query_embedding)
+        self.assertEqual(compressed.text, 'Run VACUUM after bulk loads. Logs rotate daily.')
+        self.assertEqual(compressed.used_hits, [1])
+
+    def test_terms_choose_within_the_relevant_chunk(self):
+        budget = count_prompt_tokens('Logs rotate daily.') + 1
+        compressed = compress_context('when do logs rotate', self.hits(), budget, np.eye(DIM)[1])
+        self.assertEqual(compressed.text, 'Logs rotate daily.')
+
+
+class GatedEncoder(FakeEncoder):
+    """Records every batch; the first ``encode`` call blocks until ``gate``
+    is set, and every call raises ``error`` if there is one."""
+
+    def __init__(self, error=None):
+        super().__init__()
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.batches = []
+        self.error = error
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.started.set()
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return super().encode(texts)
+
+
+class QueryEncoderTests(TestCase):
+    def setUp(self):
+        self.model = FakeEncoder()
+        self.encoder = QueryEncoder(self.model, 'fake', cache_size=100, batch_size=8, window_ms=1)
+
+    def run_concurrently(self, encoder, queries, wait_for_misses):
+        """Encode ``queries`` on one thread each while the model is stuck on
+        its first batch; returns each thread's vector or exception."""
+        results = [None] * len(queries)
+
+        def encode(i):
+            try:
+                results[i] = encoder.encode(queries[i])
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=encode, args=(i,)) for i in range(len(queries))]
+        threads[0].start()
+        self.assertTrue(encoder.model.started.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        for _ in range(500):
+            if encoder.stats()['misses'] == wait_for_misses:
+                break
+            threading.Event().wait(0.01)
+        encoder.model.gate.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_queries_share_one_batch(self):
+        model = GatedEncoder()
+        encoder = QueryEncoder(model, 'gated', cache_size=100, batch_size=8, window_ms=1)
+        queries = ['first', 'q1', 'q2', 'q3', 'q4', 'q5', 'q1']
+        results = self.run_concurrently(encoder, queries, wait_for_misses=len(queries))
+
+        self.assertEqual(model.batches[0], ['first'])
+        self.assertEqual(len(model.batches), 2)
+        self.assertEqual(sorted(model.batches[1]), ['q1', 'q2', 'q3', 'q4', 'q5'])
+        for query, vector in zip(queries, results):
+            np.testing.assert_array_equal(vector, self.model.encode([query])[0])
+        stats = encoder.stats()
+        self.assertEqual((stats['misses'], stats['shared'], stats['hits']), (7, 1, 0))
+        self.assertEqual(stats['batch_size']['count'], 2)
+
+    def test_lru_evicts_the_least_recently_used(self):
+        encoder = QueryEncoder(self.model, 'fake', cache_size=2, batch_size=1, window_ms=0)
+        for query in ('a', 'b', ' a ', 'c', 'b', 'a'):
+            encoder.encode(query)
+        # "a" was used after "b", so "c" evicts "b"; "b" then evicts "a".
+        stats = encoder.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 5, 3))
+        self.assertEqual(stats['cache_entries'], 2)
+        self.assertEqual(self.model.calls, 5)
+        self.assertEqual(list(encoder._cache), ['b', 'a'])
+        with self.assertRaises(ValueError):
+            encoder.encode('a')[0] = 1.0
+
+    def test_encode_error_reaches_every_waiting_caller(self):
+        model = GatedEncoder(error=RuntimeError('model crashed'))
+        encoder = QueryEncoder(model, 'gated', cache_size=100, batch_size=8, window_ms=1)
+        results = self.run_concurrently(encoder, ['x', 'x', 'x', 'y', 'z'], wait_for_misses=5)
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results), results)
+        stats = encoder.stats()
+        self.assertEqual((stats['errors'], stats['shared'], stats['cache_entries']), (2, 2, 0))
+        self.assertEqual(encoder._in_flight, {})
+        # Failures are not cached: the next call tries again.
+        model.error = None
+        np.testing.assert_array_equal(encoder.encode('x'), self.model.encode(['x'])[0])
+
+    def test_encode_many_keeps_order_and_shares_duplicates(self):
+        vectors = self.encoder.encode_many(['b', 'a', 'b'])
+        np.testing.assert_array_equal(vectors[0], self.model.encode(['b'])[0])
+        np.testing.assert_array_equal(vectors[0], vectors[2])
+        self.assertEqual(self.encoder.stats()['misses'], 2)
+
+
+class ShardingTests(TestCase):
+    # From the reference C++ implementation in Lamping & Veach, "A Fast,
+    # Minimal Memory, Consistent Hash Algorithm" (2014).
+    REFERENCE = [
+        (1, 1, 0), (42, 57, 43), (0xDEAD10CC, 1, 0), (0xDEAD10CC, 666, 361), (256, 1024, 520),
+        (0, 1000, 0), (1, 65536, 21134), (42, 65536, 5747), (12345678901234567890, 100, 49),
+        (0xFFFFFFFFFFFFFFFF, 10, 9), (0xFFFFFFFFFFFFFFFF, 65536, 18311),
+    ]
+
+    def test_jump_hash_matches_the_reference(self):
+        for key, buckets, expected in self.REFERENCE:
+            self.assertEqual(jump_hash(key, buckets), expected, (key, buckets))
+
+    def test_growing_moves_few_keys_and_only_to_the_new_shard(self):
+        keys = [int.from_bytes(hashlib.blake2b(str(i).encode(), digest_size=8).digest(), 'big')
+                for i in range(20000)]
+        for shards in (1, 4, 10):
+            moved = [key for key in keys if jump_hash(key, shards) != jump_hash(key, shards + 1)]
+            self.assertEqual({jump_hash(key, shards + 1) for key in moved}, {shards})
+            self.assertAlmostEqual(len(moved) / len(keys), 1 / (shards + 1), delta=0.01)
+
+    def test_shard_key(self):
+        with override_settings(CHROMA_SHARD_BY='user'):
+            self.assertEqual(shard_for(7, 1, 16), shard_for(7, 2, 16))
+            self.assertEqual(shard_for_name('user_7_col_2', 16), shard_for(7, 2, 16))
+        with override_settings(CHROMA_SHARD_BY='collection'):
+            self.assertEqual(shard_for(1, 9, 16), shard_for(2, 9, 16))
+        self.assertIsNone(shard_for_name('langchain', 16))
+
+    def clients(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        source, target = client_at(os.path.join(root, 'a')), client_at(os.path.join(root, 'b'))
+        collection = source.create_collection(name='user_1_col_1', metadata={'hnsw:space': 'cosine'})
+        rng = np.random.default_rng(3)
+        self.ids = [f'v{i}' for i in range(25)]
+        collection.add(
+            ids=self.ids,
+            embeddings=rng.normal(size=(25, 8)).tolist(),
+            documents=[f'chunk {i}' for i in range(25)],
+            metadatas=[{'chunk_index': i} for i in range(25)],
+        )
+        return source, target
+
+    def test_move_collection_copies_every_vector(self):
+        source, target = self.clients()
+        before = source.get_collection(name='user_1_col_1').get(include=['embeddings', 'documents', 'metadatas'])
+        self.assertEqual(move_collection('user_1_col_1', source, target, batch_size=10), 25)
+
+        self.assertNotIn('user_1_col_1', [collection.name for collection in source.list_collections()])
+        moved = target.get_collection(name='user_1_col_1')
+        self.assertEqual(moved.metadata, {'hnsw:space': 'cosine'})
+        after = moved.get(ids=before['ids'], include=['embeddings', 'documents', 'metadatas'])
+        self.assertEqual(after['ids'], before['ids'])
+        self.assertEqual(after['documents'], before['documents'])
+        self.assertEqual(after['metadatas'], before['metadatas'])
+        np.testing.assert_allclose(np.array(after['embeddings']), np.array(before['embeddings']), rtol=1e-6)
+
+    def test_move_collection_keeps_the_source_when_counts_differ(self):
+        source, target = self.clients()
+        collection = target.get_or_create_collection(name='user_1_col_1')
+        lossy = mock.Mock(wraps=collection)
+        lossy.upsert = lambda ids, **columns: collection.upsert(
+            ids=ids[1:], **{name: values[1:] for name, values in columns.items()}
+        )
+        lossy_target = mock.Mock(get_or_create_collection=mock.Mock(return_value=lossy))
+
+        with self.assertRaisesRegex(RuntimeError, 'expected'):
+            move_collection('user_1_col_1', source, lossy_target, batch_size=10)
+        self.assertEqual(source.get_collection(name='user_1_col_1').count(), 25)
+
+
+class QuantizedStoreTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        rng = np.random.default_rng(5)
+        centers = rng.normal(size=(20, 64))
+        self.vectors = (centers[rng.integers(20, size=2000)] + rng.normal(scale=0.3, size=(2000, 64))).astype(np.float32)
+        self.queries = self.vectors[rng.choice(2000, size=50, replace=False)] + rng.normal(scale=0.1, size=(50, 64))
+        self.ids = [str(i) for i in range(2000)]
+
+    def store(self, mode):
+        store = QuantizedStore(os.path.join(self.root, mode), mode)
+        for start in range(0, 2000, 500):
+            store.add(self.ids[start:start + 500], self.vectors[start:start + 500])
+        return store
+
+    def exact(self, query, k, exclude=()):
+        order = np.argsort(((self.vectors - query) ** 2).sum(axis=1))
+        return [self.ids[i] for i in order if self.ids[i] not in exclude][:k]
+
+    def test_recall_against_exact_search(self):
+        for mode in MODES:
+            store = self.store(mode)
+            found = [set(store.search(query, 5)[0]) for query in self.queries]
+            recall = np.mean([len(hits & set(self.exact(query, 5))) / 5 for hits, query in zip(found, self.queries)])
+            self.assertGreaterEqual(recall, 0.9, mode)
+            ids, distances = store.search(self.queries[0], 5)
+            self.assertEqual(distances, sorted(distances))
+
+    def test_deleted_vectors_are_not_found(self):
+        store = self.store('int8')
+        nearest = self.exact(self.queries[0], 3)
+        store.delete(nearest)
+        self.assertEqual(store.count(), 2000 - 3)
+        self.assertEqual(store.get_vectors(nearest), [])
+        self.assertFalse(set(store.search(self.queries[0], 10)[0]) & set(nearest))
+
+        # Emptied segments are dropped; deleting more than
+        # MAX_DELETED_FRACTION of the rest compacts the store.
+        store.delete(self.ids[:500])
+        self.assertEqual(len(store._manifest()['segments']), 3)
+        store.delete(self.ids[500::3])
+        self.assertEqual(len(store._manifest()['segments']), 1)
+        remaining = set(self.ids[500:]) - set(self.ids[500::3]) - set(nearest)
+        self.assertEqual(store.count(), len(remaining))
+        self.assertEqual({vector_id for vector_id, _ in store.get_vectors()}, remaining)
+
+    def test_add_replaces_vectors_under_the_same_id(self):
+        store = self.store('binary')
+        store.add(['7'], -self.vectors[7:8])
+        self.assertEqual(store.count(), 2000)
+        np.testing.assert_array_equal(store.get_vectors(['7'])[0][1], -self.vectors[7])
+
+    def test_lookups_by_id_across_segments(self):
+        store = self.store('int8')
+        store.add(['7', '1500'], -self.vectors[[7, 1500]])
+        wanted = ['1999', '7', 'missing', '0', '1500', '7']
+        pairs = store.get_vectors(wanted)
+        self.assertEqual([vector_id for vector_id, _ in pairs], ['1999', '7', '0', '1500', '7'])
+        np.testing.assert_array_equal(pairs[1][1], -self.vectors[7])
+        np.testing.assert_array_equal(pairs[0][1], self.vectors[1999])
+
+        # Repeated ids are deleted once.
+        store.delete(['3', '3', '7', 'missing'])
+        self.assertEqual(store.count(), 1998)
+        self.assertEqual([vector_id for vector_id, _ in store.get_vectors(['3', '7', '4', '1500'])], ['4', '1500'])
+        self.assertEqual(sum(len(entry['deleted']) for entry in store._manifest()['segments']), 4)
+
+    def test_small_segments_are_merged_by_tier(self):
+        store = QuantizedStore(os.path.join(self.root, 'tiers'), 'int8')
+        for start in range(0, 2000, 10):
+            store.add(self.ids[start:start + 10], self.vectors[start:start + 10])
+        sizes = [entry['rows'] for entry in store._manifest()['segments']]
+        self.assertEqual(sum(sizes), 2000)
+        self.assertLess(len(sizes), 4 * (MERGE_FACTOR - 1))
+        # The big segments are not rewritten for every few small adds.
+        self.assertEqual(sorted(sizes, reverse=True)[:3], [640, 640, 640])
+        self.assertEqual(store.search(self.vectors[1234], 1)[0], ['1234'])
+
+
+class QuantizedCollectionTests(IndexedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.upload('notes.txt', paragraphs(*'ABCDEF'))
+        self.service.process_document(self.document)
+        self.client.force_login(self.user)
+
+    def test_vectors_without_a_chunk_take_no_result_slots(self):
+        store = vector_collection(self.collection)
+        query = self.encoder.encode(['Paragraph A talks about topic A in seven words.'])[0]
+        store.add(ids=[f'{self.document.id}_0', 'gone_1'], embeddings=[query, query])
+        results = store.query(query_embeddings=[query], n_results=3)
+        self.assertEqual(len(results['ids'][0]), 3)
+        self.assertFalse({f'{self.document.id}_0', 'gone_1'} & set(results['ids'][0]))
+        self.assertEqual(results['documents'][0][0], 'Paragraph A talks about topic A in seven words.')
+        self.assertEqual(len(results['distances'][0]), 3)
+
+    def test_hits_carry_their_chunk_embedding(self):
+        text = 'Paragraph C talks about topic C in seven words.'
+        query = self.encoder.encode([text])[0]
+        calls = self.encoder.calls
+        hits = RAGService().retrieve('topic C', [self.collection], query_embedding=query.tolist())
+        self.assertEqual(hits[0]['text'], text)
+        np.testing.assert_allclose(hits[0]['embedding'], query, atol=1e-6)
+        self.assertTrue(all(hit['embedding'] is not None for hit in hits))
+        self.assertEqual(self.encoder.calls, calls)
+
+    def test_deleting_a_document_deletes_its_vectors(self):
+        other = self.upload('other.txt', paragraphs(*'XY'))
+        self.service.process_document(other)
+        self.client.post(f'/rag/delete-document/{self.document.id}/')
+        store = vector_collection(self.collection)
+        self.assertEqual(store.count(), 2)
+        self.assertEqual(sorted(store.get()['ids']), sorted(other.chunks.values_list('vector_id', flat=True)))
+
+    def test_deleting_a_collection_drops_its_store(self):
+        path = vector_collection(self.collection).store.path
+        self.assertTrue(path.exists())
+        self.client.post(f'/rag/delete-collection/{self.collection.id}/')
+        self.assertFalse(path.exists())
+
+
+WORDS = [f"w{i}" for i in range(50)]
+
+
+class BatchIngestionTests(RAGTestCase):
+    encoder = TokenizerModel(WORDS)
+
+    def setUp(self):
+        super().setUp()
+        self.collection.chunk_size_tokens = 12
+        self.collection.chunk_overlap_tokens = 0
+        self.collection.save()
+
+    def text(self, seed, words=300):
+        rng = np.random.default_rng(seed)
+        return ' '.join(rng.choice(WORDS, size=words))
+
+    def test_chunks_cover_the_text_while_other_threads_encode(self):
+        stop = threading.Event()
+
+        def encode():
+            while not stop.is_set():
+                self.encoder.encode([self.text(0)])
+
+        threads = [threading.Thread(target=encode) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        try:
+            sources = [(f'doc{i}.txt', io.BytesIO(self.text(i).encode())) for i in range(12)]
+            report = BatchIngestionService(self.collection, workers=4).ingest(sources)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(report['ingested'], 12)
+        for document in self.collection.documents.all():
+            chunks = ' '.join(document.chunks.order_by('chunk_index').values_list('content', flat=True))
+            self.assertEqual(chunks, self.text(int(document.filename[3:-4])), document.filename)
+
+    def test_report_counts_duplicates_and_unsupported_files(self):
+        sources = [
+            ('a.txt', io.BytesIO(b'w1 w2 w3')),
+            ('b.txt', io.BytesIO(b'w1 w2 w3')),
+            ('c.exe', io.BytesIO(b'MZ')),
+            ('empty.txt', io.BytesIO(b'')),
+            ('d.txt', io.BytesIO(b'w4 w5')),
+        ]
+        report = BatchIngestionService(self.collection, workers=2).ingest(sources)
+        self.assertEqual(report['files_total'], 5)
+        self.assertEqual(report['ingested'], 2)
+        self.assertEqual(report['duplicates'], 1)
+        self.assertEqual(sorted(failure['filename'] for failure in report['failed']), ['c.exe', 'empty.txt'])
+        self.assertEqual(report['bytes'], len(b'w1 w2 w3') + len(b'w4 w5'))
+        self.assertEqual(report['chunks'], 2)
+        self.assertEqual(sorted(self.collection.documents.values_list('filename', flat=True)), ['a.txt', 'd.txt'])
+
+    def test_same_name_becomes_a_new_version(self):
+        BatchIngestionService(self.collection).ingest([('a.txt', io.BytesIO(b'w1 w2'))])
+        report = BatchIngestionService(self.collection).ingest([('a.txt', io.BytesIO(b'w1 w2 w3'))])
+        self.assertEqual((report['ingested'], report['replaced']), (0, 1))
+        self.assertEqual(self.collection.documents.get().version, 2)
+
+    def zip_file(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('docs/', '')
+            archive.writestr('docs/one.txt', 'w1 w2')
+            archive.writestr('docs/nested/two.txt', 'w3 w4')
+            archive.writestr('__MACOSX/docs/._one.txt', 'resource fork')
+        return buffer.getvalue()
+
+    def test_upload_view_unpacks_zip_archives(self):
+        self.client.force_login(self.user)
+        response = self.client.post(f'/rag/upload/{self.collection.id}/batch/', {'files': [
+            SimpleUploadedFile('bundle.zip', self.zip_file()),
+            SimpleUploadedFile('three.txt', b'w5 w6'),
+        ]})
+        report = response.json()['report']
+        self.assertEqual((report['files_total'], report['ingested'], report['failed']), (3, 3, []))
+        self.assertEqual(
+            sorted(self.collection.documents.values_list('filename', flat=True)), ['one.txt', 'three.txt', 'two.txt']
+        )
+
+    def test_command_walks_directories_and_archives(self):
+        source = os.path.join(self.root, 'source')
+        os.makedirs(os.path.join(source, 'sub'))
+        with open(os.path.join(source, 'sub', 'four.txt'), 'w') as f:
+            f.write('w7 w8')
+        with open(os.path.join(source, 'bundle.zip'), 'wb') as f:
+            f.write(self.zip_file())
+        out = io.StringIO()
+        call_command('ingest_documents', str(self.collection.id), source, '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual((report['files_total'], report['ingested']), (3, 3))
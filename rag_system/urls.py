@@ -6,6 +6,11 @@ urlpatterns = [
     path('create-collection/', views.create_collection, name='create_collection'),
     path('collection/<int:collection_id>/', views.collection_detail, name='collection_detail'),
     path('upload/<int:collection_id>/', views.upload_document, name='upload_document'),
+    path('upload/<int:collection_id>/chunked/', views.start_chunked_upload, name='start_chunked_upload'),
+    path('upload/<int:collection_id>/batch/', views.batch_upload, name='batch_upload'),
+    path('upload/session/<uuid:upload_id>/', views.chunked_upload, name='chunked_upload'),
+    path('replace-document/<uuid:document_id>/', views.replace_document, name='replace_document'),
     path('delete-document/<uuid:document_id>/', views.delete_document, name='delete_document'),
     path('delete-collection/<int:collection_id>/', views.delete_collection, name='delete_collection'),
+    path('embedding-stats/', views.embedding_stats, name='embedding_stats'),
 ]
\ No newline at end of file
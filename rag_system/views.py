@@ -1,54 +1,106 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
+from django.conf import settings
+from django.db.models import Count
+import json
 import os
-from .models import DocumentCollection, Document
-from .services import DocumentProcessingService
+from chat.cache import RAG, bump_stamp, page_cache_context
+from .models import DocumentCollection, Document, UploadSession
+from .query_embeddings import encoder_stats, prometheus_text
+from .services import (
+    ALLOWED_EXTENSIONS, BatchIngestionService, ChunkedUploadService,
+    DocumentProcessingService, UploadError, delete_collection_vectors, delete_document_vectors,
+    expand_uploaded_files, find_current_version, hash_uploaded_file
+)
 
 @login_required
 def documents(request):
-    collections = DocumentCollection.objects.filter(user=request.user)
-    return render(request, 'rag/documents.html', {'collections': collections})
+    collections = DocumentCollection.objects.filter(user=request.user).annotate(
+        document_count=Count('documents')
+    )
+    return render(request, 'rag/documents.html', {
+        'collections': collections,
+        **page_cache_context(request.user.id)
+    })
 
 @login_required
 def create_collection(request):
     if request.method == 'POST':
         name = request.POST.get('name')
         description = request.POST.get('description', '')
+        chunk_strategy = request.POST.get('chunk_strategy', 'structure')
+        if chunk_strategy not in dict(DocumentCollection.CHUNK_STRATEGY_CHOICES):
+            chunk_strategy = 'structure'
+        vector_storage = request.POST.get('vector_storage', 'float32')
+        if vector_storage not in dict(DocumentCollection.VECTOR_STORAGE_CHOICES):
+            vector_storage = 'float32'
         
         if name:
             DocumentCollection.objects.create(
                 user=request.user,
                 name=name,
-                description=description
+                description=description,
+                chunk_strategy=chunk_strategy,
+                vector_storage=vector_storage
             )
             messages.success(request, f'Collection "{name}" created successfully!')
             return redirect('documents')
         else:
             messages.error(request, 'Collection name is required.')
     
-    return render(request, 'rag/create_collection.html')
+    return render(request, 'rag/create_collection.html', {
+        'chunk_strategies': DocumentCollection.CHUNK_STRATEGY_CHOICES,
+        'vector_storages': DocumentCollection.VECTOR_STORAGE_CHOICES
+    })
 
 @login_required
 def upload_document(request, collection_id):
     collection = get_object_or_404(DocumentCollection, id=collection_id, user=request.user)
+    context = {
+        'collection': collection,
+        'max_upload_size': settings.RAG_MAX_UPLOAD_SIZE,
+        'upload_chunk_size': settings.RAG_UPLOAD_CHUNK_SIZE
+    }
     
     if request.method == 'POST':
         file = request.FILES.get('file')
         if file:
-            allowed_extensions = ['.pdf', '.docx', '.doc', '.txt']
             file_extension = os.path.splitext(file.name)[1].lower()
             
-            if file_extension not in allowed_extensions:
+            if file_extension not in ALLOWED_EXTENSIONS:
                 messages.error(request, 'File type not supported.')
-                return render(request, 'rag/upload.html', {'collection': collection})
+                return render(request, 'rag/upload.html', context)
+            
+            if file.size > settings.RAG_MAX_UPLOAD_SIZE:
+                messages.error(request, f'File too large. Maximum {settings.RAG_MAX_UPLOAD_SIZE // (1024 * 1024)}MB.')
+                return render(request, 'rag/upload.html', context)
+            
+            content_hash = hash_uploaded_file(file)
+            if collection.documents.filter(content_hash=content_hash).exists():
+                messages.error(request, f'"{file.name}" is already in this collection.')
+                return render(request, 'rag/upload.html', context)
             
-            if file.size > 10 * 1024 * 1024:
-                messages.error(request, 'File too large. Maximum 10MB.')
-                return render(request, 'rag/upload.html', {'collection': collection})
+            previous = find_current_version(collection, file.name)
+            if previous is not None:
+                try:
+                    stored_name = default_storage.save(f'documents/{file.name}', file)
+                    stats = DocumentProcessingService().reindex_document(
+                        previous, stored_name, file.size, content_hash
+                    )
+                    messages.success(
+                        request,
+                        f'"{file.name}" updated to version {stats["version"]}: '
+                        f'{stats["added"]} changed chunks re-indexed, {stats["reused"]} unchanged.'
+                    )
+                except Exception as e:
+                    messages.error(request, f'Error updating document: {str(e)}')
+                return redirect('collection_detail', collection_id=collection_id)
             
             try:
                 document = Document.objects.create(
@@ -56,7 +108,8 @@ def upload_document(request, collection_id):
                     filename=file.name,
                     file_path=file,
                     file_type=file_extension[1:],
-                    file_size=file.size
+                    file_size=file.size,
+                    content_hash=content_hash
                 )
                 
                 doc_service = DocumentProcessingService()
@@ -74,7 +127,101 @@ def upload_document(request, collection_id):
         else:
             messages.error(request, 'Please select a file.')
     
-    return render(request, 'rag/upload.html', {'collection': collection})
+    return render(request, 'rag/upload.html', context)
+
+def _upload_session_payload(session):
+    return {
+        'upload_id': str(session.id),
+        'filename': session.filename,
+        'offset': session.received_size,
+        'total_size': session.total_size,
+        'chunk_size': settings.RAG_UPLOAD_CHUNK_SIZE,
+        'status': session.status
+    }
+
+@csrf_exempt
+@login_required
+def start_chunked_upload(request, collection_id):
+    """Open (or resume) a chunked upload. Body: {filename, size, sha256?}"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method.'})
+    
+    collection = get_object_or_404(DocumentCollection, id=collection_id, user=request.user)
+    
+    try:
+        data = json.loads(request.body)
+        total_size = int(data.get('size', 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body.'}, status=400)
+    
+    try:
+        session = ChunkedUploadService().start(
+            collection, data.get('filename', ''), total_size, data.get('sha256', '')
+        )
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=e.status)
+    
+    return JsonResponse({'success': True, **_upload_session_payload(session)})
+
+@csrf_exempt
+@login_required
+def chunked_upload(request, upload_id):
+    """GET reports the resume offset, PUT appends the raw request body at
+    the ``Upload-Offset`` header, DELETE cancels the upload."""
+    session = get_object_or_404(
+        UploadSession.objects.select_related('collection'),
+        id=upload_id, collection__user=request.user
+    )
+    service = ChunkedUploadService()
+    
+    if request.method == 'GET':
+        return JsonResponse({'success': True, **_upload_session_payload(session)})
+    
+    if request.method == 'DELETE':
+        service.abort(session)
+        return JsonResponse({'success': True})
+    
+    if request.method != 'PUT':
+        return JsonResponse({'success': False, 'error': 'Invalid request method.'})
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Upload-Offset header required.'}, status=400)
+    
+    try:
+        # Read from the request stream directly; request.body would buffer
+        # the whole part in memory.
+        document = service.write_chunk(session, offset, request, length)
+    except UploadError as e:
+        payload = {'success': False, 'error': str(e)}
+        if e.offset is not None:
+            payload['offset'] = e.offset
+        return JsonResponse(payload, status=e.status)
+    
+    payload = {'success': True, **_upload_session_payload(session)}
+    if document is not None:
+        payload['document_id'] = str(document.id)
+        payload['processed'] = document.processed
+        payload['redirect_url'] = reverse('collection_detail', args=[session.collection_id])
+    return JsonResponse(payload)
+
+@csrf_exempt
+@login_required
+def batch_upload(request, collection_id):
+    """Ingest several files (multipart field ``files``, .zip archives are
+    unpacked) and return an aggregate report."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method.'})
+    
+    collection = get_object_or_404(DocumentCollection, id=collection_id, user=request.user)
+    files = request.FILES.getlist('files')
+    if not files:
+        return JsonResponse({'success': False, 'error': 'Please select at least one file.'}, status=400)
+    
+    report = BatchIngestionService(collection).ingest(expand_uploaded_files(files))
+    return JsonResponse({'success': True, 'report': report})
 
 @login_required
 def collection_detail(request, collection_id):
@@ -83,9 +230,46 @@ def collection_detail(request, collection_id):
     
     return render(request, 'rag/collection_detail.html', {
         'collection': collection,
-        'documents': documents
+        'documents': documents,
+        # Passed uncalled so the count only runs when the fragment is rendered.
+        'processed_count': documents.filter(processed=True).count,
+        **page_cache_context(request.user.id)
     })
 
+@csrf_exempt
+@login_required
+def replace_document(request, document_id):
+    """Upload a new version of a document (multipart field ``file``)."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method.'})
+    
+    document = get_object_or_404(
+        Document.objects.select_related('collection'),
+        id=document_id, collection__user=request.user
+    )
+    file = request.FILES.get('file')
+    if not file:
+        return JsonResponse({'success': False, 'error': 'Please select a file.'}, status=400)
+    
+    if os.path.splitext(file.name)[1].lower() not in ALLOWED_EXTENSIONS:
+        return JsonResponse({'success': False, 'error': 'File type not supported.'}, status=400)
+    if file.size > settings.RAG_MAX_UPLOAD_SIZE:
+        return JsonResponse({'success': False, 'error': 'File too large.'}, status=413)
+    
+    content_hash = hash_uploaded_file(file)
+    if content_hash == document.content_hash:
+        return JsonResponse({'success': True, 'unchanged': True, 'version': document.version})
+    
+    try:
+        stored_name = default_storage.save(f'documents/{file.name}', file)
+        stats = DocumentProcessingService().reindex_document(
+            document, stored_name, file.size, content_hash, filename=file.name
+        )
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({'success': True, 'unchanged': False, **stats})
+
 @csrf_exempt
 @login_required  
 def delete_document(request, document_id):
@@ -100,7 +284,9 @@ def delete_document(request, document_id):
                 except:
                     pass
             
+            delete_document_vectors(document)
             document.delete()
+            bump_stamp(request.user.id, RAG)
             
             return JsonResponse({
                 'success': True, 
@@ -125,8 +311,17 @@ def delete_collection(request, collection_id):
                 except:
                     pass
         
+        delete_collection_vectors(collection)
         collection.delete()
         messages.success(request, f'Collection "{collection_name}" deleted successfully!')
         return redirect('documents')
     
-    return render(request, 'rag/delete_collection.html', {'collection': collection})
\ No newline at end of file
+    return render(request, 'rag/delete_collection.html', {'collection': collection})
+
+@staff_member_required
+def embedding_stats(request):
+    """Query embedding cache and batching statistics of this process."""
+    stats = encoder_stats()
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(prometheus_text(stats), content_type='text/plain; version=0.0.4')
+    return JsonResponse({'success': True, 'pid': os.getpid(), 'encoders': stats})
@@ -0,0 +1,150 @@
+$(document).ready(function() {
+    const urls = $('#sidebar').data();
+
+    // Individual Chat Deletion
+    $('.delete-thread-btn').click(function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+        
+        const chatItem = $(this).closest('.chat-item');
+        const chatTitle = chatItem.find('.fw-medium').text().trim();
+        
+        if (confirm(`Delete "${chatTitle}"?`)) {
+            // Show loading state
+            $(this).html('<i class="fas fa-spinner fa-spin"></i>');
+            
+            $.post($(this).data('delete-url'))
+            .done(function(response) {
+                if (response.success) {
+                    // Fade out and remove the chat item
+                    chatItem.fadeOut(300, function() {
+                        $(this).remove();
+                        
+                        // Check if no more chats remain
+                        if ($('.chat-item').length === 0) {
+                            $('#chat-list').html(`
+                                <div class="text-center text-muted py-4" id="no-chats-message">
+                                    <i class="fas fa-comment-dots fa-2x mb-2"></i>
+                                    <p class="small">No conversations yet</p>
+                                </div>
+                            `);
+                            $('#clear-all-btn').hide();
+                        }
+                    });
+                    
+                    // Show success message (optional)
+                    if (response.message) {
+                        showNotification(response.message, 'success');
+                    }
+                } else {
+                    alert(response.error || 'Error deleting conversation');
+                    // Reset button
+                    $(this).html('<i class="fas fa-times"></i>');
+                }
+            })
+            .fail(function() {
+                alert('Error deleting conversation');
+                // Reset button
+                $(this).html('<i class="fas fa-times"></i>');
+            });
+        }
+    });
+
+    // Clear All Chats
+    $('#clear-all-btn').click(function() {
+        if (confirm('Delete all conversations? This cannot be undone.')) {
+            // Show loading state
+            $(this).html('<i class="fas fa-spinner fa-spin"></i>');
+            
+            $.post(urls.clearUrl)
+            .done(function(response) {
+                if (response.success) {
+                    location.reload();
+                } else {
+                    alert(response.error || 'Error clearing conversations');
+                    // Reset button
+                    $(this).html('<i class="fas fa-trash"></i>');
+                }
+            })
+            .fail(function() {
+                alert('Error clearing conversations');
+                // Reset button
+                $(this).html('<i class="fas fa-trash"></i>');
+            });
+        }
+    });
+
+    // Chat search
+    let searchTimer = null;
+    let searchQuery = '';
+
+    function escapeHtml(text) {
+        return $('<div>').text(text || '').html();
+    }
+
+    function renderSearch(response, append) {
+        const container = $('#search-results');
+        if (!append) {
+            container.empty();
+            response.threads.forEach(function(thread) {
+                container.append(`
+                    <a href="${thread.url}" class="d-block text-white text-decoration-none p-2 rounded hover-bg-secondary">
+                        <i class="fas fa-comments me-1"></i>${thread.title}
+                    </a>`);
+            });
+        }
+        container.find('.search-more').remove();
+        response.results.forEach(function(result) {
+            container.append(`
+                <a href="${result.url}" class="d-block text-white text-decoration-none p-2 rounded hover-bg-secondary">
+                    <div class="text-muted text-truncate" style="font-size: 0.75rem;">${escapeHtml(result.thread_title)}</div>
+                    <div>${result.snippet}</div>
+                </a>`);
+        });
+        if (!append && response.threads.length === 0 && response.results.length === 0) {
+            container.append('<div class="text-muted py-2">No matches</div>');
+        }
+        if (response.has_next) {
+            const more = $('<button class="btn btn-sm btn-outline-light w-100 mt-1 search-more">More results</button>');
+            more.click(function() { runSearch(response.page + 1); });
+            container.append(more);
+        }
+    }
+
+    function runSearch(page) {
+        const query = searchQuery;
+        $.getJSON(urls.searchUrl, {q: query, page: page}).done(function(response) {
+            if (query !== searchQuery || !response.success) return;
+            renderSearch(response, page > 1);
+        });
+    }
+
+    $('#chat-search').on('input', function() {
+        clearTimeout(searchTimer);
+        searchQuery = $(this).val().trim();
+        if (!searchQuery) {
+            $('#search-results').hide().empty();
+            return;
+        }
+        $('#search-results').show();
+        searchTimer = setTimeout(function() { runSearch(1); }, 250);
+    });
+
+    // Optional: Show notification function
+    function showNotification(message, type) {
+        const alertClass = type === 'success' ? 'alert-success' : 'alert-danger';
+        const notification = $(`
+            <div class="alert ${alertClass} alert-dismissible fade show position-fixed" 
+                 style="top: 20px; right: 20px; z-index: 1060; min-width: 300px;">
+                ${message}
+                <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+            </div>
+        `);
+        $('body').append(notification);
+        
+        // Auto remove after 3 seconds
+        setTimeout(() => {
+            notification.alert('close');
+        }, 3000);
+    }
+});
@@ -0,0 +1,31 @@
+$(document).ready(function() {
+    const confirmCheckbox = $('#confirmDelete');
+    const deleteBtn = $('#delete-btn');
+    const deleteForm = $('#delete-form');
+
+    // Enable delete button only when checkbox is checked
+    confirmCheckbox.change(function() {
+        deleteBtn.prop('disabled', !this.checked);
+    });
+
+    // Handle form submission
+    deleteForm.submit(function(e) {
+        if (!confirmCheckbox.is(':checked')) {
+            e.preventDefault();
+            alert('Please confirm that you understand this action cannot be undone.');
+            return false;
+        }
+
+        // Double confirmation
+        const collectionName = deleteForm.attr('data-collection-name');
+        const confirmed = confirm(`Are you sure you want to delete "${collectionName}" and all its documents?\n\nThis action cannot be undone!`);
+        
+        if (!confirmed) {
+            e.preventDefault();
+            return false;
+        }
+
+        deleteBtn.html('<i class="fas fa-spinner fa-spin me-1"></i>Deleting...')
+                 .prop('disabled', true);
+    });
+});
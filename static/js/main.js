@@ -0,0 +1,4 @@
+// Auto-dismiss flash messages.
+setTimeout(function() {
+    $('.alert').alert('close');
+}, 5000);
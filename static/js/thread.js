@@ -0,0 +1,196 @@
+$(document).ready(function() {
+    const messagesArea = $('#messagesArea');
+    const messageInput = $('#messageInput');
+    const ragToggle = $('#ragToggle');
+    const collectionSelect = $('#collectionSelect');
+    
+    // Auto-resize textarea
+    messageInput.on('input', function() {
+        this.style.height = 'auto';
+        this.style.height = Math.min(this.scrollHeight, 120) + 'px';
+    });
+
+    // Show/hide collection selector
+    ragToggle.change(function() {
+        if (this.checked) {
+            collectionSelect.show();
+        } else {
+            collectionSelect.hide();
+        }
+    });
+
+    // Handle form submission
+    $('#chatForm').submit(function(e) {
+        e.preventDefault();
+        
+        const content = messageInput.val().trim();
+        if (!content) return;
+
+        const useRag = ragToggle.is(':checked');
+        const collectionIds = $('#collectionId').val() || [];
+
+        if (useRag && !collectionIds.length) {
+            alert('Please select at least one document collection for Q&A mode.');
+            return;
+        }
+
+        // Disable input during processing
+        messageInput.prop('disabled', true);
+        $('#sendButton').prop('disabled', true).html('<i class="fas fa-spinner fa-spin"></i>');
+
+        // Add user message to UI immediately
+        addMessage(content, true, new Date());
+        messageInput.val('').css('height', 'auto');
+
+        // Show typing indicator
+        showTypingIndicator();
+
+        // Send to server
+        $.ajax({
+            url: $('#chatForm').data('send-url'),
+            method: 'POST',
+            data: JSON.stringify({
+                content: content,
+                use_rag: useRag,
+                collection_ids: collectionIds
+            }),
+            contentType: 'application/json',
+            success: function(response) {
+                hideTypingIndicator();
+                
+                if (response.success) {
+                    // Add AI response
+                    addMessage(
+                        response.ai_message.content, 
+                        false, 
+                        response.ai_message.timestamp,
+                        response.ai_message.sources
+                    );
+                } else {
+                    addMessage('Sorry, there was an error processing your message.', false, new Date());
+                }
+            },
+            error: function() {
+                hideTypingIndicator();
+                addMessage('Sorry, there was an error sending your message.', false, new Date());
+            },
+            complete: function() {
+                // Re-enable input
+                messageInput.prop('disabled', false).focus();
+                $('#sendButton').prop('disabled', false).html('<i class="fas fa-paper-plane"></i>');
+            }
+        });
+    });
+
+    // Delete current chat functionality
+    $('#deleteCurrentChatBtn').click(function() {
+        if (confirm('Are you sure you want to delete this conversation?')) {
+            // Show loading state
+            $(this).html('<i class="fas fa-spinner fa-spin"></i> Deleting...');
+            
+            $.post($(this).data('delete-url'))
+            .done(function(response) {
+                if (response.success) {
+                    // Redirect to dashboard after successful deletion
+                    window.location.href = $('#deleteCurrentChatBtn').data('redirect-url');
+                } else {
+                    alert(response.error || 'Error deleting chat');
+                    // Reset button
+                    $('#deleteCurrentChatBtn').html('<i class="fas fa-trash me-1"></i>Delete This Chat');
+                }
+            })
+            .fail(function() {
+                alert('Error deleting chat');
+                // Reset button
+                $('#deleteCurrentChatBtn').html('<i class="fas fa-trash me-1"></i>Delete This Chat');
+            });
+        }
+    });
+
+    // Enter key to send message
+    messageInput.keydown(function(e) {
+        if (e.key === 'Enter' && !e.shiftKey) {
+            e.preventDefault();
+            $('#chatForm').submit();
+        }
+    });
+
+    function addMessage(content, isUser, timestamp, sources = null) {
+        const messageClass = isUser ? 'user-message' : 'ai-message';
+        const justifyClass = isUser ? 'justify-content-end' : 'justify-content-start';
+        const timeColor = isUser ? 'text-white-50' : 'text-muted';
+        
+        let sourcesHtml = '';
+        if (sources && sources.length > 0) {
+            const sourceNames = sources.map(s => s.collection ? `${s.filename} (${s.collection})` : s.filename).join(', ');
+            sourcesHtml = `
+                <div class="mt-2 pt-2 border-top">
+                    <small class="text-muted">
+                        <i class="fas fa-book me-1"></i>Sources: ${sourceNames}
+                    </small>
+                </div>
+            `;
+        }
+
+        const messageHtml = `
+            <div class="d-flex ${justifyClass} mb-3">
+                <div class="message-bubble p-3 ${messageClass}">
+                    <div class="message-content">${content.replace(/\n/g, '<br>')}</div>
+                    ${sourcesHtml}
+                    <div class="text-end mt-1">
+                        <small class="${timeColor}">${formatTime(timestamp)}</small>
+                    </div>
+                </div>
+            </div>
+        `;
+        
+        messagesArea.append(messageHtml);
+        scrollToBottom();
+    }
+
+    function showTypingIndicator() {
+        const typingHtml = `
+            <div class="d-flex justify-content-start mb-3 typing-indicator" id="typingIndicator">
+                <div class="message-bubble p-3 ai-message">
+                    <div class="typing-dots">
+                        <span></span><span></span><span></span>
+                    </div>
+                </div>
+            </div>
+        `;
+        messagesArea.append(typingHtml);
+        scrollToBottom();
+    }
+
+    function hideTypingIndicator() {
+        $('#typingIndicator').remove();
+    }
+
+    function scrollToBottom() {
+        messagesArea.scrollTop(messagesArea[0].scrollHeight);
+    }
+
+    function formatTime(timestamp) {
+        if (typeof timestamp === 'string') return timestamp;
+        const date = new Date(timestamp);
+        return date.toLocaleTimeString('en-US', { 
+            hour: '2-digit', 
+            minute: '2-digit', 
+            hour12: false 
+        });
+    }
+
+    // Auto-scroll to bottom on page load, or to the message a search linked to
+    const linked = window.location.hash ? $(window.location.hash) : $();
+    if (linked.length) {
+        messagesArea.scrollTop(linked[0].offsetTop - messagesArea[0].offsetTop);
+        linked.find('.message-bubble').addClass('border border-warning');
+    } else {
+        scrollToBottom();
+    }
+
+    // Mobile sidebar toggle
+    window.toggleSidebar = function() {
+        $('#sidebar').toggleClass('show');
+    };
+});
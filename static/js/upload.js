@@ -0,0 +1,220 @@
+$(document).ready(function() {
+    const uploadForm = $('#upload-form');
+    const fileInput = $('#file');
+    const fileInfo = $('#file-info');
+    const fileName = $('#file-name');
+    const fileSize = $('#file-size');
+    const fileType = $('#file-type');
+    const removeBtn = $('#remove-file');
+    const uploadBtn = $('#upload-btn');
+    const dropZone = $('#drop-zone');
+    const processingStatus = $('#processing-status');
+    const progressBar = $('.progress-bar');
+
+    // File type icons mapping
+    const fileIcons = {
+        'pdf': 'fas fa-file-pdf text-danger',
+        'docx': 'fas fa-file-word text-primary',
+        'doc': 'fas fa-file-word text-primary', 
+        'txt': 'fas fa-file-alt text-secondary'
+    };
+
+    // File selection handler
+    fileInput.change(function() {
+        const file = this.files[0];
+        if (file) {
+            if (validateFile(file)) {
+                displayFileInfo(file);
+            }
+        }
+    });
+
+    // Validate file
+    function validateFile(file) {
+        const maxSize = uploadForm.data('max-size');
+        const allowedTypes = ['pdf', 'docx', 'doc', 'txt'];
+        const fileExtension = file.name.split('.').pop().toLowerCase();
+
+        if (!allowedTypes.includes(fileExtension)) {
+            showError('File type not supported. Please upload PDF, DOCX, DOC, or TXT files.');
+            return false;
+        }
+
+        if (file.size > maxSize) {
+            showError('File size too large. Maximum size is ' + formatFileSize(maxSize) + '.');
+            return false;
+        }
+
+        return true;
+    }
+
+    // Display file information
+    function displayFileInfo(file) {
+        const extension = file.name.split('.').pop().toLowerCase();
+        const icon = fileIcons[extension] || 'fas fa-file';
+        
+        fileName.text(file.name);
+        fileSize.text(formatFileSize(file.size));
+        fileType.text(extension.toUpperCase()).removeClass().addClass(`badge bg-${getTypeColor(extension)}`);
+        
+        // Update icon
+        fileInfo.find('.fa-file-alt').removeClass().addClass(icon);
+        
+        fileInfo.removeClass('d-none');
+        uploadBtn.prop('disabled', false);
+    }
+
+    // Get color for file type
+    function getTypeColor(extension) {
+        const colors = {
+            'pdf': 'danger',
+            'docx': 'primary',
+            'doc': 'primary',
+            'txt': 'secondary'
+        };
+        return colors[extension] || 'secondary';
+    }
+
+    // Remove file handler
+    removeBtn.click(function() {
+        fileInput.val('');
+        fileInfo.addClass('d-none');
+        uploadBtn.prop('disabled', true);
+        processingStatus.addClass('d-none');
+        hideError();
+    });
+
+    // Format file size
+    function formatFileSize(bytes) {
+        if (bytes === 0) return '0 Bytes';
+        const k = 1024;
+        const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+        const i = Math.floor(Math.log(bytes) / Math.log(k));
+        return parseFloat((bytes / Math.pow(k, i)).toFixed(1)) + ' ' + sizes[i];
+    }
+
+    // Form submission handler: send the file in resumable chunks
+    $('#upload-form').submit(function(e) {
+        e.preventDefault();
+        const file = fileInput[0].files[0];
+        if (!file || !validateFile(file)) {
+            return;
+        }
+
+        uploadBtn.html('<i class="fas fa-spinner fa-spin me-1"></i>Uploading...').prop('disabled', true);
+        processingStatus.removeClass('d-none');
+        hideError();
+
+        uploadInChunks(file)
+            .then(function(result) {
+                progressBar.css('width', '100%');
+                window.location.href = result.redirect_url;
+            })
+            .catch(function(error) {
+                processingStatus.addClass('d-none');
+                uploadBtn.html('<i class="fas fa-upload me-1"></i>Upload & Process').prop('disabled', false);
+                showError(error.message);
+            });
+    });
+
+    async function uploadInChunks(file) {
+        let session = await requestJson(uploadForm.data('start-url'), {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        const sessionUrl = uploadForm.data('session-url')
+            .replace('00000000-0000-0000-0000-000000000000', session.upload_id);
+        let offset = session.offset;
+        let retries = 0;
+
+        while (true) {
+            progressBar.css('width', Math.min(95, offset / file.size * 100) + '%');
+            const end = Math.min(offset + session.chunk_size, file.size);
+            try {
+                session = await requestJson(sessionUrl, {
+                    method: 'PUT',
+                    headers: {'Upload-Offset': String(offset)},
+                    body: file.slice(offset, end)
+                });
+            } catch (error) {
+                if (error.offset === undefined || ++retries > 3) {
+                    throw error;
+                }
+                // Resume from wherever the server says it stopped.
+                offset = error.offset;
+                continue;
+            }
+            retries = 0;
+            offset = session.offset;
+            if (session.redirect_url) {
+                return session;
+            }
+        }
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, Object.assign({credentials: 'same-origin'}, options));
+        const data = await response.json();
+        if (!data.success) {
+            const error = new Error(data.error || 'Upload failed.');
+            error.offset = data.offset;
+            throw error;
+        }
+        return data;
+    }
+
+    // Drag and drop functionality
+    dropZone.on('dragover dragenter', function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+        $(this).addClass('bg-light border-success');
+    });
+
+    dropZone.on('dragleave', function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+        $(this).removeClass('bg-light border-success');
+    });
+
+    dropZone.on('drop', function(e) {
+        e.preventDefault();
+        e.stopPropagation();
+        $(this).removeClass('bg-light border-success');
+        
+        const files = e.originalEvent.dataTransfer.files;
+        if (files.length > 0) {
+            const file = files[0];
+            if (validateFile(file)) {
+                fileInput[0].files = files;
+                displayFileInfo(file);
+            }
+        }
+    });
+
+    // Click to select file
+    dropZone.click(function() {
+        fileInput.click();
+    });
+
+    // File input label click handler
+    $('label[for="file"]').click(function(e) {
+        e.stopPropagation();
+    });
+
+    // Error handling
+    function showError(message) {
+        hideError();
+        const errorHtml = `
+            <div class="alert alert-danger alert-dismissible fade show" role="alert">
+                <i class="fas fa-exclamation-triangle me-2"></i>${message}
+                <button type="button" class="btn-close" data-bs-dismiss="alert"></button>
+            </div>
+        `;
+        $('#upload-form').before(errorHtml);
+    }
+
+    function hideError() {
+        $('.alert-danger').remove();
+    }
+});
@@ -38,8 +38,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     "chat",
     "rag_system",
+    "assets",
 ]
 
 MIDDLEWARE = [
@@ -48,6 +50,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +87,36 @@ DATABASES = {
 }
 
 
+# Cache
+# The page cache relies on version stamps being shared by every worker, so
+# use a cross-process backend (file, Redis, Memcached) rather than locmem
+# when running more than one process.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+    }
+}
+
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)  # seconds
+
+
+# REST API (read-only, see chat/api.py and rag_system/api.py)
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 50,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -121,17 +154,82 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Fingerprinted, precompressed bundles built by `manage.py build_assets`
+# (see assets/bundles.py) and served with immutable cache headers.
+ASSETS_ROOT = config('ASSETS_ROOT', default=str(BASE_DIR / 'static_build'))
+ASSETS_URL = '/assets/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 OPENAI_API_KEY = config('OPENAI_API_KEY')
+# Any OpenAI-compatible endpoint, e.g. the load-test fake (loadtest/fake_llm.py).
+# The module-level openai client joins paths onto it, so keep the trailing slash.
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default='', cast=lambda url: url.rstrip('/') + '/' if url else '')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 CHROMA_PERSIST_DIRECTORY = BASE_DIR / 'chroma_db'
+# Collections are spread over this many Chroma stores (shard_NNN directories
+# under CHROMA_PERSIST_DIRECTORY; 1 keeps the single store in the directory
+# itself), by user id or, with "collection", by collection id. Run
+# `manage.py migrate_chroma_shards` after changing either setting.
+CHROMA_SHARDS = config('CHROMA_SHARDS', default=1, cast=int)
+CHROMA_SHARD_BY = config('CHROMA_SHARD_BY', default='user')
+# Vectors of collections with int8 or binary vector storage (one directory
+# per collection; see rag_system/quantization.py).
+QUANTIZED_VECTOR_DIRECTORY = config('QUANTIZED_VECTOR_DIRECTORY', default=str(BASE_DIR / 'quantized_db'))
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024   # 10MB
+# Batch ingest (rag/upload/<id>/batch/) posts a whole folder as one multipart
+# request; Django's default of 100 files per request would reject it.
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+
+# Chunked uploads stream straight to disk, so they are not bound by the
+# in-memory limits above.
+RAG_MAX_UPLOAD_SIZE = config('RAG_MAX_UPLOAD_SIZE', default=200 * 1024 * 1024, cast=int)  # 200MB
+RAG_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB per request
+RAG_UPLOAD_TEMP_DIR = MEDIA_ROOT / 'uploads'
+
+# Worker threads used when ingesting a batch of files into one collection.
+RAG_INGEST_WORKERS = config('RAG_INGEST_WORKERS', default=4, cast=int)
+
+# A RAG question can span several collections; they are searched in parallel
+# on a shared pool of RAG_QUERY_WORKERS threads per process.
+RAG_MAX_COLLECTIONS = config('RAG_MAX_COLLECTIONS', default=10, cast=int)
+RAG_QUERY_WORKERS = config('RAG_QUERY_WORKERS', default=8, cast=int)
+# Query embeddings are cached per model and process (this many normalized
+# queries, LRU), and concurrent queries share encode calls of up to
+# RAG_QUERY_BATCH_SIZE, waiting at most RAG_QUERY_BATCH_WINDOW_MS for a
+# batch to fill. A batch size of 1 encodes on the request thread.
+RAG_QUERY_CACHE_SIZE = config('RAG_QUERY_CACHE_SIZE', default=2048, cast=int)
+RAG_QUERY_BATCH_SIZE = config('RAG_QUERY_BATCH_SIZE', default=32, cast=int)
+RAG_QUERY_BATCH_WINDOW_MS = config('RAG_QUERY_BATCH_WINDOW_MS', default=2.0, cast=float)
+
+# Retrieved chunks are cut down to their most relevant sentences within this
+# many prompt tokens before the LLM call (rag_system/compression.py); 0 sends
+# the top three chunks whole.
+RAG_CONTEXT_TOKEN_BUDGET = config('RAG_CONTEXT_TOKEN_BUDGET', default=400, cast=int)
+
+# Messages of threads idle longer than this are moved to compressed
+# per-thread blobs by `manage.py archive_messages` and restored when the
+# thread is opened again.
+CHAT_ARCHIVE_AFTER_DAYS = config('CHAT_ARCHIVE_AFTER_DAYS', default=30, cast=int)
+CHAT_ARCHIVE_BATCH_SIZE = config('CHAT_ARCHIVE_BATCH_SIZE', default=200, cast=int)  # threads per transaction
+
+# Opt-in request profiling (profiling/middleware.py). A request is profiled
+# when it sends PROFILING_HEADER with PROFILING_TOKEN as value (any value for
+# staff users) or is picked by PROFILING_SAMPLE_RATE, optionally only under
+# PROFILING_PATHS. Profiles are listed at /profiles/ for staff users.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+PROFILING_TOKEN = config('PROFILING_TOKEN', default='')
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_PATHS = config('PROFILING_PATHS', default='', cast=lambda v: [p.strip() for p in v.split(',') if p.strip()])
+PROFILING_INTERVAL_MS = config('PROFILING_INTERVAL_MS', default=5, cast=float)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_KEEP = config('PROFILING_KEEP', default=200, cast=int)  # newest profiles kept on disk
@@ -30,5 +30,9 @@ urlpatterns = [
     path('', home_redirect, name='home'),
     path('chat/', include('chat.urls')),
     path('rag/', include('rag_system.urls')),
+    path('api/', include('chat.api_urls')),
+    path('api/', include('rag_system.api_urls')),
+    path('profiles/', include('profiling.urls')),
+    path('assets/', include('assets.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 